@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+
+"""
+Time selector, interface, pattern and port mapper operations over a range of sizes.
+
+Run with, e.g.,
+
+python suite.py -o results.json
+python suite.py -b 'pm\.' -s 100 10000 1000000 -o pm.json
+python suite.py -p results.json -f scaling.png
+
+Each benchmark builds its input for a given number of ports outside of the
+timed region and then calls the operation repeatedly; the best and median
+durations of a call are reported along with the exponent of a power law fitted
+to the durations of the largest sizes. The benchmarks run in a single process
+and do not require MPI. Benchmarks whose calls exceed a time limit are not run
+for larger sizes.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import re
+import sys
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from neurokernel.pattern import Interface, Pattern
+from neurokernel.plsel import SelectorMethods
+from neurokernel.pm import PortMapper
+
+try:
+    from time import monotonic as clock
+except ImportError:
+    from timeit import default_timer as clock
+
+#: Benchmarks keyed by name; each value is a function that accepts a number of
+#: ports, builds the benchmark's input, and returns the callable to time.
+BENCHMARKS = {}
+
+def benchmark(name):
+    """
+    Register a benchmark setup function under the specified name.
+    """
+
+    def register(f):
+        BENCHMARKS[name] = f
+        return f
+    return register
+
+def _sel_range(name, n):
+    return '/%s[0:%i]' % (name, n)
+
+def _sel_list(name, n):
+    return ','.join(['/%s/%i' % (name, i) for i in xrange(n)])
+
+def _interface(n):
+    """
+    Interface with `n` ports divided into quarters comprising graded potential
+    input, spiking input, graded potential output, and spiking output ports.
+    """
+
+    q = [k*n/4 for k in xrange(5)]
+    i = Interface('/a[0:%i]' % n)
+    for k, (io, t) in enumerate([('in', 'gpot'), ('in', 'spike'),
+                                 ('out', 'gpot'), ('out', 'spike')]):
+        i['/a[%i:%i]' % (q[k], q[k+1])] = [0, io, t]
+    return i
+
+@benchmark('plsel.parse.range')
+def _(n):
+    s = _sel_range('a', n)
+    return lambda: SelectorMethods.parse(s)
+
+@benchmark('plsel.parse.list')
+def _(n):
+    s = _sel_list('a', n)
+    return lambda: SelectorMethods.parse(s)
+
+@benchmark('plsel.expand')
+def _(n):
+    s = _sel_range('a', n)
+    return lambda: SelectorMethods.expand(s)
+
+@benchmark('plsel.make_index')
+def _(n):
+    s = _sel_range('a', n)
+    return lambda: SelectorMethods.make_index(s)
+
+@benchmark('plsel.select')
+def _(n):
+    df = pd.DataFrame({'x': np.arange(n)},
+                      index=SelectorMethods.make_index(_sel_range('a', n)))
+    s = '/a[%i:%i]' % (n/4, 3*n/4)
+    return lambda: SelectorMethods.select(df, s)
+
+@benchmark('pattern.Interface')
+def _(n):
+    return lambda: _interface(n)
+
+@benchmark('pattern.Interface.filter_ports')
+def _(n):
+    i = _interface(n)
+    return lambda: i.filter_ports(0, 'in', 'spike')
+
+@benchmark('pattern.Pattern.from_concat')
+def _(n):
+    s0 = _sel_range('a', n)
+    s1 = _sel_range('b', n)
+    return lambda: Pattern.from_concat(s0, s1, from_sel=s0, to_sel=s1, data=1)
+
+@benchmark('pattern.Pattern.src_idx')
+def _(n):
+    s0 = _sel_range('a', n)
+    s1 = _sel_range('b', n)
+    p = Pattern.from_concat(s0, s1, from_sel=s0, to_sel=s1, data=1)
+    return lambda: p.src_idx(0, 1)
+
+@benchmark('pattern.Pattern.dest_idx')
+def _(n):
+    s0 = _sel_range('a', n)
+    s1 = _sel_range('b', n)
+    p = Pattern.from_concat(s0, s1, from_sel=s0, to_sel=s1, data=1)
+    return lambda: p.dest_idx(0, 1)
+
+@benchmark('pm.PortMapper')
+def _(n):
+    s = _sel_range('a', n)
+    data = np.zeros(n)
+    return lambda: PortMapper(s, data)
+
+@benchmark('pm.PortMapper.get')
+def _(n):
+    pm = PortMapper(_sel_range('a', n), np.random.rand(n))
+    s = '/a[%i:%i]' % (n/4, 3*n/4)
+    return lambda: pm[s]
+
+@benchmark('pm.PortMapper.set')
+def _(n):
+    pm = PortMapper(_sel_range('a', n), np.zeros(n))
+    s = '/a[%i:%i]' % (n/4, 3*n/4)
+    x = np.random.rand(3*n/4-n/4)
+    def f():
+        pm[s] = x
+    return f
+
+@benchmark('pm.PortMapper.get_by_inds')
+def _(n):
+    pm = PortMapper(_sel_range('a', n), np.random.rand(n))
+    inds = pm.ports_to_inds('/a[%i:%i]' % (n/4, 3*n/4))
+    return lambda: pm.get_by_inds(inds)
+
+@benchmark('pm.PortMapper.set_by_inds')
+def _(n):
+    pm = PortMapper(_sel_range('a', n), np.zeros(n))
+    inds = pm.ports_to_inds('/a[%i:%i]' % (n/4, 3*n/4))
+    x = np.random.rand(len(inds))
+    return lambda: pm.set_by_inds(inds, x)
+
+def time_call(f, repeats=5, min_time=0.2):
+    """
+    Time a callable.
+
+    Parameters
+    ----------
+    f : callable
+        Function to time; it is called without arguments.
+    repeats : int
+        Number of measurements.
+    min_time : float
+        Minimum duration in seconds of each measurement; fast functions are
+        called several times per measurement to attain it.
+
+    Returns
+    -------
+    times : list of float
+        Average duration of a call in each measurement.
+    number : int
+        Number of calls per measurement.
+    """
+
+    # Calibrate the number of calls per measurement with the first call:
+    start = clock()
+    f()
+    t = clock()-start
+    number = max(1, int(min_time/t)) if t > 0 else 1000
+    times = []
+    for i in xrange(repeats):
+        start = clock()
+        for j in xrange(number):
+            f()
+        times.append((clock()-start)/number)
+    return times, number
+
+def scaling_exponent(sizes, times):
+    """
+    Exponent of a power law fitted to the durations at the two largest sizes.
+
+    Returns
+    -------
+    k : float
+        Exponent `k` such that the duration grows as `size**k`; NaN if fewer
+        than two sizes were timed.
+    """
+
+    if len(sizes) < 2:
+        return float('nan')
+    return np.log(times[-1]/times[-2])/np.log(float(sizes[-1])/sizes[-2])
+
+def environment():
+    """
+    Versions of the interpreter and the packages that affect the results.
+    """
+
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'networkx': nx.__version__,
+            'platform': platform.platform(),
+            'date': datetime.datetime.utcnow().isoformat()}
+
+def run(names, sizes, repeats=5, min_time=0.2, time_limit=10.0, verbose=True):
+    """
+    Run benchmarks over a range of sizes.
+
+    Parameters
+    ----------
+    names : list of str
+        Benchmarks to run.
+    sizes : list of int
+        Numbers of ports in increasing order.
+    repeats, min_time : int, float
+        Passed to `time_call()`.
+    time_limit : float
+        Benchmarks are not run at larger sizes once a single call or the
+        construction of their input takes longer than this many seconds.
+    verbose : bool
+        If True, print each result as it is obtained.
+
+    Returns
+    -------
+    results : dict
+        Dict with an 'environment' entry containing the output of
+        `environment()` and a 'results' entry containing a list of dicts
+        with the keys 'name', 'size', 'times' (durations of a call in
+        seconds), and 'number' (calls per measurement).
+    """
+
+    results = []
+    for name in names:
+        for n in sizes:
+            start = clock()
+            f = BENCHMARKS[name](n)
+            setup_time = clock()-start
+            times, number = time_call(f, repeats, min_time)
+            results.append({'name': name, 'size': n, 'times': times,
+                            'number': number})
+            if verbose:
+                print '%-36s %8i %12.3g s (median %.3g s)' % \
+                    (name, n, min(times), np.median(times))
+                sys.stdout.flush()
+            if max(setup_time, min(times)) > time_limit:
+                if verbose:
+                    print '%-36s skipping sizes > %i' % (name, n)
+                break
+    return {'environment': environment(), 'results': results}
+
+def summarize(results):
+    """
+    Tabulate the best durations of each benchmark.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        Best durations in seconds indexed by benchmark name with one column
+        per size, and a 'scaling' column containing the output of
+        `scaling_exponent()`.
+    """
+
+    d = {}
+    for r in results['results']:
+        d.setdefault(r['name'], {})[r['size']] = min(r['times'])
+    df = pd.DataFrame(d).T
+    df['scaling'] = [scaling_exponent(df.columns[row.notnull()].tolist(),
+                                      row.dropna().values) \
+                     for name, row in df.iterrows()]
+    return df
+
+def plot(results, file_name=None):
+    """
+    Plot the best duration of each benchmark against the number of ports.
+
+    Benchmarks are grouped into one log-log plot per module. The plot is
+    saved to the specified file or displayed if no file name is given.
+    """
+
+    import matplotlib
+    if file_name is not None:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    df = summarize(results).drop('scaling', axis=1)
+    groups = sorted(set([name.split('.')[0] for name in df.index]))
+    fig, axes = plt.subplots(1, len(groups), squeeze=False,
+                             figsize=(5*len(groups), 4))
+    for ax, group in zip(axes[0], groups):
+        for name, row in df.iterrows():
+            if name.split('.')[0] == group:
+                row = row.dropna()
+                ax.loglog(row.index, row.values, 'o-',
+                          label=name[len(group)+1:])
+        ax.set_title(group)
+        ax.set_xlabel('ports')
+        ax.set_ylabel('time (s)')
+        ax.legend(loc='upper left', fontsize='small')
+    fig.tight_layout()
+    if file_name is None:
+        plt.show()
+    else:
+        fig.savefig(file_name)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-b', '--benchmarks', default='.',
+                        help='Regular expression matching the names of the ' \
+                        'benchmarks to run [default: all]')
+    parser.add_argument('-s', '--sizes', default=[10**k for k in xrange(2, 7)],
+                        type=int, nargs='+',
+                        help='Numbers of ports [default: 100 ... 1000000]')
+    parser.add_argument('-r', '--repeats', default=5, type=int,
+                        help='Measurements per size [default: %(default)s]')
+    parser.add_argument('-t', '--time_limit', default=10.0, type=float,
+                        help='Skip larger sizes once a call takes longer ' \
+                        'than this many seconds [default: %(default)s]')
+    parser.add_argument('-o', '--out_file', default=None,
+                        help='Write results to this JSON file')
+    parser.add_argument('-p', '--plot', default=None, metavar='RESULTS',
+                        help='Plot results read from this JSON file ' \
+                        'instead of running benchmarks')
+    parser.add_argument('-f', '--fig_file', default=None,
+                        help='Save plot to this file instead of displaying it')
+    parser.add_argument('-l', '--list', action='store_true',
+                        help='List benchmarks and exit')
+    args = parser.parse_args()
+
+    names = sorted([name for name in BENCHMARKS \
+                    if re.search(args.benchmarks, name)])
+    if args.list:
+        print '\n'.join(names)
+        sys.exit(0)
+    if args.plot is not None:
+        with open(args.plot) as f:
+            plot(json.load(f), args.fig_file)
+        sys.exit(0)
+
+    results = run(names, sorted(args.sizes), args.repeats,
+                  time_limit=args.time_limit)
+    print
+    print summarize(results).to_string(float_format=lambda x: '%.3g' % x)
+    if args.out_file is not None:
+        with open(args.out_file, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.fig_file is not None:
+        plot(results, args.fig_file)
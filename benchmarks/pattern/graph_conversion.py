@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""
+Time conversion between NetworkX directed graphs and Pattern instances.
+"""
+
+import argparse
+import time
+
+import networkx as nx
+import numpy as np
+
+from neurokernel.pattern import Pattern
+
+def gen_graph(n_edges, fan_out):
+    """
+    Generate a directed graph linking the ports of two interfaces.
+
+    Parameters
+    ----------
+    n_edges : int
+        Number of connections.
+    fan_out : int
+        Number of destination ports connected to each source port.
+
+    Returns
+    -------
+    g : networkx.DiGraph
+        Graph whose nodes are the ports '/a[0]', '/a[1]', ... of interface 0
+        and '/b[0]', '/b[1]', ... of interface 1. Each port in interface 1
+        receives data from exactly one port in interface 0.
+    """
+
+    n_src = int(np.ceil(n_edges/float(fan_out)))
+    g = nx.DiGraph()
+    g.add_nodes_from(('/a[%i]' % i for i in xrange(n_src)),
+                     interface=0, type='gpot')
+    g.add_nodes_from(('/b[%i]' % i for i in xrange(n_edges)),
+                     interface=1, type='gpot')
+    g.add_edges_from(('/a[%i]' % (i/fan_out), '/b[%i]' % i) \
+                     for i in xrange(n_edges))
+    return g
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-e', '--edges', default=100000, type=int,
+                        help='Number of connections [default: %(default)s]')
+    parser.add_argument('-f', '--fan_out', default=1, type=int,
+                        help='Connections per source port [default: %(default)s]')
+    parser.add_argument('-r', '--repeats', default=3, type=int,
+                        help='Number of repetitions [default: %(default)s]')
+    args = parser.parse_args()
+
+    g = gen_graph(args.edges, args.fan_out)
+    from_times = []
+    to_times = []
+    for i in xrange(args.repeats):
+        start = time.time()
+        p = Pattern.from_graph(g)
+        from_times.append(time.time()-start)
+
+        start = time.time()
+        p.to_graph()
+        to_times.append(time.time()-start)
+
+    print 'edges: %i, ports: %i' % (g.number_of_edges(), g.number_of_nodes())
+    for name, times in [('from_graph', from_times), ('to_graph', to_times)]:
+        t = min(times)
+        print '%s: %f s (best of %i), %f edges/s' % \
+            (name, t, args.repeats, g.number_of_edges()/t)
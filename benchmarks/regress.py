@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+
+"""
+Store benchmark results and detect performance regressions between them.
+
+Run with, e.g.,
+
+python regress.py run
+python regress.py run --timing -c HEAD~1
+python regress.py compare 3f2a1c0 92fa0da
+python regress.py list
+
+The `run` command runs the selector, interface, pattern and port mapper
+benchmarks in api/suite.py (and optionally the timing sweep in
+timing/sweep.py) and stores the results in a JSON file named after the date,
+the git revision of the working tree and a hash of the versions of the
+packages that affect performance. The `compare` command compares two stored
+results and reports the benchmarks that are significantly slower (or faster)
+in the second; it exits with a nonzero status if any are slower, so it may be
+used to check a build before deploying it.
+"""
+
+import argparse
+import datetime
+import glob
+import hashlib
+import importlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(bench_dir, 'api'))
+sys.path.insert(0, os.path.join(bench_dir, 'timing'))
+
+#: Packages whose versions are recorded with each result:
+PACKAGES = ['numpy', 'pandas', 'networkx', 'ply', 'mpi4py', 'dill', 'twiggy']
+
+def revision():
+    """
+    Git revision of the working tree.
+
+    Returns
+    -------
+    rev : str
+        Abbreviated commit hash, suffixed with '-dirty' if the tree has
+        uncommitted changes, or 'unknown' if it is not a git repository.
+    """
+
+    # Use the same format as full_revision() so that stored results can be
+    # found by the hashes that git prints:
+    try:
+        with open(os.devnull, 'wb') as devnull:
+            rev = subprocess.check_output(['git', 'rev-parse', '--short',
+                                           'HEAD'], cwd=bench_dir,
+                                          stderr=devnull).strip()
+            if subprocess.call(['git', 'diff', '--quiet', 'HEAD'],
+                               cwd=bench_dir, stdout=devnull, stderr=devnull):
+                rev += '-dirty'
+            return rev
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def full_revision(rev):
+    """
+    Expand a git revision (e.g., 'HEAD~1') into an abbreviated commit hash.
+    """
+
+    try:
+        with open(os.devnull, 'wb') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', '--short',
+                                            rev], cwd=bench_dir,
+                                           stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return rev
+
+def versions():
+    """
+    Versions of the interpreter and of the packages in `PACKAGES`.
+    """
+
+    import platform
+
+    v = {'python': platform.python_version()}
+    for name in PACKAGES:
+        try:
+            v[name] = importlib.import_module(name).__version__
+        except (ImportError, AttributeError):
+            v[name] = None
+    return v
+
+def env_hash(v):
+    """
+    Short hash identifying a set of package versions.
+    """
+
+    return hashlib.sha1(json.dumps(v, sort_keys=True)).hexdigest()[:8]
+
+def timing_results(df):
+    """
+    Convert trials returned by `sweep.sweep()` into benchmark results.
+
+    Each configuration of the sweep becomes a benchmark named after its
+    backend, transport, number of LPUs and graded potential ports; the
+    number of spiking ports is used as the size and the step durations of
+    the successful trials as the times.
+    """
+
+    results = []
+    for k, g in df.groupby(['backend', 'transport', 'lpus', 'gpot', 'spike']):
+        backend, transport, lpus, gpot, spike = k
+        ok = g[g['status'] == 'ok']
+        results.append({'name': 'timing.%s.%s.lpus%i.gpot%i' % \
+                        (backend, transport, lpus, gpot),
+                        'size': int(spike), 'times': ok['step_time'].tolist(),
+                        'number': 1, 'failures': len(g)-len(ok)})
+    return results
+
+def run(benchmarks='.', sizes=None, repeats=5, timing=False):
+    """
+    Run the benchmarks.
+
+    Parameters
+    ----------
+    benchmarks : str
+        Regular expression matching the names of the benchmarks in
+        api/suite.py to run.
+    sizes : list of int
+        Numbers of ports; the suite's defaults up to 10^5 are used if not
+        specified.
+    repeats : int
+        Measurements per benchmark and size.
+    timing : bool
+        If True, also run a small sweep of timing_demo.py with the in-process
+        manager.
+
+    Returns
+    -------
+    result : dict
+        Dict with the keys 'revision', 'date', 'versions', 'env_hash', and
+        'results'; the latter is a list of dicts as described in
+        `suite.run()`.
+    """
+
+    import re
+    import suite
+
+    if sizes is None:
+        sizes = [10**k for k in xrange(2, 6)]
+    names = sorted([name for name in suite.BENCHMARKS \
+                    if re.search(benchmarks, name)])
+    results = suite.run(names, sorted(sizes), repeats)['results']
+    if timing:
+        import sweep
+        results += timing_results(sweep.sweep([2, 4], [100, 1000], [0], 100,
+                                              repeats, backend='local'))
+    v = versions()
+    return {'revision': revision(),
+            'date': datetime.datetime.utcnow().isoformat(),
+            'versions': v, 'env_hash': env_hash(v),
+            'results': results}
+
+def store(result, store_dir):
+    """
+    Write a result to a file in a result store.
+
+    Returns
+    -------
+    file_name : str
+        Name of the written file.
+    """
+
+    if not os.path.exists(store_dir):
+        os.makedirs(store_dir)
+    date = result['date'][:19].replace('-', '').replace(':', '')
+    file_name = os.path.join(store_dir, '%s-%s-%s.json' % \
+                             (date, result['revision'], result['env_hash']))
+    with open(file_name, 'w') as f:
+        json.dump(result, f, indent=1)
+    return file_name
+
+def load(key, store_dir):
+    """
+    Load a stored result.
+
+    Parameters
+    ----------
+    key : str
+        Name of a result file, or git revision (or prefix of an abbreviated
+        commit hash); if several stored results match a revision, the most
+        recent is loaded.
+    store_dir : str
+        Directory containing stored results.
+
+    Returns
+    -------
+    result : dict
+        Stored result.
+    """
+
+    if os.path.isfile(key):
+        file_name = key
+    else:
+        rev = full_revision(key)
+        files = sorted([f for f in glob.glob(os.path.join(store_dir, '*.json')) \
+                        if os.path.basename(f).split('-', 1)[1].startswith(rev)])
+        if not files:
+            raise ValueError('no stored result for %s' % key)
+        file_name = files[-1]
+    with open(file_name) as f:
+        return json.load(f)
+
+def mann_whitney(a, b, max_perms=20000):
+    """
+    One-sided Mann-Whitney U test.
+
+    Parameters
+    ----------
+    a, b : array_like
+        Samples.
+    max_perms : int
+        The exact distribution of the statistic is computed by enumerating
+        all assignments of the pooled samples to the two groups if there are
+        at most this many; otherwise, a normal approximation is used.
+
+    Returns
+    -------
+    p : float
+        Probability under the null hypothesis that both samples come from the
+        same distribution of obtaining a U statistic of `b` at least as large
+        as the observed one, i.e., evidence that the values in `b` tend to be
+        larger than those in `a`.
+    """
+
+    a = np.asarray(a, float)
+    b = np.asarray(b, float)
+    n, m = len(a), len(b)
+    if n == 0 or m == 0:
+        return float('nan')
+    ranks = pd.Series(np.concatenate([a, b])).rank().values
+    offset = m*(m+1)/2.0
+    u = ranks[n:].sum()-offset
+
+    n_perms = np.prod(np.arange(n+1, n+m+1, dtype=float))/\
+              np.prod(np.arange(1, m+1, dtype=float))
+    if n_perms <= max_perms:
+        combos = np.array(list(itertools.combinations(xrange(n+m), m)))
+        perm_u = ranks[combos].sum(1)-offset
+        return np.mean(perm_u >= u-1e-9)
+    else:
+        from math import erf, sqrt
+        mu = n*m/2.0
+        sigma = sqrt(n*m*(n+m+1)/12.0)
+        z = (u-mu-0.5)/sigma
+        return 0.5*(1-erf(z/sqrt(2)))
+
+def holm(p):
+    """
+    Adjust p-values for multiple comparisons with the Holm-Bonferroni method.
+
+    Parameters
+    ----------
+    p : array_like
+        p-values of the individual tests.
+
+    Returns
+    -------
+    q : numpy.ndarray
+        Adjusted p-values. Rejecting the hypotheses whose adjusted p-values
+        are below a significance level keeps the probability of rejecting any
+        true hypothesis below that level.
+    """
+
+    p = np.asarray(p, float)
+    order = np.argsort(p)
+    q = np.empty(len(p))
+    q[order] = np.minimum(1.0, np.maximum.accumulate(p[order]*\
+                                                     np.arange(len(p), 0, -1)))
+    return q
+
+def compare(base, new, alpha=0.05, threshold=0.25):
+    """
+    Compare the results of two benchmark runs.
+
+    Parameters
+    ----------
+    base, new : dict
+        Results returned by `run()` or `load()`.
+    alpha : float
+        Family-wise significance level of the tests over all compared
+        benchmarks.
+    threshold : float
+        Relative change of the median duration below which a benchmark is
+        deemed unchanged regardless of its significance.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        Median durations in both runs ('base', 'new'), their ratio, the
+        p-values of the tests for a slowdown and a speedup, and a 'status'
+        column containing 'slower', 'faster', or 'same', indexed by benchmark
+        name and size. Only benchmarks present in both runs are included.
+
+    Notes
+    -----
+    Each benchmark is tested for both a slowdown and a speedup; the p-values
+    of all of these tests are adjusted with `holm()` so that the chance of
+    reporting any change when there is none is at most `alpha` no matter how
+    many benchmarks are compared.
+    """
+
+    def times(result):
+        return {(r['name'], r['size']): r['times'] \
+                for r in result['results'] if r['times']}
+
+    t_base = times(base)
+    t_new = times(new)
+    rows = []
+    for k in sorted(set(t_base) & set(t_new)):
+        a, b = t_base[k], t_new[k]
+        rows.append(k+(np.median(a), np.median(b), np.median(b)/np.median(a),
+                       mann_whitney(a, b), mann_whitney(b, a)))
+    df = pd.DataFrame(rows, columns=['name', 'size', 'base', 'new', 'ratio',
+                                     'p_slower', 'p_faster'])
+    q = holm(np.concatenate([df['p_slower'].values, df['p_faster'].values]))
+    df['p_slower'], df['p_faster'] = q[:len(df)], q[len(df):]
+    df['status'] = 'same'
+    df.loc[(df['ratio'] > 1+threshold) & (df['p_slower'] < alpha),
+           'status'] = 'slower'
+    df.loc[(df['ratio'] < 1/(1+threshold)) & (df['p_faster'] < alpha),
+           'status'] = 'faster'
+    return df.set_index(['name', 'size'])
+
+def report(base, new, df, show_all=False):
+    """
+    Format the comparison of two benchmark runs.
+
+    Parameters
+    ----------
+    base, new : dict
+        Compared results.
+    df : pandas.DataFrame
+        Output of `compare()`.
+    show_all : bool
+        If True, list all benchmarks rather than only those that changed.
+
+    Returns
+    -------
+    s : str
+        Report listing the compared revisions, the packages whose versions
+        differ, and the benchmarks that changed, slowest first.
+    """
+
+    lines = ['base: %s (%s)' % (base['revision'], base['date'][:19]),
+             'new:  %s (%s)' % (new['revision'], new['date'][:19])]
+    for name in sorted(set(base['versions']) | set(new['versions'])):
+        v0 = base['versions'].get(name)
+        v1 = new['versions'].get(name)
+        if v0 != v1:
+            lines.append('%s: %s -> %s' % (name, v0, v1))
+    lines.append('')
+
+    shown = df if show_all else df[df['status'] != 'same']
+    if len(shown):
+        shown = shown.sort_values('ratio', ascending=False)
+        lines.append(shown.to_string(
+            formatters={'base': lambda x: '%.3g' % x,
+                        'new': lambda x: '%.3g' % x,
+                        'ratio': lambda x: '%.2f' % x,
+                        'p_slower': lambda x: '%.3g' % x,
+                        'p_faster': lambda x: '%.3g' % x}))
+        lines.append('')
+    counts = df['status'].value_counts()
+    lines.append('%i benchmarks compared: %i slower, %i faster' % \
+                 (len(df), counts.get('slower', 0), counts.get('faster', 0)))
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--store_dir',
+                        default=os.path.join(bench_dir, 'results'),
+                        help='Result store directory [default: %(default)s]')
+    subparsers = parser.add_subparsers(dest='command')
+
+    p = subparsers.add_parser('run', help='Run benchmarks and store results')
+    p.add_argument('-b', '--benchmarks', default='.',
+                   help='Regular expression matching the names of the ' \
+                   'benchmarks to run [default: all]')
+    p.add_argument('-s', '--sizes', default=None, type=int, nargs='+',
+                   help='Numbers of ports [default: 100 ... 100000]')
+    p.add_argument('-r', '--repeats', default=5, type=int,
+                   help='Measurements per size [default: %(default)s]')
+    p.add_argument('--timing', action='store_true',
+                   help='Also run a small timing_demo.py sweep')
+    p.add_argument('-c', '--compare', default=None, metavar='BASE',
+                   help='Compare with this stored result after running')
+
+    q = subparsers.add_parser('compare', help='Compare two stored results')
+    q.add_argument('base', help='Revision or file of the baseline')
+    q.add_argument('new', nargs='?', default=None,
+                   help='Revision or file of the new result ' \
+                   '[default: most recent]')
+    for q in [p, q]:
+        q.add_argument('-a', '--alpha', default=0.05, type=float,
+                       help='Family-wise significance level ' \
+                       '[default: %(default)s]')
+        q.add_argument('-t', '--threshold', default=0.25, type=float,
+                       help='Relative change ignored regardless of ' \
+                       'significance [default: %(default)s]')
+        q.add_argument('--all', action='store_true',
+                       help='Report unchanged benchmarks too')
+
+    subparsers.add_parser('list', help='List stored results')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for f in sorted(glob.glob(os.path.join(args.store_dir, '*.json'))):
+            with open(f) as fp:
+                r = json.load(fp)
+            print '%s  %-16s %s  %s' % \
+                (r['date'][:19], r['revision'], r['env_hash'],
+                 ' '.join(['%s=%s' % kv for kv in sorted(r['versions'].items())]))
+        sys.exit(0)
+
+    if args.command == 'run':
+
+        # Load the baseline first so that the new result cannot be mistaken
+        # for it:
+        if args.compare is not None:
+            base = load(args.compare, args.store_dir)
+        new = run(args.benchmarks, args.sizes, args.repeats, args.timing)
+        print 'stored %s' % store(new, args.store_dir)
+        if args.compare is None:
+            sys.exit(0)
+    else:
+        base = load(args.base, args.store_dir)
+        if args.new is None:
+            files = sorted(glob.glob(os.path.join(args.store_dir, '*.json')))
+            if not files:
+                raise ValueError('no stored results')
+            args.new = files[-1]
+        new = load(args.new, args.store_dir)
+
+    df = compare(base, new, args.alpha, args.threshold)
+    print
+    print report(base, new, df, args.all)
+    if (df['status'] == 'slower').any():
+        sys.exit(1)
@@ -2,6 +2,8 @@
 
 """
 Run timing test (non-GPU) scaled over number of ports.
+
+Usage: run.py out_file [transport]
 """
 
 import csv
@@ -22,6 +24,7 @@ except ImportError:
 
 out_file = sys.argv[1]
 script_name = 'timing_demo.py'
+transport = sys.argv[2] if len(sys.argv) > 2 else 'mpi'
 trials = 3
 lpus = 2
 
@@ -45,7 +48,8 @@ for spikes in np.linspace(50, 15000, 25, dtype=int):
                                '-p', 'huxley',
                                'python', script_name,
                                '-u', str(lpus), '-s', str(spikes),
-                               '-g', '0', '-m', '50']])
+                               '-g', '0', '-m', '50',
+                               '-t', transport]])
         results.append(r)        
 f = open(out_file, 'w', 0)
 w = csv.writer(f)
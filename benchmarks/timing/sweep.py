@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+
+"""
+Sweep timing_demo.py over numbers of LPUs and ports on the local machine.
+
+Run with, e.g.,
+
+python sweep.py -u 2 4 8 -s 100 1000 -g 0 -n 5 -o results.csv
+python sweep.py -u 2 4 8 -s 100 1000 -g 0 -n 5 -c baseline.csv
+
+Each trial runs timing_demo.py in a separate process that is killed if it does
+not finish within a time limit; the MPI backend launches the emulation with the
+local mpiexec. The durations of all trials are written to a CSV file with one
+row per trial; the median and interquartile range of the duration of a step of
+each configuration are printed and, if a baseline CSV file written by an
+earlier sweep is specified, compared with those of the baseline. The script
+exits with a nonzero status if a configuration is significantly slower than in
+the baseline.
+"""
+
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+import psutil
+
+script_name = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'timing_demo.py')
+
+#: Parameters that identify a configuration:
+CONFIG = ['backend', 'transport', 'lpus', 'spike', 'gpot', 'steps']
+
+#: Durations printed by timing_demo.py after the numbers of LPUs and ports:
+TIMES = ['sync_time', 'total_time', 'main_time', 'loop_time']
+
+def _kill_tree(pid):
+    """
+    Kill a process and its descendants (e.g., mpiexec and the MPI processes).
+    """
+
+    try:
+        p = psutil.Process(pid)
+        procs = p.children(recursive=True)+[p]
+    except psutil.NoSuchProcess:
+        return
+    for q in procs:
+        try:
+            q.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+def run_trial(lpus, spike, gpot, steps, backend='mpi', transport='mpi',
+              timeout=300.0):
+    """
+    Run timing_demo.py once.
+
+    Parameters
+    ----------
+    lpus, spike, gpot, steps : int
+        Number of LPUs, spiking and graded potential ports exposed by each LPU
+        to each other LPU, and steps.
+    backend, transport : str
+        Execution backend and data transport passed to timing_demo.py.
+    timeout : float
+        Time limit in seconds.
+
+    Returns
+    -------
+    status : str
+        'ok', 'timeout', or 'error'.
+    times : dict of float
+        Durations in seconds keyed by the names in `TIMES`; empty unless the
+        trial succeeded.
+    """
+
+    cmd = [sys.executable, script_name, '-u', str(lpus), '-s', str(spike),
+           '-g', str(gpot), '-m', str(steps), '-b', backend, '-t', transport]
+    with open(os.devnull, 'wb') as devnull:
+        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=devnull)
+        deadline = time.time()+timeout
+        while p.poll() is None:
+            if time.time() > deadline:
+                _kill_tree(p.pid)
+                p.wait()
+                return 'timeout', {}
+            time.sleep(0.1)
+    if p.returncode != 0:
+        return 'error', {}
+
+    # The results are printed as a list on the last line of the output:
+    lines = [l for l in p.stdout.read().splitlines() if l.startswith('[')]
+    if not lines:
+        return 'error', {}
+    values = lines[-1].strip('[]').split(',')
+    return 'ok', dict(zip(TIMES, map(float, values[2:])))
+
+def sweep(lpus, spikes, gpots, steps, trials, backend='mpi', transport='mpi',
+          timeout=300.0, verbose=True):
+    """
+    Run timing_demo.py for every combination of the specified parameters.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        One row per trial with the columns in `CONFIG`, 'trial', 'status',
+        the columns in `TIMES` (NaN for failed trials), and 'step_time' (the
+        duration of the run loop divided by the number of steps).
+    """
+
+    rows = []
+    for n_lpu, n_spike, n_gpot in itertools.product(lpus, spikes, gpots):
+        for trial in xrange(trials):
+            status, times = run_trial(n_lpu, n_spike, n_gpot, steps,
+                                      backend, transport, timeout)
+            row = dict(zip(CONFIG, [backend, transport, n_lpu, n_spike, n_gpot,
+                                    steps]))
+            row['trial'] = trial
+            row['status'] = status
+            for k in TIMES:
+                row[k] = times.get(k, float('nan'))
+            rows.append(row)
+            if verbose:
+                print 'lpus=%i spike=%i gpot=%i trial=%i: %s %s' % \
+                    (n_lpu, n_spike, n_gpot, trial, status,
+                     '%.3g s' % times['loop_time'] if times else '')
+                sys.stdout.flush()
+    df = pd.DataFrame(rows, columns=CONFIG+['trial', 'status']+TIMES)
+    df['step_time'] = df['loop_time']/df['steps']
+    return df
+
+def summarize(df, quantity='step_time'):
+    """
+    Compute the median and interquartile range of a duration per configuration.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Trials returned by `sweep()`.
+    quantity : str
+        Column of `df` to summarize.
+
+    Returns
+    -------
+    s : pandas.DataFrame
+        Median, interquartile range ('iqr'), and numbers of successful and
+        failed trials ('trials', 'failures') indexed by the columns in
+        `CONFIG`. Configurations without any successful trials have a NaN
+        median.
+    """
+
+    g = df.groupby(CONFIG)
+    ok = df[df['status'] == 'ok'].groupby(CONFIG)[quantity]
+    s = pd.DataFrame({'median': ok.median(),
+                      'iqr': ok.quantile(0.75)-ok.quantile(0.25),
+                      'trials': ok.count()},
+                     index=g.size().index)
+    s['failures'] = g.size()-s['trials'].fillna(0)
+    s['trials'] = s['trials'].fillna(0).astype(int)
+    s['failures'] = s['failures'].astype(int)
+    return s[['median', 'iqr', 'trials', 'failures']]
+
+def compare(s, baseline, tolerance=0.1):
+    """
+    Compare summarized durations with those of a baseline.
+
+    Parameters
+    ----------
+    s, baseline : pandas.DataFrame
+        Outputs of `summarize()`.
+    tolerance : float
+        Relative slowdown above which a configuration is deemed to have
+        regressed.
+
+    Returns
+    -------
+    c : pandas.DataFrame
+        Medians of both sweeps ('median', 'baseline'), their ratio, and a
+        boolean 'regression' column for the configurations present in both.
+        A configuration has regressed if its median exceeds the baseline
+        median by more than the specified fraction and by more than the sum
+        of the interquartile ranges of both sweeps.
+    """
+
+    c = s[['median', 'iqr']].join(baseline[['median', 'iqr']], how='inner',
+                                  rsuffix='_baseline')
+    c['ratio'] = c['median']/c['median_baseline']
+    c['regression'] = (c['ratio'] > 1+tolerance) & \
+        (c['median']-c['median_baseline'] > c['iqr']+c['iqr_baseline'])
+    c = c.rename(columns={'median_baseline': 'baseline'})
+    return c[['median', 'baseline', 'ratio', 'regression']]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-u', '--num_lpus', default=[2, 4], type=int,
+                        nargs='+', help='Numbers of LPUs [default: 2 4]')
+    parser.add_argument('-s', '--num_spike', default=[100, 1000], type=int,
+                        nargs='+',
+                        help='Numbers of spiking ports [default: 100 1000]')
+    parser.add_argument('-g', '--num_gpot', default=[0], type=int, nargs='+',
+                        help='Numbers of graded potential ports [default: 0]')
+    parser.add_argument('-m', '--max_steps', default=100, type=int,
+                        help='Number of steps [default: %(default)s]')
+    parser.add_argument('-n', '--trials', default=3, type=int,
+                        help='Trials per configuration [default: %(default)s]')
+    parser.add_argument('-b', '--backend', default='mpi', type=str,
+                        choices=['local', 'mpi', 'multiproc'],
+                        help='Execution backend [default: %(default)s]')
+    parser.add_argument('-t', '--transport', default='mpi', type=str,
+                        help='Data transport [default: %(default)s]')
+    parser.add_argument('--timeout', default=300.0, type=float,
+                        help='Time limit of each trial in seconds ' \
+                        '[default: %(default)s]')
+    parser.add_argument('-o', '--out_file', default=None,
+                        help='Write trials to this CSV file')
+    parser.add_argument('-c', '--baseline', default=None,
+                        help='Compare with trials read from this CSV file')
+    parser.add_argument('--tolerance', default=0.1, type=float,
+                        help='Relative slowdown deemed a regression ' \
+                        '[default: %(default)s]')
+    args = parser.parse_args()
+
+    df = sweep(args.num_lpus, args.num_spike, args.num_gpot, args.max_steps,
+               args.trials, args.backend, args.transport, args.timeout)
+    if args.out_file is not None:
+        df.to_csv(args.out_file, index=False)
+    s = summarize(df)
+    print
+    print s.to_string(float_format=lambda x: '%.3g' % x)
+
+    if args.baseline is not None:
+        c = compare(s, summarize(pd.read_csv(args.baseline)), args.tolerance)
+        print
+        print c.to_string(float_format=lambda x: '%.3g' % x)
+        if c['regression'].any():
+            print
+            print '%i of %i configurations slower than baseline' % \
+                (c['regression'].sum(), len(c))
+            sys.exit(1)
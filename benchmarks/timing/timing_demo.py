@@ -8,11 +8,11 @@ import argparse
 import itertools
 import time
 
-from mpi4py import MPI
 import numpy as np
 
 from neurokernel.tools.logging import setup_logger
-from neurokernel.core import CTRL_TAG, GPOT_TAG, SPIKE_TAG, Manager, Module
+from neurokernel.core import CTRL_TAG, GPOT_TAG, SPIKE_TAG, MANAGERS, Module, \
+     get_manager
 from neurokernel.pattern import Pattern
 from neurokernel.plsel import Selector, SelectorMethods
 
@@ -31,7 +31,7 @@ class MyModule(Module):
                  ctrl_tag=CTRL_TAG, gpot_tag=GPOT_TAG, spike_tag=SPIKE_TAG,
                  id=None, device=None,
                  routing_table=None, rank_to_id=None,
-                 debug=False, time_sync=False):
+                 debug=False, time_sync=False, transport='mpi'):
         if data_gpot is None:
             data_gpot = np.zeros(SelectorMethods.count_ports(sel_gpot), float)
         if data_spike is None:
@@ -42,7 +42,7 @@ class MyModule(Module):
                  ctrl_tag, gpot_tag, spike_tag,
                  id, device,
                  routing_table, rank_to_id,
-                 debug, time_sync)
+                 debug, time_sync, transport)
 
         self.pm['gpot'][self.interface.out_ports().gpot_ports(tuples=True)] = 1.0
         self.pm['spike'][self.interface.out_ports().spike_ports(tuples=True)] = 1
@@ -145,7 +145,7 @@ def gen_sels(n_lpu, n_spike, n_gpot):
 
     return mod_sels, pat_sels
 
-def emulate(n_lpu, n_spike, n_gpot, steps):
+def emulate(n_lpu, n_spike, n_gpot, steps, transport='mpi', backend='mpi'):
     """
     Benchmark inter-LPU communication throughput.
 
@@ -166,6 +166,13 @@ def emulate(n_lpu, n_spike, n_gpot, steps):
         have 2*n_gpot*(n_lpu-1) total graded potential ports.
     steps : int
         Number of steps to execute.
+    transport : str
+        Transport used to exchange data between modules (e.g., 'mpi' for
+        two-sided or 'rma' for one-sided communication). Ignored by the
+        'local' and 'multiproc' backends.
+    backend : str
+        Name of the manager used to run the emulation (see
+        `neurokernel.core.get_manager()`).
 
     Returns
     -------
@@ -179,7 +186,7 @@ def emulate(n_lpu, n_spike, n_gpot, steps):
     start_all = time.time()
 
     # Set up manager:
-    man = Manager()
+    man = get_manager(backend)()
 
     # Generate selectors for configuring modules and patterns:
     mod_sels, pat_sels = gen_sels(n_lpu, n_spike, n_gpot)
@@ -190,7 +197,8 @@ def emulate(n_lpu, n_spike, n_gpot, steps):
         sel, sel_in, sel_out, sel_gpot, sel_spike = mod_sels[lpu_i]
         man.add(MyModule, lpu_i, sel, sel_in, sel_out, sel_gpot, sel_spike,
                 None, None, ['interface', 'io', 'type'],
-                CTRL_TAG, GPOT_TAG, SPIKE_TAG, time_sync=True)
+                CTRL_TAG, GPOT_TAG, SPIKE_TAG, time_sync=True,
+                transport=transport)
 
     # Set up connections between module pairs:
     for i, j in itertools.combinations(xrange(n_lpu), 2):
@@ -208,7 +216,7 @@ def emulate(n_lpu, n_spike, n_gpot, steps):
         pat.interface[sel_out_j, 'interface', 'io'] = [1, 'out']
         pat.interface[sel_gpot_j, 'interface', 'type'] = [1, 'gpot']
         pat.interface[sel_spike_j, 'interface', 'type'] = [1, 'spike']
-        man.connect(lpu_i, lpu_j, pat, 0, 1, compat_check=False)
+        man.connect(lpu_i, lpu_j, pat, 0, 1)
 
     man.spawn()
     start_main = time.time()
@@ -219,8 +227,6 @@ def emulate(n_lpu, n_spike, n_gpot, steps):
         (man.stop_time-man.start_time)
 
 if __name__ == '__main__':
-    import neurokernel.mpi_relaunch
-
     num_lpus = 2
     num_gpot = 100
     num_spike = 100
@@ -240,8 +246,22 @@ if __name__ == '__main__':
                         help='Number of graded potential ports [default: %s]' % num_gpot)
     parser.add_argument('-m', '--max_steps', default=max_steps, type=int,
                         help='Maximum number of steps [default: %s]' % max_steps)
+    parser.add_argument('-t', '--transport', default='mpi', type=str,
+                        help='Data transport [mpi, shm, or rma; default: mpi]')
+    parser.add_argument('-b', '--backend', default='mpi', type=str,
+                        choices=sorted(MANAGERS.keys()),
+                        help='Execution backend [default: mpi]')
     args = parser.parse_args()
 
+    # Only the MPI backend needs to spawn processes; the other backends do not
+    # import mpi4py.MPI (and thereby initialize MPI) at all:
+    if args.backend == 'mpi':
+        import neurokernel.mpi_relaunch
+        from mpi4py import MPI
+        mpi_comm = MPI.COMM_WORLD
+    else:
+        mpi_comm = None
+
     file_name = None
     screen = False
     if args.log.lower() in ['file', 'both']:
@@ -249,8 +269,9 @@ if __name__ == '__main__':
     if args.log.lower() in ['screen', 'both']:
         screen = True
     logger = setup_logger(file_name=file_name, screen=screen,
-                          mpi_comm=MPI.COMM_WORLD,
+                          mpi_comm=mpi_comm,
                           multiline=True)
 
     print list((args.num_lpus, args.num_spike)+\
-               emulate(args.num_lpus, args.num_spike, args.num_gpot, args.max_steps))
+               emulate(args.num_lpus, args.num_spike, args.num_gpot, args.max_steps,
+                       args.transport, args.backend))
@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+
+"""
+Create and run empty LPUs connected by a synthetic connectome.
+
+Unlike timing_connectome_demo_gpu.py, this benchmark does not require a GPU,
+PyCUDA, METIS, LMDB or the connectivity matrix of an actual connectome; the
+numbers of ports connecting each pair of LPUs are drawn at random from a
+configurable model, and the emulation runs with the CPU module and manager
+classes in neurokernel.core (or one of the single-node managers).
+
+Run with, e.g.,
+
+python synthetic.py -u 20 -f 4 -p 500 --model power_law --locality 2 -m 100
+python synthetic.py -u 20 -f 4 -p 500 --stats -o patterns
+"""
+
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+
+from neurokernel.core import CTRL_TAG, GPOT_TAG, SPIKE_TAG, MANAGERS, Module, \
+     get_manager
+from neurokernel.pattern import Pattern
+from neurokernel.plsel import Selector, SelectorMethods
+from neurokernel.tools.logging import setup_logger
+
+class MyModule(Module):
+    """
+    Empty module class.
+
+    This module class doesn't do anything in its execution step apart from
+    transmit/receive dummy data. All spike ports are assumed to
+    produce/consume data at every step.
+    """
+
+    def __init__(self, sel, sel_in, sel_out,
+                 sel_gpot, sel_spike, data_gpot, data_spike,
+                 columns=['interface', 'io', 'type'],
+                 ctrl_tag=CTRL_TAG, gpot_tag=GPOT_TAG, spike_tag=SPIKE_TAG,
+                 id=None, device=None,
+                 routing_table=None, rank_to_id=None,
+                 debug=False, time_sync=False, transport='mpi'):
+        if data_gpot is None:
+            data_gpot = np.zeros(SelectorMethods.count_ports(sel_gpot), float)
+        if data_spike is None:
+            data_spike = np.zeros(SelectorMethods.count_ports(sel_spike), int)
+        super(MyModule, self).__init__(sel, sel_in, sel_out,
+                 sel_gpot, sel_spike, data_gpot, data_spike,
+                 columns,
+                 ctrl_tag, gpot_tag, spike_tag,
+                 id, device,
+                 routing_table, rank_to_id,
+                 debug, time_sync, transport)
+
+        self.pm['gpot'][self.interface.out_ports().gpot_ports(tuples=True)] = 1.0
+        self.pm['spike'][self.interface.out_ports().spike_ports(tuples=True)] = 1
+
+def gen_conn_mats(n_lpu, ports=100, fan_out=None, model='random',
+                  exponent=2.5, locality=None, spike_fraction=1.0, seed=None):
+    """
+    Generate random numbers of ports connecting LPUs.
+
+    Parameters
+    ----------
+    n_lpu : int
+        Number of LPUs. Must be at least 2.
+    ports : float
+        Mean number of ports in each connection from one LPU to another.
+    fan_out : float
+        Mean number of LPUs to which each LPU transmits data. All LPUs are
+        connected to each other if not specified.
+    model : {'random', 'power_law'}
+        Model of the graph of LPUs. In the 'random' model, each connection
+        is equally likely. In the 'power_law' model, each LPU is assigned a
+        weight drawn from a Pareto distribution with the specified exponent;
+        the probability of a connection and its mean number of ports are
+        proportional to the product of the weights of the connected LPUs, so
+        that a few hub LPUs account for most of the traffic.
+    exponent : float
+        Exponent of the power law governing the weights of the LPUs in the
+        'power_law' model. Must exceed 2.
+    locality : float
+        If specified, the LPUs are arranged on a ring and the probability of
+        a connection decays exponentially with the distance between the
+        connected LPUs with this length scale (in LPUs).
+    spike_fraction : float
+        Expected fraction of the ports in each connection that transmit
+        spikes; the others transmit graded potentials.
+    seed : int
+        Seed of the random number generator.
+
+    Returns
+    -------
+    spike_mat, gpot_mat : numpy.ndarray
+        Square arrays containing the numbers of spiking and graded potential
+        ports transmitting data from the LPU corresponding to the row index to
+        the LPU corresponding to the column index. The diagonals are zero.
+
+    Notes
+    -----
+    The connection probabilities are scaled so that the mean fan-out matches
+    `fan_out`; probabilities that would exceed 1 are clipped, so the actual
+    fan-out may be lower for very heterogeneous or local graphs.
+    """
+
+    assert n_lpu >= 2
+    assert ports >= 1
+    assert 0 <= spike_fraction <= 1
+    rng = np.random.RandomState(seed)
+    if fan_out is None:
+        fan_out = n_lpu-1
+    fan_out = min(fan_out, n_lpu-1)
+
+    if model == 'random':
+        w = np.ones(n_lpu)
+    elif model == 'power_law':
+        assert exponent > 2
+        w = rng.pareto(exponent-1, n_lpu)+1
+    else:
+        raise ValueError('unrecognized model %s' % model)
+    weight = np.outer(w, w)
+    np.fill_diagonal(weight, 0)
+
+    prob = weight.copy()
+    if locality is not None:
+        i = np.arange(n_lpu)
+        d = np.abs(i[:, None]-i[None, :])
+        d = np.minimum(d, n_lpu-d)
+        prob *= np.exp(-d/float(locality))
+    prob = np.minimum(prob*fan_out*n_lpu/prob.sum(), 1)
+    adj = rng.rand(n_lpu, n_lpu) < prob
+
+    # Every connection has at least one port:
+    mean = ports*weight/weight[adj].mean() if adj.any() else weight
+    counts = np.where(adj, rng.poisson(np.maximum(mean-1, 0))+1, 0)
+    spike_mat = rng.binomial(counts, spike_fraction)
+    return spike_mat, counts-spike_mat
+
+def _sel(lpu, io, t, other, n):
+    return Selector('/%s/%s/%s/%s[0:%i]' % (lpu, io, t, other, n) if n else '')
+
+def gen_sels(spike_mat, gpot_mat):
+    """
+    Generate port selectors for LPUs connected by a synthetic connectome.
+
+    Parameters
+    ----------
+    spike_mat, gpot_mat : numpy.ndarray
+        Square arrays containing the numbers of spiking and graded potential
+        ports transmitting data between LPUs (which correspond to the row and
+        column indices).
+
+    Returns
+    -------
+    mod_sels : dict of tuples
+        Ports in module interfaces; the keys are the module IDs and the values
+        are tuples containing the respective selectors for all ports, all
+        input ports, all output ports, all graded potential, and all spiking
+        ports. LPUs that are not connected to any other LPU are omitted.
+    pat_sels : dict of tuples
+        Ports in pattern interfaces; the keys are tuples containing the two
+        module IDs connected by the pattern and the values are tuples
+        containing the respective selectors for all source ports, all
+        destination ports, and the input, output, graded potential, and
+        spiking ports connected to the first module and to the second module.
+    """
+
+    spike_mat = np.asarray(spike_mat)
+    gpot_mat = np.asarray(gpot_mat)
+    assert spike_mat.shape == gpot_mat.shape
+    n_lpu = spike_mat.shape[0]
+    lpu_ids = ['lpu%s' % i for i in xrange(n_lpu)]
+
+    # Ports exposed by module i are structured as
+    # /lpu_i/in_or_out/gpot_or_spike/lpu_j[0:n]
+    # where in_or_out is relative to module i:
+    def port_sels(i, j):
+        out_gpot = _sel(lpu_ids[i], 'out', 'gpot', lpu_ids[j], gpot_mat[i, j])
+        out_spike = _sel(lpu_ids[i], 'out', 'spike', lpu_ids[j],
+                         spike_mat[i, j])
+        in_gpot = _sel(lpu_ids[i], 'in', 'gpot', lpu_ids[j], gpot_mat[j, i])
+        in_spike = _sel(lpu_ids[i], 'in', 'spike', lpu_ids[j], spike_mat[j, i])
+        return out_gpot, out_spike, in_gpot, in_spike
+
+    mod_sels = {}
+    for i in xrange(n_lpu):
+        sels = [port_sels(i, j) for j in xrange(n_lpu) if j != i]
+        out_gpot, out_spike, in_gpot, in_spike = \
+            [Selector.union(*s) for s in zip(*sels)]
+        sel = Selector.union(in_gpot, in_spike, out_gpot, out_spike)
+        if not len(sel):
+            continue
+        mod_sels[lpu_ids[i]] = (sel,
+                                Selector.union(in_gpot, in_spike),
+                                Selector.union(out_gpot, out_spike),
+                                Selector.union(in_gpot, out_gpot),
+                                Selector.union(in_spike, out_spike))
+
+    pat_sels = {}
+    for i, j in itertools.combinations(xrange(n_lpu), 2):
+        out_gpot_i, out_spike_i, in_gpot_i, in_spike_i = port_sels(i, j)
+        out_gpot_j, out_spike_j, in_gpot_j, in_spike_j = port_sels(j, i)
+
+        # The individual 'from' and 'to' ports must line up for
+        # Pattern.from_concat to produce the right pattern:
+        sel_from = Selector.add(out_gpot_i, out_spike_i, out_gpot_j, out_spike_j)
+        sel_to = Selector.add(in_gpot_j, in_spike_j, in_gpot_i, in_spike_i)
+        if len(sel_from):
+            pat_sels[(lpu_ids[i], lpu_ids[j])] = \
+                (sel_from, sel_to,
+                 Selector.union(in_gpot_i, in_spike_i),
+                 Selector.union(out_gpot_i, out_spike_i),
+                 Selector.union(in_gpot_i, out_gpot_i),
+                 Selector.union(in_spike_i, out_spike_i),
+                 Selector.union(in_gpot_j, in_spike_j),
+                 Selector.union(out_gpot_j, out_spike_j),
+                 Selector.union(in_gpot_j, out_gpot_j),
+                 Selector.union(in_spike_j, out_spike_j))
+    return mod_sels, pat_sels
+
+def gen_patterns(pat_sels):
+    """
+    Create the patterns connecting LPUs.
+
+    Parameters
+    ----------
+    pat_sels : dict of tuples
+        Pattern selectors returned by `gen_sels()`.
+
+    Returns
+    -------
+    patterns : dict of Pattern
+        Patterns keyed by the tuples of the IDs of the two connected modules;
+        interface 0 of each pattern is connected to the first module.
+    """
+
+    patterns = {}
+    for (lpu_i, lpu_j), sels in pat_sels.iteritems():
+        sel_from, sel_to, sel_in_i, sel_out_i, sel_gpot_i, sel_spike_i, \
+            sel_in_j, sel_out_j, sel_gpot_j, sel_spike_j = sels
+        pat = Pattern.from_concat(sel_from, sel_to,
+                                  from_sel=sel_from, to_sel=sel_to, data=1,
+                                  validate=False)
+        for k, sel_in, sel_out, sel_gpot, sel_spike in \
+                [(0, sel_in_i, sel_out_i, sel_gpot_i, sel_spike_i),
+                 (1, sel_in_j, sel_out_j, sel_gpot_j, sel_spike_j)]:
+            for sel, col, value in [(sel_in, 'io', 'in'),
+                                    (sel_out, 'io', 'out'),
+                                    (sel_gpot, 'type', 'gpot'),
+                                    (sel_spike, 'type', 'spike')]:
+                if len(sel):
+                    pat.interface[sel, 'interface', col] = [k, value]
+        patterns[(lpu_i, lpu_j)] = pat
+    return patterns
+
+def describe(spike_mat, gpot_mat):
+    """
+    Summarize a synthetic connectome.
+
+    Returns
+    -------
+    stats : dict
+        Numbers of connected LPUs ('lpus'), directed connections between LPUs
+        ('connections'), spiking and graded potential ports transmitting data
+        ('spike', 'gpot'), and the largest numbers of output and input ports
+        of any LPU ('max_out', 'max_in').
+    """
+
+    total = np.asarray(spike_mat)+np.asarray(gpot_mat)
+    return {'lpus': int(((total.sum(0)+total.sum(1)) > 0).sum()),
+            'connections': int((total > 0).sum()),
+            'spike': int(np.sum(spike_mat)),
+            'gpot': int(np.sum(gpot_mat)),
+            'max_out': int(total.sum(1).max()),
+            'max_in': int(total.sum(0).max())}
+
+def emulate(spike_mat, gpot_mat, steps, transport='mpi', backend='mpi',
+            patterns=None):
+    """
+    Benchmark inter-LPU communication throughput of a synthetic connectome.
+
+    Parameters
+    ----------
+    spike_mat, gpot_mat : numpy.ndarray
+        Square arrays containing the numbers of spiking and graded potential
+        ports transmitting data between LPUs.
+    steps : int
+        Number of steps to execute.
+    transport : str
+        Transport used to exchange data between modules. Ignored by the
+        'local' and 'multiproc' backends.
+    backend : str
+        Name of the manager used to run the emulation (see
+        `neurokernel.core.get_manager()`).
+    patterns : dict of Pattern
+        Patterns returned by `gen_patterns()`; generated if not specified.
+
+    Returns
+    -------
+    average_step_sync_time : float
+        Average duration of the synchronization of a step in seconds.
+    total_time, main_time, loop_time : float
+        Durations in seconds of the whole benchmark, of the emulation after
+        the modules are spawned, and of the modules' run loops.
+    """
+
+    # Time everything starting with manager initialization:
+    start_all = time.time()
+    man = get_manager(backend)()
+    mod_sels, pat_sels = gen_sels(spike_mat, gpot_mat)
+    if patterns is None:
+        patterns = gen_patterns(pat_sels)
+
+    for lpu_i in sorted(mod_sels, key=lambda s: int(s[3:])):
+        sel, sel_in, sel_out, sel_gpot, sel_spike = mod_sels[lpu_i]
+        man.add(MyModule, lpu_i, sel, sel_in, sel_out, sel_gpot, sel_spike,
+                None, None, ['interface', 'io', 'type'],
+                CTRL_TAG, GPOT_TAG, SPIKE_TAG, time_sync=True,
+                transport=transport)
+    for (lpu_i, lpu_j), pat in patterns.iteritems():
+        man.connect(lpu_i, lpu_j, pat, 0, 1)
+
+    man.spawn()
+    start_main = time.time()
+    man.start(steps)
+    man.wait()
+    stop_main = time.time()
+    return man.average_step_sync_time, (time.time()-start_all), \
+        (stop_main-start_main), (man.stop_time-man.start_time)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-l', '--log', default='none', type=str,
+                        help='Log output to screen [file, screen, both, or none; default:none]')
+    parser.add_argument('-u', '--num_lpus', default=10, type=int,
+                        help='Number of LPUs [default: %(default)s]')
+    parser.add_argument('-p', '--ports', default=100, type=float,
+                        help='Mean ports per connection [default: %(default)s]')
+    parser.add_argument('-f', '--fan_out', default=None, type=float,
+                        help='Mean number of LPUs to which each LPU ' \
+                        'transmits data [default: all]')
+    parser.add_argument('--model', default='random',
+                        choices=['power_law', 'random'],
+                        help='Graph model [default: %(default)s]')
+    parser.add_argument('--exponent', default=2.5, type=float,
+                        help='Power law exponent [default: %(default)s]')
+    parser.add_argument('--locality', default=None, type=float,
+                        help='Length scale of connection probability decay ' \
+                        'on a ring of LPUs [default: none]')
+    parser.add_argument('-s', '--spike_fraction', default=1.0, type=float,
+                        help='Fraction of spiking ports [default: %(default)s]')
+    parser.add_argument('--seed', default=0, type=int,
+                        help='Random seed [default: %(default)s]')
+    parser.add_argument('-m', '--max_steps', default=100, type=int,
+                        help='Number of steps [default: %(default)s]')
+    parser.add_argument('-t', '--transport', default='mpi', type=str,
+                        help='Data transport [default: %(default)s]')
+    parser.add_argument('-b', '--backend', default='mpi', type=str,
+                        choices=sorted(MANAGERS.keys()),
+                        help='Execution backend [default: %(default)s]')
+    parser.add_argument('-o', '--out_dir', default=None,
+                        help='Save the connectivity matrices and patterns ' \
+                        'to this directory and exit')
+    parser.add_argument('--stats', action='store_true',
+                        help='Print a summary of the connectome')
+    args = parser.parse_args()
+
+    # Only the MPI backend imports mpi4py.MPI (and thereby initializes MPI):
+    if args.backend == 'mpi':
+        if args.out_dir is None:
+            import neurokernel.mpi_relaunch
+        from mpi4py import MPI
+        mpi_comm = MPI.COMM_WORLD
+    else:
+        mpi_comm = None
+
+    file_name = None
+    screen = False
+    if args.log.lower() in ['file', 'both']:
+        file_name = 'neurokernel.log'
+    if args.log.lower() in ['screen', 'both']:
+        screen = True
+    logger = setup_logger(file_name=file_name, screen=screen,
+                          mpi_comm=mpi_comm,
+                          multiline=True)
+
+    spike_mat, gpot_mat = gen_conn_mats(args.num_lpus, args.ports,
+                                        args.fan_out, args.model,
+                                        args.exponent, args.locality,
+                                        args.spike_fraction, args.seed)
+    if args.stats:
+        print ', '.join(['%s: %i' % kv for kv in \
+                         sorted(describe(spike_mat, gpot_mat).items())])
+
+    if args.out_dir is not None:
+        if not os.path.exists(args.out_dir):
+            os.makedirs(args.out_dir)
+        np.savez(os.path.join(args.out_dir, 'conn_mats.npz'),
+                 spike=spike_mat, gpot=gpot_mat)
+        mod_sels, pat_sels = gen_sels(spike_mat, gpot_mat)
+        for (lpu_i, lpu_j), pat in gen_patterns(pat_sels).iteritems():
+            pat.save(os.path.join(args.out_dir, '%s-%s.npz' % (lpu_i, lpu_j)))
+    else:
+        print list((args.num_lpus, int(spike_mat.sum()+gpot_mat.sum()))+\
+                   emulate(spike_mat, gpot_mat, args.max_steps,
+                           args.transport, args.backend))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+"""
+Time the exchange of port data between processes with different transports.
+
+Run with mpiexec, e.g.,
+
+mpiexec -n 4 python exchange.py -t mpi shm rma zmq
+
+Each process transmits data to and receives data from its two neighbors in a
+ring; the transports are exercised directly without instantiating modules.
+"""
+
+import argparse
+import time
+
+from mpi4py import MPI
+import numpy as np
+
+from neurokernel.tools.misc import bufint, dtype_to_mpi
+from neurokernel.transport import get_transport
+
+class _PortMapperStub(object):
+    def __init__(self, dtype):
+        self.dtype = np.dtype(dtype)
+
+class RingEndpoint(object):
+    """
+    Object exposing the attributes of a module used by the transports.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+        Communicator of the benchmark processes.
+    n_gpot, n_spike : int
+        Number of graded potential and spiking values transmitted to each
+        neighbor.
+    """
+
+    time_sync = True
+    profiler = None
+    _gpot_tag = 2
+    _spike_tag = 3
+
+    def __init__(self, comm, n_gpot, n_spike):
+        r = comm.rank
+        n = comm.size
+        self.id = 'm%i' % r
+        self.intracomm = comm
+        self.pm = {'gpot': _PortMapperStub(np.double),
+                   'spike': _PortMapperStub(np.int32)}
+        lengths = {'gpot': n_gpot, 'spike': n_spike}
+        peers = sorted(set([(r-1) % n, (r+1) % n])-set([r]))
+        self._out_ids = self._in_ids = ['m%i' % p for p in peers]
+        self._out_ranks = self._in_ranks = peers
+        for k in ['_out_buf', '_out_buf_int', '_out_buf_mtype', '_in_buf',
+                  '_in_buf_int', '_in_buf_mtype', '_in_buf_len']:
+            setattr(self, k, {'gpot': {}, 'spike': {}})
+        for t in ['gpot', 'spike']:
+            for i in self._out_ids:
+                for d in ['out', 'in']:
+                    buf = np.zeros(lengths[t], self.pm[t].dtype)
+                    getattr(self, '_%s_buf' % d)[t][i] = buf
+                    getattr(self, '_%s_buf_int' % d)[t][i] = bufint(buf)
+                    getattr(self, '_%s_buf_mtype' % d)[t][i] = \
+                        dtype_to_mpi(buf.dtype)
+                self._in_buf_len[t][i] = lengths[t]
+        self._link_wait = {i: 0.0 for i in self._in_ids}
+        self._link_wait_count = {i: 0 for i in self._in_ids}
+
+    def log_info(self, msg):
+        pass
+
+def run(transport, n_gpot, n_spike, steps):
+    """
+    Time the exchange of data with a transport.
+
+    Returns
+    -------
+    t : float
+        Average duration of a step in seconds over all processes.
+    """
+
+    comm = MPI.COMM_WORLD
+    m = RingEndpoint(comm, n_gpot, n_spike)
+    tr = get_transport(transport)(m)
+    tr.setup()
+    comm.Barrier()
+    start = time.time()
+    for i in xrange(steps):
+        tr.exchange()
+    t = (time.time()-start)/steps
+    tr.close()
+    return comm.allreduce(t)/comm.size
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-t', '--transports', default=['mpi'], nargs='+',
+                        help='Transports to time [default: mpi]')
+    parser.add_argument('-g', '--num_gpot', default=1000, type=int,
+                        help='Graded potential values per link [default: %(default)s]')
+    parser.add_argument('-s', '--num_spike', default=1000, type=int,
+                        help='Spike values per link [default: %(default)s]')
+    parser.add_argument('-m', '--max_steps', default=1000, type=int,
+                        help='Number of steps [default: %(default)s]')
+    args = parser.parse_args()
+
+    for transport in args.transports:
+        t = run(transport, args.num_gpot, args.num_spike, args.max_steps)
+        if MPI.COMM_WORLD.rank == 0:
+            print '%s: %.1f us/step' % (transport, t*1e6)
@@ -1,8 +1,7 @@
-try:
-    __import__('pkg_resources').declare_namespace(__name__)
-except ImportError:
-    from pkgutil import extend_path
-    __path__ = extend_path(__path__, __name__)
+# Use pkgutil rather than pkg_resources to extend the package path because
+# importing the latter noticeably slows down the startup of spawned processes:
+from pkgutil import extend_path
+__path__ = extend_path(__path__, __name__)
 
 # Ignore all exceptions so that this doesn't cause package installation
 # to fail if pkg_resources can't find neurokernel:
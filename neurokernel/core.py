@@ -5,10 +5,12 @@ Core Neurokernel classes.
 """
 
 import atexit
+from collections import OrderedDict
+import importlib
+import os
 import time
 
 import bidict
-from mpi4py import MPI
 import numpy as np
 import twiggy
 
@@ -16,14 +18,21 @@ from ctx_managers import IgnoreKeyboardInterrupt, OnKeyboardInterrupt, \
      ExceptionOnSignal, TryExceptionOnSignal
 from mixins import LoggerMixin
 import mpi
-from tools.gpu import bufint
 from tools.logging import setup_logger
-from tools.misc import catch_exception, dtype_to_mpi, renumber_in_order
-from tools.mpi import MPIOutput
+from tools.memory import format_bytes, nbytes, peak_rss
+from tools.misc import bufint, catch_exception, dtype_to_mpi, \
+     memoized_property
+from tools.mpi import MPI, MPIOutput
 from pattern import Interface, Pattern
 from plsel import Selector, SelectorMethods
-from pm import BasePortMapper, PortMapper
+from profiler import COMPUTE, GATHER, POST, WAIT, PHASES, LoadBalance, \
+     StepProfiler, Tracer, comm_matrix, summarize, write_chrome_trace
+from placement import Placement
+from pm import PortMapper
+from routing_plan import RoutingPlan, RoutingPlanCache, \
+     compute_routing_plans, port_digest
 from routing_table import RoutingTable
+from transport import get_transport
 from uid import uid
 
 CTRL_TAG = 1
@@ -76,6 +85,12 @@ class Module(mpi.Worker):
         Time synchronization flag. When True, debug messages are not emitted
         during module synchronization and the time taken to receive all incoming
         data is computed.
+    transport : str or type
+        Transport used to exchange data with other modules; either the name
+        of a transport listed in `neurokernel.transport.TRANSPORTS` (e.g.,
+        'mpi', 'shm', 'rma', or 'zmq') or a subclass of
+        `neurokernel.transport.Transport`.
+        All modules in an emulation must use the same transport.
 
     Attributes
     ----------
@@ -87,20 +102,50 @@ class Module(mpi.Worker):
     data : dict
         `data['gpot']` and `data['spike']` are arrays of data associated with 
         a module's graded potential and spiking ports.
+    routing_plan : neurokernel.routing_plan.RoutingPlan
+        Precomputed port index arrays used to exchange data with other
+        modules. Set by the manager before the module is run; if not set,
+        the plan is computed from the routing table in `pre_run()`.
+    transport : neurokernel.transport.Transport
+        Transport instance used to exchange data with other modules. Created
+        in `pre_run()` if not already set.
+    profiler : neurokernel.profiler.StepProfiler
+        Durations of the phases of the most recent execution steps. None if
+        `profile_steps` is 0.
+    profile_steps : int
+        Number of most recent execution steps whose phase durations are
+        recorded and sent to the manager when the module finishes running.
+        Set this class attribute to 0 in a subclass to disable profiling.
+    trace_events : int
+        Number of most recent control messages whose receipt is recorded in
+        the module's timeline. If 0, no timeline is recorded; set by the
+        manager if it traces the emulation.
+    run_id : str
+        Token that distinguishes the emulation from others running at the
+        same time (e.g., in the names of resources created by the transport).
+        Set by the manager; None if the module was not spawned by a manager.
     """
 
+    profile_steps = 10000
+    trace_events = 0
+    run_id = None
+
     def __init__(self, sel, sel_in, sel_out,
                  sel_gpot, sel_spike, data_gpot, data_spike,
                  columns=['interface', 'io', 'type'],
                  ctrl_tag=CTRL_TAG, gpot_tag=GPOT_TAG, spike_tag=SPIKE_TAG,
                  id=None, device=None,
                  routing_table=None, rank_to_id=None,
-                 debug=False, time_sync=False):
+                 debug=False, time_sync=False, transport='mpi'):
 
         super(Module, self).__init__(ctrl_tag)
         self.debug = debug
         self.time_sync = time_sync
         self.device = device
+        self._transport_cls = get_transport(transport)
+        self.transport = None
+        self.profiler = StepProfiler(self.profile_steps) \
+                        if self.profile_steps else None
 
         self._gpot_tag = gpot_tag
         self._spike_tag = spike_tag
@@ -143,6 +188,7 @@ class Module(mpi.Worker):
         # Save routing table and mapping between MPI ranks and module IDs:
         self.routing_table = routing_table
         self.rank_to_id = rank_to_id
+        self.routing_plan = None
 
         # Generate a unique ID if none is specified:
         if id is None:
@@ -173,18 +219,23 @@ class Module(mpi.Worker):
         self.interface[sel_gpot, 'type'] = 'gpot'
         self.interface[sel_spike, 'type'] = 'spike'
 
-        # Find the input and output ports:
-        self.in_ports = self.interface.in_ports().to_tuples()
-        self.out_ports = self.interface.out_ports().to_tuples()
+        # Find the input and output ports (the interface caches the positions
+        # of each class of ports, so these lookups don't copy its data):
+        self.in_ports = self.interface.filter_ports(io='in', tuples=True)
+        self.out_ports = self.interface.filter_ports(io='out', tuples=True)
 
         # Find the graded potential and spiking ports:
-        self.gpot_ports = self.interface.gpot_ports().to_tuples()
-        self.spike_ports = self.interface.spike_ports().to_tuples()
-
-        self.in_gpot_ports = self.interface.in_ports().gpot_ports().to_tuples()
-        self.in_spike_ports = self.interface.in_ports().spike_ports().to_tuples()
-        self.out_gpot_ports = self.interface.out_ports().gpot_ports().to_tuples()
-        self.out_spike_ports = self.interface.out_ports().spike_ports().to_tuples()
+        self.gpot_ports = self.interface.filter_ports(type='gpot', tuples=True)
+        self.spike_ports = self.interface.filter_ports(type='spike', tuples=True)
+
+        self.in_gpot_ports = self.interface.filter_ports(io='in', type='gpot',
+                                                        tuples=True)
+        self.in_spike_ports = self.interface.filter_ports(io='in', type='spike',
+                                                         tuples=True)
+        self.out_gpot_ports = self.interface.filter_ports(io='out', type='gpot',
+                                                         tuples=True)
+        self.out_spike_ports = self.interface.filter_ports(io='out', type='spike',
+                                                          tuples=True)
 
         # Set up mapper between port identifiers and their associated data:
         if len(data_gpot) != len(self.gpot_ports):
@@ -198,9 +249,6 @@ class Module(mpi.Worker):
         self.pm['gpot'] = PortMapper(sel_gpot, self.data['gpot'], make_copy=False)
         self.pm['spike'] = PortMapper(sel_spike, self.data['spike'], make_copy=False)
 
-        # MPI Request object for resolving asynchronous transfers:
-        self.req = MPI.Request()
-
     def _init_gpu(self):
         """
         Initialize GPU device.
@@ -230,85 +278,46 @@ class Module(mpi.Worker):
     def _init_port_dicts(self):
         """
         Initial dictionaries of source/destination ports in current module.
+
+        Notes
+        -----
+        The dictionaries are taken from the module's routing plan; if no plan
+        was provided by the manager or the plan was computed for ports other
+        than those in the module's port mappers, it is computed from the
+        routing table.
         """
 
-        # Extract identifiers of source ports in the current module's interface
+        if self.routing_plan is not None and \
+           self.routing_plan.port_digest != port_digest(self.pm):
+            self.log_info('ports differ from those of routing plan')
+            self.routing_plan = None
+        if self.routing_plan is None:
+            self.log_info('computing routing plan')
+            self.routing_plan = RoutingPlan.compute(self.id, self.routing_table,
+                                                    self.rank_to_id, self.pm)
+        else:
+            self.log_info('using precomputed routing plan')
+        plan = self.routing_plan
+
+        # Identifiers of source ports in the current module's interface
         # for all modules receiving output from the current module:
-        self._out_port_dict_ids = {}
-        self._out_port_dict_ids['gpot'] = {}
-        self._out_port_dict_ids['spike'] = {}
+        self._out_ids = plan.out_ids
+        self._out_ranks = plan.out_ranks
+        self._out_port_dict_ids = plan.out_inds
 
-        self._out_ids = self.routing_table.dest_ids(self.id)
-        self._out_ranks = [self.rank_to_id.inv[i] for i in self._out_ids]
-        for out_id in self._out_ids:
-            self.log_info('extracting output ports for %s' % out_id)
-
-            # Get interfaces of pattern connecting the current module to
-            # destination module `out_id`; `int_0` is connected to the
-            # current module, `int_1` is connected to the other module:
-            pat = self.routing_table[self.id, out_id]['pattern']
-            int_0 = self.routing_table[self.id, out_id]['int_0']
-            int_1 = self.routing_table[self.id, out_id]['int_1']
-
-            # Get ports in interface (`int_0`) connected to the current
-            # module that are connected to the other module via the pattern:
-            self._out_port_dict_ids['gpot'][out_id] = \
-                self.pm['gpot'].ports_to_inds(pat.src_idx(int_0, int_1, 'gpot', 'gpot'))
-            self._out_port_dict_ids['spike'][out_id] = \
-                self.pm['spike'].ports_to_inds(pat.src_idx(int_0, int_1, 'spike', 'spike'))
-
-        # Extract identifiers of destination ports in the current module's
+        # Identifiers of destination ports in the current module's
         # interface for all modules sending input to the current module:
-        self._in_port_dict_ids = {}
-        self._in_port_dict_ids['gpot'] = {}
-        self._in_port_dict_ids['spike'] = {}
+        self._in_ids = plan.in_ids
+        self._in_ranks = plan.in_ranks
+        self._in_port_dict_ids = plan.in_inds
 
-        # Extract indices corresponding to the entries in the transmitted
-        # buffers that must be copied into the input port map data arrays; these
-        # are needed to support fan-out:
-        self._in_port_dict_buf_ids = {}
-        self._in_port_dict_buf_ids['gpot'] = {}
-        self._in_port_dict_buf_ids['spike'] = {}
+        # Indices corresponding to the entries in the transmitted buffers that
+        # must be copied into the input port map data arrays; these are needed
+        # to support fan-out:
+        self._in_port_dict_buf_ids = plan.in_buf_inds
 
         # Lengths of input buffers:
-        self._in_buf_len = {} 
-        self._in_buf_len['gpot'] = {}
-        self._in_buf_len['spike'] = {}
-
-        self._in_ids = self.routing_table.src_ids(self.id)
-        self._in_ranks = [self.rank_to_id.inv[i] for i in self._in_ids]
-        for in_id in self._in_ids:
-            self.log_info('extracting input ports for %s' % in_id)
-
-            # Get interfaces of pattern connecting the current module to
-            # source module `in_id`; `int_1` is connected to the current
-            # module, `int_0` is connected to the other module:
-            pat = self.routing_table[in_id, self.id]['pattern']
-            int_0 = self.routing_table[in_id, self.id]['int_0']
-            int_1 = self.routing_table[in_id, self.id]['int_1']
-
-            # Get ports in interface (`int_1`) connected to the current
-            # module that are connected to the other module via the pattern:
-            self._in_port_dict_ids['gpot'][in_id] = \
-                self.pm['gpot'].ports_to_inds(pat.dest_idx(int_0, int_1, 'gpot', 'gpot'))
-            self._in_port_dict_ids['spike'][in_id] = \
-                self.pm['spike'].ports_to_inds(pat.dest_idx(int_0, int_1, 'spike', 'spike'))
-
-			# Get the integer indices associated with the connected source ports
-            # in the pattern interface connected to the source module `in_d`;
-            # these are needed to copy received buffer contents into the current
-            # module's port map data array:
-            self._in_port_dict_buf_ids['gpot'][in_id] = \
-                np.array(renumber_in_order(BasePortMapper(pat.gpot_ports(int_0).to_tuples()).
-                        ports_to_inds(pat.src_idx(int_0, int_1, 'gpot', 'gpot', duplicates=True))))            
-            self._in_port_dict_buf_ids['spike'][in_id] = \
-                np.array(renumber_in_order(BasePortMapper(pat.spike_ports(int_0).to_tuples()).
-                        ports_to_inds(pat.src_idx(int_0, int_1, 'spike', 'spike', duplicates=True))))
-            
-            # The size of the input buffer to the current module must be the
-            # same length as the output buffer of module `in_id`:
-            self._in_buf_len['gpot'][in_id] = len(pat.src_idx(int_0, int_1, 'gpot', 'gpot'))
-            self._in_buf_len['spike'][in_id] = len(pat.src_idx(int_0, int_1, 'spike', 'spike'))
+        self._in_buf_len = plan.in_buf_len
 
     def _init_comm_bufs(self):
         """
@@ -319,17 +328,14 @@ class Module(mpi.Worker):
         Must be executed after `_init_port_dicts()`.
         """
 
-        # Buffers (and their interfaces and MPI types) for receiving data
-        # transmitted from source modules:
+        # Buffers (and their interfaces) for receiving data transmitted from
+        # source modules:
         self._in_buf = {}
         self._in_buf['gpot'] = {}
         self._in_buf['spike'] = {}
         self._in_buf_int = {}
         self._in_buf_int['gpot'] = {}
         self._in_buf_int['spike'] = {}
-        self._in_buf_mtype = {}
-        self._in_buf_mtype['gpot'] = {}
-        self._in_buf_mtype['spike'] = {}
         for in_id in self._in_ids:
             n_gpot = self._in_buf_len['gpot'][in_id]
             if n_gpot:
@@ -337,8 +343,6 @@ class Module(mpi.Worker):
                     np.empty(n_gpot, self.pm['gpot'].dtype)
                 self._in_buf_int['gpot'][in_id] = \
                     bufint(self._in_buf['gpot'][in_id])
-                self._in_buf_mtype['gpot'][in_id] = \
-                    dtype_to_mpi(self._in_buf['gpot'][in_id].dtype)
             else:
                 self._in_buf['gpot'][in_id] = None
 
@@ -348,22 +352,17 @@ class Module(mpi.Worker):
                     np.empty(n_spike, self.pm['spike'].dtype)
                 self._in_buf_int['spike'][in_id] = \
                     bufint(self._in_buf['spike'][in_id])
-                self._in_buf_mtype['spike'][in_id] = \
-                    dtype_to_mpi(self._in_buf['spike'][in_id].dtype)
             else:
                 self._in_buf['spike'][in_id] = None
 
-        # Buffers (and their interfaces and MPI types) for transmitting data to
-        # destination modules:
+        # Buffers (and their interfaces) for transmitting data to destination
+        # modules:
         self._out_buf = {}
         self._out_buf['gpot'] = {}
         self._out_buf['spike'] = {}
         self._out_buf_int = {}
         self._out_buf_int['gpot'] = {}
         self._out_buf_int['spike'] = {}
-        self._out_buf_mtype = {}
-        self._out_buf_mtype['gpot'] = {}
-        self._out_buf_mtype['spike'] = {}
         for out_id in self._out_ids:
             n_gpot = len(self._out_port_dict_ids['gpot'][out_id])
             if n_gpot:
@@ -371,8 +370,6 @@ class Module(mpi.Worker):
                     np.empty(n_gpot, self.pm['gpot'].dtype)
                 self._out_buf_int['gpot'][out_id] = \
                     bufint(self._out_buf['gpot'][out_id])
-                self._out_buf_mtype['gpot'][out_id] = \
-                    dtype_to_mpi(self._out_buf['gpot'][out_id].dtype)
             else:
                 self._out_buf['gpot'][out_id] = None
 
@@ -382,11 +379,76 @@ class Module(mpi.Worker):
                     np.empty(n_spike, self.pm['spike'].dtype)
                 self._out_buf_int['spike'][out_id] = \
                     bufint(self._out_buf['spike'][out_id])
-                self._out_buf_mtype['spike'][out_id] = \
-                    dtype_to_mpi(self._out_buf['spike'][out_id].dtype)
             else:
                 self._out_buf['spike'][out_id] = None
 
+    @staticmethod
+    def _buf_mtypes(bufs):
+        """
+        MPI types of the specified communication buffers.
+        """
+
+        return {t: {i: dtype_to_mpi(b.dtype) for i, b in bufs[t].iteritems() \
+                    if b is not None} for t in bufs}
+
+    @memoized_property
+    def _in_buf_mtype(self):
+        """
+        MPI types of the input buffers.
+
+        Computed when first used by a transport so that modules whose transport
+        does not use MPI do not import `mpi4py.MPI`.
+        """
+
+        return self._buf_mtypes(self._in_buf)
+
+    @memoized_property
+    def _out_buf_mtype(self):
+        """
+        MPI types of the output buffers (see `_in_buf_mtype`).
+        """
+
+        return self._buf_mtypes(self._out_buf)
+
+    def _init_link_stats(self):
+        """
+        Counters of the data received along each incoming connection.
+        """
+
+        self._exchanges = 0
+        self._link_wait = {src_id: 0.0 for src_id in self._in_ids}
+        self._link_wait_count = {src_id: 0 for src_id in self._in_ids}
+
+    def _link_stats(self):
+        """
+        Traffic received along each incoming connection.
+
+        Returns
+        -------
+        stats : tuple
+            Number of data exchanges, dicts containing the total number of
+            bytes and messages received from each source module for each type
+            of port data, and a dict containing the mean time in seconds
+            spent waiting for the data from each source module after the
+            transfers were initiated (NaN if the transport does not record
+            it). The dicts are keyed by source module ID.
+        """
+
+        nbytes = {}
+        nmsgs = {}
+        wait = {}
+        for src_id in self._in_ids:
+            nbytes[src_id] = {}
+            nmsgs[src_id] = {}
+            for t in ['gpot', 'spike']:
+                buf = self._in_buf[t][src_id]
+                if buf is not None:
+                    nbytes[src_id][t] = self._exchanges*buf.nbytes
+                    nmsgs[src_id][t] = self._exchanges
+            n = self._link_wait_count[src_id]
+            wait[src_id] = self._link_wait[src_id]/n if n else np.nan
+        return self._exchanges, nbytes, nmsgs, wait
+
     def _sync(self):
         """
         Send output data and receive input data.
@@ -394,56 +456,34 @@ class Module(mpi.Worker):
 
         if self.time_sync:
             start = time.time()
-        requests = []
+        p = self.profiler
 
         # For each destination module, extract elements from the current
-        # module's port data array, copy them to a contiguous array, and
-        # transmit the latter:
-        for dest_id, dest_rank in zip(self._out_ids, self._out_ranks):
-
-            # Copy data into destination buffer:
+        # module's port data array and copy them to a contiguous array:
+        for dest_id in self._out_ids:
             if self._out_buf['gpot'][dest_id] is not None:
                 self._out_buf['gpot'][dest_id][:] = \
                     self.data['gpot'][self._out_port_dict_ids['gpot'][dest_id]]
                 if not self.time_sync:
                     self.log_info('gpot data sent to %s: %s' % \
                                   (dest_id, str(self._out_buf['gpot'][dest_id])))
-                r = MPI.COMM_WORLD.Isend([self._out_buf_int['gpot'][dest_id],
-                                          self._out_buf_mtype['gpot'][dest_id]],
-                                         dest_rank, GPOT_TAG)
-                requests.append(r)
             if self._out_buf['spike'][dest_id] is not None:
                 self._out_buf['spike'][dest_id][:] = \
                     self.data['spike'][self._out_port_dict_ids['spike'][dest_id]]
                 if not self.time_sync:
                     self.log_info('spike data sent to %s: %s' % \
                                   (dest_id, str(self._out_buf['spike'][dest_id])))
-                r = MPI.COMM_WORLD.Isend([self._out_buf_int['spike'][dest_id],
-                                          self._out_buf_mtype['spike'][dest_id]],
-                                         dest_rank, SPIKE_TAG)
-                requests.append(r)
-            if not self.time_sync:
-                self.log_info('sending to %s' % dest_id)
-        if not self.time_sync:
-            self.log_info('sent all data from %s' % self.id)
 
-        # For each source module, receive elements and copy them into the
-        # current module's port data array:
-        for src_id, src_rank in zip(self._in_ids, self._in_ranks):
-            if self._in_buf['gpot'][src_id] is not None:
-                r = MPI.COMM_WORLD.Irecv([self._in_buf_int['gpot'][src_id],
-                                          self._in_buf_mtype['gpot'][src_id]],
-                                         source=src_rank, tag=GPOT_TAG)
-                requests.append(r)
-            if self._in_buf['spike'][src_id] is not None:
-                r = MPI.COMM_WORLD.Irecv([self._in_buf_int['spike'][src_id],
-                                          self._in_buf_mtype['spike'][src_id]],
-                                         source=src_rank, tag=SPIKE_TAG)
-                requests.append(r)
-            if not self.time_sync:
-                self.log_info('receiving from %s' % src_id)
-        if requests:
-            self.req.Waitall(requests)
+        # Transmit the contiguous arrays and receive the arrays transmitted by
+        # the source modules; transports that post the transfers before
+        # waiting for them overwrite the end of the post phase:
+        if p is not None:
+            p.mark(GATHER)
+            p.mark(POST)
+        self.transport.exchange()
+        self._exchanges += 1
+        if p is not None:
+            p.mark(WAIT)
         if not self.time_sync:
             self.log_info('all data were received by %s' % self.id)
 
@@ -462,19 +502,22 @@ class Module(mpi.Worker):
                 self.data['spike'][self._in_port_dict_ids['spike'][src_id]] = \
                     self._in_buf['spike'][src_id][self._in_port_dict_buf_ids['spike'][src_id]]
 
+        if p is not None:
+            p.end()
+
         # Save timing data:
         if self.time_sync:
             stop = time.time()
-            n_gpot = 0
-            n_spike = 0
+            nbytes = 0
             for src_id in self._in_ids:
-                n_gpot += len(self._in_buf['gpot'][src_id])
-                n_spike += len(self._in_buf['spike'][src_id])
+                for t in ['gpot', 'spike']:
+                    if self._in_buf[t][src_id] is not None:
+                        nbytes += self._in_buf[t][src_id].nbytes
             self.log_info('sent timing data to master')
+            compute = p.elapsed(COMPUTE) if p is not None else np.nan
             self.intercomm.isend(['sync_time',
-                                  (self.rank, self.steps, start, stop,
-                                   n_gpot*self.pm['gpot'].dtype.itemsize+\
-                                   n_spike*self.pm['spike'].dtype.itemsize)],
+                                  (self.rank, self.steps, start, stop, nbytes,
+                                   compute)],
                                  dest=0, tag=self._ctrl_tag)
         else:
             self.log_info('saved all data received by %s' % self.id)
@@ -492,12 +535,26 @@ class Module(mpi.Worker):
         # Initialize _out_port_dict and _in_port_dict attributes:
         self._init_port_dicts()
 
-        # Initialize transmission buffers:
+        # Initialize transmission buffers and the counters of the data
+        # received through them:
         self._init_comm_bufs()
-
-        # Start timing the main loop:
+        self._init_link_stats()
+
+        # Set up the transport used to exchange the buffers unless one was
+        # already provided (e.g., by an in-process manager):
+        if self.transport is None:
+            self.transport = self._transport_cls(self)
+        self.transport.setup()
+        self.log_info('using transport %s' % self.transport.__class__.__name__)
+
+        # Start timing the main loop; the events in the module's timeline are
+        # aligned with the start time reported to the manager:
+        start = time.time()
+        if self.trace_events:
+            self.tracer = Tracer(self.trace_events)
+            self.tracer.align(start)
         if self.time_sync:
-            self.intercomm.isend(['start_time', (self.rank, time.time())],
+            self.intercomm.isend(['start_time', (self.rank, start)],
                                  dest=0, tag=self._ctrl_tag)                
             self.log_info('sent start time to manager')
 
@@ -511,6 +568,10 @@ class Module(mpi.Worker):
 
         self.log_info('running code after body of worker %s' % self.rank)
 
+        # Release resources held by the transport:
+        if self.transport is not None:
+            self.transport.close()
+
         # Stop timing the main loop before shutting down the emulation:
         if self.time_sync:
             self.intercomm.isend(['stop_time', (self.rank, time.time())],
@@ -518,6 +579,37 @@ class Module(mpi.Worker):
 
             self.log_info('sent stop time to manager')
 
+        # Send the phase durations of the execution steps, excluding the very
+        # first step to avoid including delays due to PyCUDA kernel
+        # compilation:
+        if self.profiler is not None and self.profiler.steps:
+            d = self.profiler.durations()
+            if self.profiler.steps <= self.profiler.capacity:
+                d = d[1:]
+            self.intercomm.isend(['step_profile', (self.rank, d)],
+                                 dest=0, tag=self._ctrl_tag)
+
+        # Report the peak memory usage of the module's process:
+        self.intercomm.isend(['peak_rss', (self.rank, peak_rss())],
+                             dest=0, tag=self._ctrl_tag)
+
+        # Send the traffic received along each incoming connection:
+        self.intercomm.isend(['link_stats', (self.rank, self._link_stats())],
+                             dest=0, tag=self._ctrl_tag)
+
+        # Send the module's timeline:
+        if self.tracer is not None:
+            if self.profiler is not None:
+                t = self.profiler.timestamps()
+                first_step = self.profiler.steps-len(t)
+            else:
+                t = np.empty((0, len(PHASES)+1))
+                first_step = 0
+            self.intercomm.isend(['trace',
+                                  (self.rank, (self.tracer.origin, first_step,
+                                               t, self.tracer.events()))],
+                                 dest=0, tag=self._ctrl_tag)
+
         # Send acknowledgment message:
         self.intercomm.isend(['done', self.rank], 0, self._ctrl_tag)
         self.log_info('done message sent to manager')
@@ -534,6 +626,19 @@ class Module(mpi.Worker):
 
         self.log_info('running execution step')
 
+    def _compute(self):
+        """
+        Run the processing step and record its duration.
+        """
+
+        p = self.profiler
+        if p is not None:
+            p.begin()
+            self.run_step()
+            p.mark(COMPUTE)
+        else:
+            self.run_step()
+
     def run(self):
         """
         Body of process.
@@ -559,14 +664,14 @@ class Module(mpi.Worker):
         if self.debug:
 
             # Run the processing step:
-            self.run_step()
+            self._compute()
 
             # Synchronize:
             self._sync()
         else:
 
             # Run the processing step:
-            catch_exception(self.run_step, self.log_info)
+            catch_exception(self._compute, self.log_info)
 
             # Synchronize:
             catch_exception(self._sync, self.log_info)
@@ -579,6 +684,16 @@ class Manager(mpi.WorkerManager):
     emulation. All modules and connections must be added to a module manager
     instance before they can be run.
 
+    Parameters
+    ----------
+    required_args : list of str
+        Arguments that must be passed to the constructors of added modules.
+    ctrl_tag : int
+        MPI tag to identify control messages.
+    plan_cache_dir : str
+        Directory in which to cache routing plans. If None, routing plans
+        are computed every time the modules are spawned.
+
     Attributes
     ----------
     ctrl_tag : int
@@ -589,11 +704,42 @@ class Manager(mpi.WorkerManager):
         Table of data transmission connections between modules.
     rank_to_id : bidict.bidict
         Mapping between MPI ranks and module object IDs.
+    routing_plans : dict
+        Routing plans shipped to the modules when they are spawned. Keyed
+        by module object ID.
+    startup_time : float
+        Time taken by `spawn()` to start the modules in seconds.
+    step_durations : dict of numpy.ndarray
+        Phase durations of the execution steps of each module (see
+        `neurokernel.profiler.StepProfiler.durations()`) keyed by module
+        object ID. Populated when the modules finish running.
+    trace_file : str
+        If set, the timelines of the modules' execution steps and received
+        control messages are written to this file in the Chrome trace event
+        format (see `neurokernel.profiler.chrome_trace()`) when the modules
+        finish running. Must be set before the modules are spawned.
+    trace_events : int
+        Number of most recent control messages retained in each module's
+        timeline.
+    peak_rss : dict of int
+        Peak resident set size in bytes of the process of each module keyed
+        by module object ID. Populated when the modules finish running.
+    load_balance : neurokernel.profiler.LoadBalance
+        Load imbalance statistics computed from the synchronization timing
+        data sent by the modules if they were instantiated with
+        `time_sync=True`.
+    link_stats : dict of tuple
+        Traffic received by each module along its incoming connections (see
+        `neurokernel.core.Module._link_stats()`) keyed by module object ID.
+        Populated when the modules finish running.
+    run_id : str
+        Token passed to the modules that distinguishes the emulation from
+        others running on the same host at the same time.
     """
 
     def __init__(self, required_args=['sel', 'sel_in', 'sel_out',
                                       'sel_gpot', 'sel_spike'],
-                 ctrl_tag=CTRL_TAG):
+                 ctrl_tag=CTRL_TAG, plan_cache_dir=None):
         super(Manager, self).__init__(ctrl_tag)
 
         # Required constructor args:
@@ -605,9 +751,16 @@ class Manager(mpi.WorkerManager):
         # Unique object ID:
         self.id = uid()
 
+        # Object IDs are only unique within a process:
+        self.run_id = '%s-%s' % (os.getpid(), self.id)
+
         # Set up a dynamic table to contain the routing table:
         self.routing_table = RoutingTable()
 
+        # Routing plans computed before the modules are spawned:
+        self.plan_cache_dir = plan_cache_dir
+        self.routing_plans = {}
+
         # Number of emulation steps to run:
         self.steps = np.inf
 
@@ -621,6 +774,23 @@ class Manager(mpi.WorkerManager):
         self.total_sync_nbytes = 0.0
         self.received_data = {}
 
+        # Phase durations of the execution steps of each module:
+        self.step_durations = {}
+
+        # Timelines of the modules:
+        self.trace_file = None
+        self.trace_events = 10000
+        self.traces = {}
+
+        # Traffic along the connections between modules:
+        self.link_stats = {}
+
+        # Load imbalance between modules:
+        self.load_balance = LoadBalance()
+
+        # Peak memory usage of the module processes:
+        self.peak_rss = {}
+
         # Average step synchronization time:
         self._average_step_sync_time = 0.0
 
@@ -761,6 +931,103 @@ class Manager(mpi.WorkerManager):
 
         self.log_info('connected modules {0} and {1}'.format(id_0, id_1))
 
+    def compute_routing_plans(self):
+        """
+        Compute the routing plans of all added modules.
+
+        Routing plans are only computed for modules whose graded potential and
+        spiking port selectors were passed to `add()` as 'sel_gpot' and
+        'sel_spike'; other modules compute their own plans when they start.
+        If a plan cache directory was specified, plans are loaded from and
+        stored in the cache.
+
+        Returns
+        -------
+        routing_plans : dict
+            Routing plans keyed by module object ID.
+        """
+
+        sels = {}
+        for rank, id in self.rank_to_id.iteritems():
+            kwargs = self._kwargs[rank]
+            if 'sel_gpot' in kwargs and 'sel_spike' in kwargs:
+                sels[id] = (kwargs['sel_gpot'], kwargs['sel_spike'])
+            else:
+                self.log_info('cannot compute routing plan for %s' % id)
+        if self.plan_cache_dir is not None:
+            cache = RoutingPlanCache(self.plan_cache_dir)
+        else:
+            cache = None
+        self.routing_plans = compute_routing_plans(self.routing_table,
+                                                   self.rank_to_id, sels, cache)
+        self.log_info('computed routing plans')
+        return self.routing_plans
+
+    def target_attrs(self, rank):
+        id = self.rank_to_id[rank]
+        attrs = {'run_id': self.run_id}
+        if id in self.routing_plans:
+            attrs['routing_plan'] = self.routing_plans[id]
+        if self.trace_file is not None:
+            attrs['trace_events'] = self.trace_events
+        return attrs
+
+    def reorder(self, ranks):
+        super(Manager, self).reorder(ranks)
+
+        # Update the mapping in place because it is shared with the
+        # constructor arguments of the added modules:
+        ids = dict(self.rank_to_id)
+        self.rank_to_id.clear()
+        for i, r in enumerate(ranks):
+            self.rank_to_id[i] = ids[r]
+
+    def place(self, n_nodes, slots_per_node, **kwargs):
+        """
+        Reassign MPI ranks to modules so as to minimize inter-node traffic.
+
+        Parameters
+        ----------
+        n_nodes : int
+            Number of nodes on which to run the modules.
+        slots_per_node : int
+            Number of MPI processes that may be started on each node.
+        kwargs : dict
+            Data types of the port data passed to `Placement.compute()`.
+
+        Returns
+        -------
+        placement : placement.Placement
+            Computed placement. Its `write_hostfile()` method can be used to
+            create a hostfile that should be passed to `spawn()` so that the
+            reassigned ranks are started on the intended nodes.
+        """
+
+        ids = [self.rank_to_id[r] for r in sorted(self.rank_to_id.keys())]
+        placement = Placement.compute(self.routing_table, n_nodes,
+                                      slots_per_node, ids, **kwargs)
+        self.reorder([self.rank_to_id.inv[id] for id in placement.rank_order])
+        self.log_info('placed modules: %s' % placement.parts)
+        return placement
+
+    def spawn(self, info=None, pool=None):
+        """
+        Compute routing plans and spawn MPI processes for all added modules.
+
+        Parameters
+        ----------
+        info : dict
+            Keys and values of the MPI info object passed to the spawn call.
+        pool : mpi.ProcessPool
+            Pool of previously spawned processes in which to run the modules
+            instead of spawning new processes.
+        """
+
+        if self._is_parent:
+            self.compute_routing_plans()
+            self._log_memory_usage()
+        super(Manager, self).spawn(info, pool)
+
     def process_worker_msg(self, msg):
 
         # Process timing data sent by workers:
@@ -776,14 +1043,33 @@ class Manager(mpi.WorkerManager):
             if stop_time > self.stop_time or self.stop_time == 0.0:
                 self.stop_time = stop_time
                 self.log_info('setting latest stop time: %s' % stop_time)
+        elif msg[0] == 'step_profile':
+            rank, durations = msg[1]
+            self.log_info('step profile data: %s steps from %s' % \
+                          (len(durations), rank))
+            self.step_durations[self.rank_to_id[rank]] = durations
+        elif msg[0] == 'peak_rss':
+            rank, n = msg[1]
+            self.log_info('peak rss data: %s' % str(msg[1]))
+            self.peak_rss[self.rank_to_id[rank]] = n
+        elif msg[0] == 'link_stats':
+            rank, stats = msg[1]
+            self.log_info('link stats data: %s steps from %s' % \
+                          (stats[0], rank))
+            self.link_stats[self.rank_to_id[rank]] = stats
+        elif msg[0] == 'trace':
+            rank, trace = msg[1]
+            self.log_info('trace data: %s events from %s' % \
+                          (len(trace[2])+len(trace[3]), rank))
+            self.traces[self.rank_to_id[rank]] = trace
         elif msg[0] == 'sync_time':
-            rank, steps, start, stop, nbytes = msg[1]
+            rank, steps, start, stop, nbytes, compute = msg[1]
             self.log_info('sync time data: %s' % str(msg[1]))
 
             # Collect timing data for each execution step:
             if steps not in self.received_data:
                 self.received_data[steps] = {}                    
-            self.received_data[steps][rank] = (start, stop, nbytes)
+            self.received_data[steps][rank] = (start, stop, nbytes, compute)
 
             # After adding the latest timing data for a specific step, check
             # whether data from all modules has arrived for that step:
@@ -810,6 +1096,16 @@ class Manager(mpi.WorkerManager):
                                                    step_sync_time)/(self.counter+1)
 
                     self.counter += 1
+
+                    # Compare the durations of the modules' compute phases
+                    # to find modules that keep the others waiting:
+                    straggler = self.load_balance.update(
+                        {self.rank_to_id[r]: d[3] \
+                         for r, d in self.received_data[steps].iteritems()})
+                    if straggler is not None:
+                        self.log_warning('%s has been the slowest module for '
+                                         '%i consecutive steps' % \
+                                         (straggler, self.load_balance.warn_steps))
                 else:
 
                     # To exclude the time taken by the first step, set the start
@@ -827,6 +1123,149 @@ class Manager(mpi.WorkerManager):
             else:
                 self.total_throughput = 0.0
 
+    def step_profile(self, percentiles=(50, 90, 99)):
+        """
+        Summarize the phase durations of the modules' execution steps.
+
+        Parameters
+        ----------
+        percentiles : sequence of float
+            Percentiles of the phase durations to compute.
+
+        Returns
+        -------
+        summary : pandas.DataFrame
+            Statistics of the durations of each phase indexed by module
+            object ID and phase; see `neurokernel.profiler.summarize()`.
+
+        Notes
+        -----
+        A large compute fraction indicates that the emulation is limited by
+        the modules' `run_step()` methods; large gather and scatter fractions
+        indicate that it is limited by copying port data, and large post and
+        wait fractions indicate that it is limited by data transmission or by
+        waiting for slower modules.
+        """
+
+        return summarize(self.step_durations, percentiles)
+
+    def _worker_label(self, rank):
+        return str(self.rank_to_id[rank])
+
+    def memory_usage(self):
+        """
+        Memory used by the emulation in the manager's process.
+
+        Returns
+        -------
+        modules : collections.OrderedDict
+            Number of bytes used by the arrays (including port mappers and
+            patterns) in the constructor arguments and routing plan of each
+            added module keyed by module object ID.
+        connections : collections.OrderedDict
+            Number of bytes used by the patterns in the routing table keyed
+            by (source, destination) module object ID tuples; see
+            `neurokernel.routing_table.RoutingTable.memory_usage()`.
+        """
+
+        seen = set()
+        modules = OrderedDict()
+        for rank in sorted(self.rank_to_id.keys()):
+            id = self.rank_to_id[rank]
+            modules[id] = nbytes(self._kwargs[rank], seen)+\
+                          nbytes(self.routing_plans.get(id), seen)
+        return modules, self.routing_table.memory_usage()
+
+    def _log_memory_usage(self, n=5):
+        """
+        Log the memory used by the largest modules and patterns.
+        """
+
+        modules, connections = self.memory_usage()
+        for name, usage in [('modules', modules), ('patterns', connections)]:
+            largest = sorted(usage.iteritems(), key=lambda x: x[1],
+                             reverse=True)[:n]
+            self.log_info('memory used by %s: %s total; largest: %s' % \
+                          (name, format_bytes(sum(usage.values())),
+                           ', '.join(['%s %s' % (k, format_bytes(v)) \
+                                      for k, v in largest])))
+
+    def _log_peak_rss(self):
+        """
+        Log the peak memory usage of the manager and module processes.
+        """
+
+        if self.peak_rss:
+            id, n = max(self.peak_rss.iteritems(), key=lambda x: x[1])
+            self.log_info('peak rss of manager/largest module process: '
+                          '%s, %s (%s)' % (format_bytes(peak_rss()),
+                                           format_bytes(n), id))
+
+    def _log_load_balance(self):
+        """
+        Log the load imbalance statistics and the modules that caused the
+        most idle time.
+        """
+
+        lb = self.load_balance
+        if lb.steps:
+            r = lb.report()
+            self.log_info('avg/max load imbalance: %s, %s; ' \
+                          'idle time caused by stragglers: %s' % \
+                          (lb.average_imbalance, lb.max_imbalance,
+                           ', '.join(['%s %.3g s (%i steps)' % \
+                                      (id, row['idle_caused'],
+                                       row['straggler_steps']) \
+                                      for id, row in r[:5].iterrows()])))
+
+    def comm_matrix(self, quantity='bytes', port_type=None):
+        """
+        Communication matrix of the emulation.
+
+        Parameters
+        ----------
+        quantity : {'bytes', 'messages', 'wait'}
+            Quantity in the matrix; the average number of bytes or messages
+            transmitted per step or the mean time in seconds spent by the
+            destination module waiting for the data.
+        port_type : {None, 'gpot', 'spike'}
+            Only count the data of the specified port type. Ignored if
+            `quantity` is 'wait'.
+
+        Returns
+        -------
+        matrix : pandas.DataFrame
+            Matrix whose rows and columns respectively correspond to the
+            source and destination modules; see
+            `neurokernel.profiler.comm_matrix()`. The matrix may be exported
+            with its `to_csv()` method or converted to a NumPy array via its
+            `values` attribute.
+        """
+
+        return comm_matrix(self.link_stats, self.rank_to_id.values(),
+                           quantity, port_type)
+
+    def _log_step_profile(self):
+        """
+        Log the mean phase durations over the steps of all modules.
+        """
+
+        if self.step_durations:
+            s = self.step_profile()
+            self.log_info('mean step phase durations: %s' % \
+                          ', '.join(['%s %.3g s (%.0f%%)' % \
+                                     (phase, row['mean'], 100*row['fraction']) \
+                                     for phase, row in s.loc['all'].iterrows()]))
+
+    def _write_trace(self):
+        """
+        Write the modules' timelines to the trace file if one was specified.
+        """
+
+        if self.trace_file is not None:
+            write_chrome_trace(self.trace_file, self.traces)
+            self.log_info('wrote trace to %s' % self.trace_file)
+
     def wait(self):
         super(Manager, self).wait()
         self.log_info('avg step sync time/avg per-step throughput' \
@@ -834,7 +1273,40 @@ class Manager(mpi.WorkerManager):
                       '%s, %s, %s, %s' % \
                       (self.average_step_sync_time, self.average_throughput, 
                        self.total_throughput, self.stop_time-self.start_time))
-        
+        self._log_step_profile()
+        self._log_load_balance()
+        self._log_peak_rss()
+        self._write_trace()
+
+# Managers that may be selected by name; they respectively run the modules in
+# MPI-spawned processes, in the current process, and in forked processes:
+MANAGERS = {'mpi': 'neurokernel.core.Manager',
+            'local': 'neurokernel.local.LocalManager',
+            'multiproc': 'neurokernel.multiproc.MultiprocessingManager'}
+
+def get_manager(backend):
+    """
+    Look up a manager class.
+
+    Parameters
+    ----------
+    backend : str
+        Name of a manager in `MANAGERS`.
+
+    Returns
+    -------
+    cls : type
+        Manager class. The module that defines it is only imported when
+        the class is looked up.
+    """
+
+    try:
+        name = MANAGERS[backend]
+    except (KeyError, TypeError):
+        raise ValueError('unrecognized backend: %s' % str(backend))
+    module_name, cls_name = name.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), cls_name)
+
 if __name__ == '__main__':
     import neurokernel.mpi_relaunch
 
@@ -115,17 +115,21 @@ class Module(BaseModule):
         self.interface[sel_spike, 'type'] = 'spike'
 
         # Find the input and output ports:
-        self.in_ports = self.interface.in_ports().to_tuples()
-        self.out_ports = self.interface.out_ports().to_tuples()
+        self.in_ports = self.interface.filter_ports(io='in', tuples=True)
+        self.out_ports = self.interface.filter_ports(io='out', tuples=True)
 
         # Find the graded potential and spiking ports:
-        self.gpot_ports = self.interface.gpot_ports().to_tuples()
-        self.spike_ports = self.interface.spike_ports().to_tuples()
-
-        self.in_gpot_ports = self.interface.in_ports().gpot_ports().to_tuples()
-        self.in_spike_ports = self.interface.in_ports().spike_ports().to_tuples()
-        self.out_gpot_ports = self.interface.out_ports().gpot_ports().to_tuples()
-        self.out_spike_ports = self.interface.out_ports().spike_ports().to_tuples()
+        self.gpot_ports = self.interface.filter_ports(type='gpot', tuples=True)
+        self.spike_ports = self.interface.filter_ports(type='spike', tuples=True)
+
+        self.in_gpot_ports = self.interface.filter_ports(io='in', type='gpot',
+                                                        tuples=True)
+        self.in_spike_ports = self.interface.filter_ports(io='in', type='spike',
+                                                         tuples=True)
+        self.out_gpot_ports = self.interface.filter_ports(io='out', type='gpot',
+                                                         tuples=True)
+        self.out_spike_ports = self.interface.filter_ports(io='out', type='spike',
+                                                          tuples=True)
 
         # Set up mapper between port identifiers and their associated data:
         assert len(data_gpot) == len(self.gpot_ports)
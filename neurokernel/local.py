@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+
+"""
+In-process execution of emulations.
+
+The manager in this module instantiates all of the modules in an emulation in
+the current process and runs them either serially in lockstep or in one thread
+per module; no MPI processes are spawned and no module classes need to be
+serialized. Data is exchanged between modules by copying it directly from the
+port data arrays of the source modules. This is mainly useful for testing and
+profiling small emulations with ordinary Python tools.
+"""
+
+import threading
+
+import numpy as np
+
+from core import CTRL_TAG, Manager
+from profiler import StackSampler
+from tools.misc import catch_exception
+from transport import Transport
+
+class BarrierAbortedError(Exception):
+    """
+    Raised in threads waiting on a barrier that was aborted.
+    """
+
+    pass
+
+class Barrier(object):
+    """
+    Reusable barrier for a fixed number of threads.
+
+    Parameters
+    ----------
+    n : int
+        Number of threads that must call `wait()` before any of them may
+        proceed.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self._count = 0
+        self._generation = 0
+        self._aborted = False
+        self._cond = threading.Condition()
+
+    def wait(self):
+        """
+        Wait until all threads have called this method.
+        """
+
+        with self._cond:
+            if self._aborted:
+                raise BarrierAbortedError()
+            generation = self._generation
+            self._count += 1
+            if self._count == self.n:
+                self._count = 0
+                self._generation += 1
+                self._cond.notify_all()
+            else:
+                while generation == self._generation and not self._aborted:
+                    self._cond.wait()
+                if self._aborted:
+                    raise BarrierAbortedError()
+
+    @property
+    def aborted(self):
+        """
+        True if the barrier was aborted.
+        """
+
+        return self._aborted
+
+    def abort(self):
+        """
+        Release all waiting threads by raising `BarrierAbortedError`.
+        """
+
+        with self._cond:
+            self._aborted = True
+            self._cond.notify_all()
+
+class LocalTransport(Transport):
+    """
+    Transport that copies data between modules in the same process.
+
+    Parameters
+    ----------
+    module : core.Module
+        Module whose input buffers are filled.
+    modules : dict
+        All modules in the emulation keyed by module identifier.
+    barrier : Barrier
+        Barrier shared by all modules when they are run in separate threads.
+        If None, the caller must ensure that all modules have executed their
+        current step before any of them exchanges data.
+
+    Notes
+    -----
+    The input buffers are filled directly from the output ports in the source
+    modules' port data arrays because the latter are not modified while the
+    modules exchange data.
+    """
+
+    def __init__(self, module, modules, barrier=None):
+        super(LocalTransport, self).__init__(module)
+        self.modules = modules
+        self.barrier = barrier
+
+    def exchange(self):
+        m = self.module
+
+        # Wait for all modules to finish their current step:
+        if self.barrier is not None:
+            self.barrier.wait()
+        for src_id in m._in_ids:
+            src = self.modules[src_id]
+            for t in ['gpot', 'spike']:
+                buf = m._in_buf[t][src_id]
+                if buf is not None:
+                    np.take(src.data[t], src._out_port_dict_ids[t][m.id],
+                            out=buf)
+
+        # Wait for all modules to read their input before any of them
+        # modifies its output ports during the next step:
+        if self.barrier is not None:
+            self.barrier.wait()
+
+class _LocalComm(object):
+    """
+    Stand-in for the intercommunicator between modules and their manager.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def isend(self, data, dest=0, tag=None):
+        self.manager._handle_worker_msg(data)
+
+class LocalManager(Manager):
+    """
+    Module manager that runs all modules in the current process.
+
+    Parameters
+    ----------
+    required_args : list of str
+        Arguments that must be passed to the constructors of added modules.
+    ctrl_tag : int
+        Tag to identify control messages.
+    plan_cache_dir : str
+        Directory in which to cache routing plans.
+    threaded : bool
+        If True, run each module in a separate thread and synchronize the
+        threads with a barrier after each step; otherwise, run the modules
+        serially in lockstep in the calling thread.
+
+    Attributes
+    ----------
+    modules : dict
+        Module instances keyed by module identifier. Populated by `spawn()`.
+
+    Notes
+    -----
+    The `add()` and `connect()` methods are inherited from
+    `neurokernel.core.Manager`; `start()` must be called with a finite number
+    of steps. In serial mode, the emulation is run to completion by `start()`;
+    in threaded mode, `wait()` blocks until the threads finish. In threaded
+    mode, an exception raised while a module exchanges data aborts the
+    emulation and is raised by `wait()` even if the module's `debug` flag is
+    not set.
+    """
+
+    def __init__(self, required_args=['sel', 'sel_in', 'sel_out',
+                                      'sel_gpot', 'sel_spike'],
+                 ctrl_tag=CTRL_TAG, plan_cache_dir=None, threaded=False):
+        super(LocalManager, self).__init__(required_args, ctrl_tag,
+                                           plan_cache_dir)
+        self.threaded = threaded
+        self.modules = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._errors = []
+        self._sampler = None
+
+    @property
+    def _is_parent(self):
+        return True
+
+    def _handle_worker_msg(self, msg):
+        with self._lock:
+            if msg[0] == 'done':
+                self.log_info('module %s done' % msg[1])
+            else:
+                self.process_worker_msg(msg)
+
+    def _instantiate(self):
+        """
+        Instantiate the added modules in the current process.
+
+        Returns
+        -------
+        modules : list of core.Module
+            Module instances in order of their ranks.
+        """
+
+        self.compute_routing_plans()
+        self._log_memory_usage()
+        self.modules = {}
+        modules = []
+        for rank in sorted(self._targets.keys()):
+            kwargs = self._kwargs[rank].copy()
+            kwargs['routing_table'] = self.routing_table
+            m = self._targets[rank](**kwargs)
+
+            # Override the MPI rank of the module:
+            m._rank = rank
+            for k, v in self.target_attrs(rank).iteritems():
+                setattr(m, k, v)
+            self.modules[m.id] = m
+            modules.append(m)
+        return modules
+
+    def spawn(self, info=None, pool=None):
+        """
+        Instantiate and initialize all added modules.
+
+        Parameters
+        ----------
+        info, pool : object
+            Ignored; accepted for compatibility with `core.Manager.spawn()`.
+        """
+
+        if self.threaded:
+            self._barrier = Barrier(len(self))
+        else:
+            self._barrier = None
+        modules = self._instantiate()
+        comm = _LocalComm(self)
+        for m in modules:
+            m._intercomm = comm
+            m.transport = LocalTransport(m, self.modules, self._barrier)
+        for m in modules:
+            m.pre_run()
+        self.log_info('instantiated %i modules' % len(modules))
+
+    def _call(self, m, f):
+        """
+        Call a module method, suppressing exceptions unless debugging.
+        """
+
+        if m.debug:
+            f()
+        else:
+            catch_exception(f, m.log_info)
+
+    def _run_serial(self, steps):
+        modules = [self.modules[self.rank_to_id[rank]] \
+                   for rank in sorted(self.rank_to_id.keys())]
+        for i in xrange(steps):
+            for m in modules:
+                self._call(m, m._compute)
+            for m in modules:
+                self._call(m, m._sync)
+                m.steps += 1
+
+    def _run_thread(self, m, steps):
+        try:
+            for i in xrange(steps):
+                if self._barrier.aborted:
+                    break
+                self._call(m, m._compute)
+
+                # A suppressed exception raised in _sync() would leave the
+                # thread waiting on the barrier out of phase with the other
+                # threads, so the emulation is aborted instead:
+                m._sync()
+                m.steps += 1
+        except BarrierAbortedError:
+            pass
+        except Exception as e:
+            m.log_info('aborting emulation: %s' % e)
+            self._errors.append(e)
+            self._barrier.abort()
+
+    def start(self, steps):
+        """
+        Run the emulation for the specified number of steps.
+        """
+
+        if steps == float('inf'):
+            raise ValueError('number of steps must be finite')
+        steps = int(steps)
+        self.steps = steps
+        self.log_info('running %i steps' % steps)
+        if self.threaded:
+            self._threads = [threading.Thread(target=self._run_thread,
+                                              args=(m, steps),
+                                              name=str(id)) \
+                             for id, m in self.modules.iteritems()]
+            for t in self._threads:
+                t.daemon = True
+                t.start()
+        else:
+            self._run_serial(steps)
+
+    def stop(self):
+        self.log_info('stop ignored by in-process manager')
+
+    def quit(self):
+        self.log_info('quit ignored by in-process manager')
+
+    def sample(self, interval=0.005, prefix='profile', timer='prof'):
+        """
+        Start sampling the call stacks of the current process.
+
+        Since all modules run in the current process, a single file named
+        '<prefix>.local.folded' is written when sampling is stopped by
+        `stop_sampling()` or by `wait()`; in threaded mode, the stacks of all
+        threads are sampled. See `neurokernel.mpi.WorkerManager.sample()`
+        for a description of the parameters.
+        """
+
+        self.stop_sampling()
+        self._sampler = StackSampler(interval, timer, self.threaded)
+        self._sample_file = '%s.local.folded' % prefix
+        self._sampler.start()
+
+    def stop_sampling(self):
+        """
+        Stop sampling and write the samples.
+        """
+
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler.write(self._sample_file)
+            self.log_info('wrote %s stack samples to %s' % \
+                          (self._sampler.samples, self._sample_file))
+            self._sampler = None
+
+    def wait(self):
+        """
+        Wait for the emulation to finish and finalize the modules.
+        """
+
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        self.stop_sampling()
+        for m in self.modules.itervalues():
+            m.post_run()
+        if self._errors:
+            raise self._errors[0]
+        self.log_info('avg step sync time/avg per-step throughput' \
+                      '/total transm throughput/run loop duration:' \
+                      '%s, %s, %s, %s' % \
+                      (self.average_step_sync_time, self.average_throughput,
+                       self.total_throughput, self.stop_time-self.start_time))
+        self._log_step_profile()
+        self._log_load_balance()
+        self._log_peak_rss()
+        self._write_trace()
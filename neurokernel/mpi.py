@@ -9,13 +9,24 @@ import os
 import re
 import subprocess
 import sys
+import time
 
-from mpi4py import MPI
-
-from mpi_proc import getargnames, Process, ProcessManager
+from mpi_proc import getargnames, Process, ProcessManager, ProcessPool, \
+     _format_phases
 from mixins import LoggerMixin
 from tools.logging import setup_logger, set_excepthook
 from tools.misc import memoized_property
+from tools.mpi import MPI
+
+def _cancel(requests):
+    """
+    Cancel pending requests.
+    """
+
+    for r in requests:
+        if r != MPI.REQUEST_NULL:
+            r.Cancel()
+            r.Wait()
 
 class Worker(Process):
     """
@@ -27,8 +38,20 @@ class Worker(Process):
     ----------
     ctrl_tag : int
         MPI tag to identify control messages transmitted to worker nodes.
+
+    Attributes
+    ----------
+    tracer : neurokernel.profiler.Tracer
+        If set, the receipt of each control message is recorded as an event
+        named after the message.
+    sampler : neurokernel.profiler.StackSampler
+        Sampler of the worker's call stack; set while sampling is enabled by
+        'sample' control messages.
     """
 
+    tracer = None
+    sampler = None
+
     def __init__(self, ctrl_tag=1, *args, **kwargs):
         super(Worker, self).__init__(*args, **kwargs)
 
@@ -90,12 +113,42 @@ class Worker(Process):
         self.intercomm.isend(['done', self.rank], 0, self._ctrl_tag)
         self.log_info('done message sent to manager')
 
+    def _set_sampling(self, args):
+        """
+        Start or stop sampling the worker's call stack.
+
+        Parameters
+        ----------
+        args : tuple
+            Sampling interval in seconds, name of the file to which to write
+            the samples in collapsed stack format, and timer passed to
+            `neurokernel.profiler.StackSampler`. If None, sampling is stopped
+            and the samples are written to the file.
+        """
+
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler.write(self._sample_file)
+            self.log_info('wrote %s stack samples to %s' % \
+                          (self.sampler.samples, self._sample_file))
+            self.sampler = None
+        if args is not None:
+            from profiler import StackSampler
+
+            interval, self._sample_file, timer = args
+            self.sampler = StackSampler(interval, timer)
+            self.sampler.start()
+            self.log_info('sampling call stack every %s s' % interval)
+
     def run(self):
         """
         Main body of worker process.
         """
 
+        start = time.time()
         self.pre_run()
+        self.intercomm.isend(['pre_run_time', (self.rank, time.time()-start)],
+                             0, self._ctrl_tag)
 
         self.log_info('running body of worker %s' % self.rank)
 
@@ -118,6 +171,8 @@ class Worker(Process):
             flag, msg_list = req.testall(r_ctrl)
             if flag:
                 msg = msg_list[0]
+                if self.tracer is not None:
+                    self.tracer.event(msg[0])
 
                 # Start executing work method:
                 if msg[0] == 'start':
@@ -148,6 +203,10 @@ class Worker(Process):
                     else:
                         self.log_info('max steps set - not quitting')
 
+                # Start or stop sampling the call stack:
+                elif msg[0] == 'sample':
+                    self._set_sampling(msg[1])
+
                 # Get next message:
                 r_ctrl = []
                 try:
@@ -171,6 +230,13 @@ class Worker(Process):
                 self.log_info('maximum steps reached')
                 break
 
+        # Cancel the pending receipt of control messages so that it cannot
+        # intercept messages meant for a subsequent worker run in the same
+        # process:
+        _cancel(r_ctrl)
+
+        # Write the call stack samples if sampling was not stopped:
+        self._set_sampling(None)
         self.post_run()
 
 class WorkerManager(ProcessManager):
@@ -189,7 +255,7 @@ class WorkerManager(ProcessManager):
     ----------
     ctrl_tag : int
         MPI tag to identify control messages transmitted to worker nodes.
-        May not be equal to mpi4py.MPI.ANY_TAG
+        Must be nonnegative, and hence not equal to mpi4py.MPI.ANY_TAG.
 
     Notes
     -----
@@ -203,8 +269,9 @@ class WorkerManager(ProcessManager):
     def __init__(self, ctrl_tag=1):
         super(WorkerManager, self).__init__()
 
-        # Validate control tag.
-        assert ctrl_tag != MPI.ANY_TAG                           
+        # Validate control tag; MPI tags are nonnegative and MPI.ANY_TAG is not,
+        # so checking the sign does not require importing mpi4py.MPI:
+        assert ctrl_tag >= 0
 
         # Tag used to distinguish MPI control messages:
         self._ctrl_tag = ctrl_tag
@@ -260,6 +327,12 @@ class WorkerManager(ProcessManager):
                     self.log_info('removing %s from worker list' % msg[1])
                     workers.remove(msg[1])
 
+                # Add the duration of the workers' pre_run() methods to their
+                # startup phases:
+                elif msg[0] == 'pre_run_time':
+                    rank, t = msg[1]
+                    self.startup_phases.setdefault(rank, {})['pre_run'] = t
+
                 # Additional control messages from the workers are processed
                 # here:
                 else:
@@ -279,6 +352,10 @@ class WorkerManager(ProcessManager):
             if not workers:
                 self.log_info('finished running manager')
                 break
+        _cancel(r_ctrl)
+        if self.startup_phases:
+            self.log_info('longest startup phases: %s' % \
+                          _format_phases(self.startup_phases))
 
     def start(self, steps=float('inf')):
         """
@@ -301,6 +378,53 @@ class WorkerManager(ProcessManager):
         for dest in xrange(len(self)):
             self.intercomm.isend(['stop'], dest, self._ctrl_tag)
 
+    def _worker_label(self, rank):
+        """
+        Label identifying a worker in the names of its output files.
+        """
+
+        return str(rank)
+
+    def sample(self, interval=0.005, prefix='profile', timer='prof'):
+        """
+        Tell the workers to start sampling their call stacks.
+
+        Parameters
+        ----------
+        interval : float
+            Sampling interval in seconds.
+        prefix : str
+            Prefix of the output files. Each worker writes its samples in
+            collapsed stack format to the file '<prefix>.<label>.folded',
+            where the label identifies the worker, when sampling is stopped
+            by `stop_sampling()` or the worker finishes.
+        timer : {'prof', 'real'}
+            Sample at intervals of CPU time or of wall clock time; see
+            `neurokernel.profiler.StackSampler`.
+
+        Notes
+        -----
+        The workers handle the message between execution steps, so sampling
+        may be started and stopped while an emulation is running. The output
+        files may be merged into a flame graph with
+        `python -m neurokernel.tools.flamegraph`.
+        """
+
+        self.log_info('sending sample message')
+        for dest in xrange(len(self)):
+            file_name = '%s.%s.folded' % (prefix, self._worker_label(dest))
+            self.intercomm.isend(['sample', (interval, file_name, timer)],
+                                 dest, self._ctrl_tag)
+
+    def stop_sampling(self):
+        """
+        Tell the workers to stop sampling their call stacks.
+        """
+
+        self.log_info('sending stop sampling message')
+        for dest in xrange(len(self)):
+            self.intercomm.isend(['sample', None], dest, self._ctrl_tag)
+
     def quit(self):
         """
         Tell the workers to quit.
@@ -312,7 +436,6 @@ class WorkerManager(ProcessManager):
 
 if __name__ == '__main__':
     import neurokernel.mpi_relaunch
-    import time
 
     setup_logger(screen=True, file_name='neurokernel.log',
             mpi_comm=MPI.COMM_WORLD, multiline=True)
@@ -4,21 +4,42 @@
 Backend program invoked by MPI spawn.
 """
 
+import time
+
+# Record when the backend starts running and when each subsequent startup phase
+# ends so that the durations of the phases can be reported to the spawning
+# process:
+marks = [('interpreter', time.time())]
+
+def mark(phase):
+    marks.append((phase, time.time()))
+
 import importlib
+import sys
+import traceback
 
 # Use dill for mpi4py object serialization to accomodate a wider range of argument
 # possibilities than possible with pickle:
 import dill
 
 # XXX This is a Neuroarch-related workaround required to compensate for dill's
-# inability to serialize namedtuple within a module:
-try:
-    import pyorient.ogm.graph
-except ImportError:
-    pass
-else:
-    setattr(pyorient.ogm.graph, 'orientdb_version',
-            pyorient.ogm.graph.ServerVersion)
+# inability to serialize namedtuple within a module; the workaround is applied
+# when the module is first imported (e.g., while unpickling a target that uses
+# it) rather than here because importing pyorient is slow:
+class PyorientWorkaround(object):
+    name = 'pyorient.ogm.graph'
+
+    def find_module(self, name, path=None):
+        if name == self.name:
+            return self
+
+    def load_module(self, name):
+        sys.meta_path.remove(self)
+        module = importlib.import_module(name)
+        setattr(module, 'orientdb_version', module.ServerVersion)
+        return module
+
+sys.meta_path.insert(0, PyorientWorkaround())
 
 # Fix for bug https://github.com/uqfoundation/dill/issues/81
 @dill.register(property)
@@ -47,12 +68,15 @@ except AttributeError:
 # emitters below can succeed; using a relative import in either place can cause
 # the name of the class to not match:
 import neurokernel.tools.mpi
+from neurokernel.tools.logging import log_exception
 
 # Process needs to be imported directly into the script's namespace in order to
 # ensure that the issubclass() check later in the script succeeds:
 from neurokernel.mpi_proc import Process
 import neurokernel.mpi_proc
 
+mark('imports')
+
 size = MPI.COMM_WORLD.Get_size()
 rank = MPI.COMM_WORLD.Get_rank()
 parent = MPI.Comm.Get_parent()
@@ -78,21 +102,87 @@ for k, v in emitters.iteritems():
                                             MPI.COMM_WORLD, mode, False)))
     else:
         twiggy.emitters[k] = v
-
-# Get the routing table:
-routing_table =  parent.bcast(None, root=0)
-
-# Get the target class/function and its constructor arguments:
-target, target_globals, kwargs = parent.recv()
-
-# Insert the transmitted globals into the current scope:
-globals()[target.__name__] = target
-for k, n in target_globals.iteritems():
-    globals()[k] = n
-
-# Add the routing table to the target arguments:
-kwargs['routing_table'] = routing_table
-
-# Instantiate and run the target class:
-instance = target(**kwargs)
-instance.run()
+mark('emitters')
+
+def run_target(pooled=False):
+    """
+    Receive a target from the spawning process, instantiate it, and run it.
+
+    Parameters
+    ----------
+    pooled : bool
+        If True, the current process belongs to a process pool; the target
+        accesses its peers through an intracommunicator that excludes pooled
+        processes left idle by the spawning process.
+    """
+
+    # Get the routing table:
+    routing_table = neurokernel.mpi_proc._loads(parent.bcast(None, root=0))
+    mark('routing_table')
+
+    # Get the target class/function, its globals, its serialized constructor
+    # arguments, and any attributes to set before running it, followed by
+    # the large arrays among the arguments and attributes; pooled processes
+    # that are not needed receive None:
+    data = parent.recv()
+    instance = None
+    error = None
+    if data is not None:
+        target, target_globals = data[:2]
+        try:
+            kwargs, attrs = map(neurokernel.mpi_proc._loads, data[2:4])
+        except Exception:
+            error = traceback.format_exc()
+            neurokernel.mpi_proc._discard_arrays(parent, data[4])
+        else:
+            neurokernel.mpi_proc._receive_arrays(parent, [kwargs, attrs])
+    mark('unpickle')
+    if pooled:
+        comm = MPI.COMM_WORLD.Split(0 if data is not None else MPI.UNDEFINED,
+                                    rank)
+    if data is not None and error is None:
+        try:
+
+            # Insert the transmitted globals into the current scope:
+            globals()[target.__name__] = target
+            for k, n in target_globals.iteritems():
+                globals()[k] = n
+
+            # Add the routing table to the target arguments:
+            kwargs['routing_table'] = routing_table
+
+            # Instantiate the target class:
+            instance = target(**kwargs)
+            for k, v in attrs.iteritems():
+                setattr(instance, k, v)
+            if pooled:
+                instance._intracomm = comm
+                instance._size = comm.Get_size()
+        except Exception:
+            error = traceback.format_exc()
+    mark('init')
+
+    # Report whether the target was instantiated and how long it took to start
+    # and only run it if all of the targets were instantiated:
+    parent.gather((error, marks[:]), root=0)
+    del marks[:]
+    if parent.bcast(None, root=0) and instance is not None:
+        instance.run()
+    if pooled and data is not None:
+        comm.Free()
+
+if '--pool' in sys.argv:
+
+    # Report how long the process took to start:
+    parent.gather(marks[:], root=0)
+    del marks[:]
+
+    # Run the targets of successive managers until the pool is closed; errors
+    # raised by a target are logged and do not terminate the process:
+    while parent.bcast(None, root=0) is not None:
+        try:
+            run_target(True)
+        except Exception:
+            log_exception(*sys.exc_info())
+else:
+    run_target()
@@ -4,9 +4,12 @@
 Classes for managing MPI-based processes.
 """
 
+from collections import OrderedDict
+import cPickle
 import inspect
 import os
 import sys
+import time
 
 # Use dill for mpi4py object serialization to accomodate a wider range of argument
 # possibilities than possible with pickle:
@@ -17,23 +20,31 @@ import dill
 def save_property(pickler, obj):
     pickler.save_reduce(property, (obj.fget, obj.fset, obj.fdel), obj=obj)
 
+import numpy as np
 import twiggy
-from mpi4py import MPI
-
-# The MPI._p_pickle attribute in the stable release of mpi4py 1.3.1
-# was renamed to pickle in subsequent dev revisions:
-try:
-    MPI.pickle.dumps = dill.dumps
-    MPI.pickle.loads = dill.loads
-except AttributeError:
-    MPI._p_pickle.dumps = dill.dumps
-    MPI._p_pickle.loads = dill.loads
 
 from mixins import LoggerMixin
 from tools.logging import set_excepthook
 from tools.misc import memoized_property
+from tools.mpi import MPI, mpi_initialized
 from all_global_vars import all_global_vars
 
+def _use_dill(MPI):
+    """
+    Make mpi4py serialize objects with dill.
+    """
+
+    # The MPI._p_pickle attribute in the stable release of mpi4py 1.3.1
+    # was renamed to pickle in subsequent dev revisions:
+    try:
+        MPI.pickle.dumps = dill.dumps
+        MPI.pickle.loads = dill.loads
+    except AttributeError:
+        MPI._p_pickle.dumps = dill.dumps
+        MPI._p_pickle.loads = dill.loads
+
+MPI.on_import(_use_dill)
+
 def getargnames(f):
     """
     Get names of a callable's arguments.
@@ -59,6 +70,19 @@ def getargnames(f):
     else:
         return spec.args
 
+def _is_importable(target):
+    """
+    Check whether a class can be imported by name from its module.
+
+    Classes defined in the __main__ module or within functions cannot be
+    imported by spawned processes and must be serialized with the globals
+    that they access.
+    """
+
+    module = sys.modules.get(target.__module__)
+    return target.__module__ != '__main__' and module is not None and \
+        getattr(module, target.__name__, None) is target
+
 def args_to_dict(f, *args, **kwargs):
     """
     Combine sequential and named arguments in single dictionary.
@@ -90,13 +114,241 @@ def args_to_dict(f, *args, **kwargs):
         d[arg] = val
     return d
 
+def _spawn_backend(maxprocs, info=None, args=[]):
+    """
+    Spawn MPI processes running the backend program.
+
+    Parameters
+    ----------
+    maxprocs : int
+        Number of processes to spawn.
+    info : dict
+        Keys and values of the MPI info object passed to the spawn call.
+    args : list of str
+        Additional command line arguments passed to the backend program.
+
+    Returns
+    -------
+    intercomm : mpi4py.MPI.Intercomm
+        Intercommunicator to the spawned processes. The twiggy logging
+        emitters of the current process have already been transmitted to the
+        spawned processes so that they can configure their logging facilities.
+    """
+
+    # Find the path to the mpi_backend.py script (which should be in the
+    # same directory as this module:
+    parent_dir = os.path.dirname(__file__)
+    mpi_backend_path = os.path.join(parent_dir, 'mpi_backend.py')
+
+    # Spawn processes:
+    if info:
+        mpi_info = MPI.Info.Create()
+        for k, v in info.iteritems():
+            mpi_info.Set(k, str(v))
+    else:
+        mpi_info = MPI.INFO_NULL
+    intercomm = MPI.COMM_SELF.Spawn(sys.executable,
+                                    args=[mpi_backend_path]+args,
+                                    maxprocs=maxprocs,
+                                    info=mpi_info)
+    if info:
+        mpi_info.Free()
+
+    # Transmit twiggy logging emitters to spawned processes:
+    for i in xrange(maxprocs):
+        intercomm.send(twiggy.emitters, i)
+    return intercomm
+
+def _dumps(obj):
+    """
+    Serialize an object with cPickle if possible, otherwise with dill.
+
+    Parameters
+    ----------
+    obj : object
+        Object to serialize.
+
+    Returns
+    -------
+    data : tuple
+        Flag indicating whether dill was used and the serialized object.
+
+    Notes
+    -----
+    cPickle is much faster than dill for large data structures such as
+    selectors and data frames, but serializes functions and classes by
+    reference; objects that refer to anything defined in the __main__ module
+    must therefore be serialized with dill because they cannot be
+    deserialized in a spawned process.
+    """
+
+    try:
+        s = cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+    except (cPickle.PicklingError, TypeError, AttributeError):
+        pass
+    else:
+        if 'c__main__\n' not in s:
+            return (False, s)
+    return (True, dill.dumps(obj))
+
+def _loads(data):
+    """
+    Deserialize an object serialized with `_dumps()`.
+    """
+
+    use_dill, s = data
+    if use_dill:
+        return dill.loads(s)
+    else:
+        return cPickle.loads(s)
+
+class _OutOfBand(object):
+    """
+    Placeholder for an array transmitted separately from pickled data.
+
+    Parameters
+    ----------
+    index : int
+        Position of the array in the sequence of transmitted arrays.
+    dtype : numpy.dtype
+        Array data type.
+    shape : tuple of int
+        Array shape.
+    """
+
+    def __init__(self, index, dtype, shape):
+        self.index = index
+        self.dtype = dtype
+        self.shape = shape
+
+def _extract_arrays(dicts, min_nbytes):
+    """
+    Replace large arrays in dictionaries with placeholders.
+
+    Parameters
+    ----------
+    dicts : list of dict
+        Dictionaries whose values may be arrays.
+    min_nbytes : int
+        Size in bytes of the smallest array to replace.
+
+    Returns
+    -------
+    dicts : list of dict
+        Copies of the dictionaries in which arrays of numerical or other
+        fixed-size types containing at least `min_nbytes` bytes are replaced
+        by `_OutOfBand` placeholders.
+    arrays : list of numpy.ndarray
+        Contiguous replaced arrays in the order of the placeholders'
+        indices.
+    """
+
+    arrays = []
+    result = []
+    for d in dicts:
+        d = d.copy()
+        for k, v in d.iteritems():
+            if isinstance(v, np.ndarray) and v.nbytes >= min_nbytes and \
+               not v.dtype.hasobject:
+                d[k] = _OutOfBand(len(arrays), v.dtype, v.shape)
+                arrays.append(np.ascontiguousarray(v))
+        result.append(d)
+    return result, arrays
+
+def _receive_arrays(comm, dicts, source=0):
+    """
+    Receive the arrays replaced by placeholders in dictionaries.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+        Communicator over which the arrays are transmitted.
+    dicts : list of dict
+        Dictionaries containing `_OutOfBand` placeholders; the placeholders
+        are replaced in place by the received arrays.
+    source : int
+        Rank of the process transmitting the arrays.
+    """
+
+    placeholders = sorted([(v.index, d, k) for d in dicts \
+                           for k, v in d.iteritems() \
+                           if isinstance(v, _OutOfBand)])
+    for index, d, k in placeholders:
+        a = np.empty(d[k].shape, d[k].dtype)
+        if a.size:
+            comm.Recv([a, MPI.BYTE], source)
+        d[k] = a
+
+def _discard_arrays(comm, n, source=0):
+    """
+    Receive and discard arrays that cannot be matched with placeholders.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+        Communicator over which the arrays are transmitted.
+    n : int
+        Number of transmitted arrays.
+    source : int
+        Rank of the process transmitting the arrays.
+    """
+
+    status = MPI.Status()
+    for i in xrange(n):
+        comm.Probe(source, status=status)
+        comm.Recv([bytearray(status.Get_count(MPI.BYTE)), MPI.BYTE], source)
+
+def startup_phases(start, marks):
+    """
+    Compute the durations of the startup phases of a spawned process.
+
+    Parameters
+    ----------
+    start : float
+        Time at which the spawning process started the phases.
+    marks : list of tuple
+        Names of the phases and the times at which they ended in the order in
+        which they occurred.
+
+    Returns
+    -------
+    phases : collections.OrderedDict
+        Durations of the phases in seconds keyed by phase name.
+
+    Notes
+    -----
+    Durations that span both processes (e.g., the time taken to start the
+    interpreter) are only meaningful if they run on the same host.
+    """
+
+    phases = OrderedDict()
+    for phase, t in marks:
+        phases[phase] = t-start
+        start = t
+    return phases
+
+def _format_phases(phases):
+    """
+    Summarize the longest duration of each startup phase over all processes.
+    """
+
+    longest = OrderedDict()
+    for p in phases.itervalues():
+        for phase, t in p.iteritems():
+            longest[phase] = max(longest.get(phase, 0.0), t)
+    return ', '.join(['%s=%.3f s' % (phase, t) for \
+                      phase, t in longest.iteritems()])
+
 class Process(LoggerMixin):
     """
     Process class.
     """
 
     def __init__(self, *args, **kwargs):        
-        LoggerMixin.__init__(self, 'prc %s' % MPI.COMM_WORLD.Get_rank())
+
+        # Processes forked by neurokernel.multiproc do not initialize MPI:
+        rank = MPI.COMM_WORLD.Get_rank() if mpi_initialized() else 0
+        LoggerMixin.__init__(self, 'prc %s' % rank)
         set_excepthook(self.logger, True)
 
         self._args = args
@@ -148,11 +400,13 @@ class Process(LoggerMixin):
 
         self.intercomm.send(data, 0, tag=tag)
 
-    def recv_parent(self, tag=MPI.ANY_TAG):
+    def recv_parent(self, tag=None):
         """
         Receive data from parent process.
         """
 
+        if tag is None:
+            tag = MPI.ANY_TAG
         return self.intercomm.recv(tag=tag)
 
     def send_peer(self, data, dest, tag=0):
@@ -162,7 +416,11 @@ class Process(LoggerMixin):
 
         self.intracomm.send(data, dest, tag=tag)
 
-    def recv_peer(self, source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
+    def recv_peer(self, source=None, tag=None):
+        if source is None:
+            source = MPI.ANY_SOURCE
+        if tag is None:
+            tag = MPI.ANY_TAG
         return self.intracomm.recv(source=source, tag=tag)
 
 class ProcessManager(LoggerMixin):
@@ -177,10 +435,19 @@ class ProcessManager(LoggerMixin):
         self._targets = {}
         self._args = {}
         self._kwargs = {}
-        self._intercomm = MPI.COMM_NULL
+        self._intercomm = None
 
         self._rank = 0
 
+        # Arrays passed to the target constructors that contain at least this
+        # many bytes are transmitted without being pickled:
+        self.min_out_of_band_nbytes = 2**16
+
+        # Time taken by spawn() to start the targets and durations of the
+        # startup phases of each target keyed by rank:
+        self.startup_time = 0.0
+        self.startup_phases = {}
+
     @property
     def intercomm(self):
         """
@@ -223,6 +490,44 @@ class ProcessManager(LoggerMixin):
     def __len__(self):
         return len(self._targets)
 
+    def reorder(self, ranks):
+        """
+        Reassign the MPI ranks of the managed targets.
+
+        Parameters
+        ----------
+        ranks : sequence of int
+            Current ranks of the targets in the order of their new ranks,
+            i.e., the target currently assigned rank `ranks[i]` is assigned
+            rank `i`.
+        """
+
+        if sorted(ranks) != sorted(self._targets.keys()):
+            raise ValueError('ranks must be a permutation of the current ranks')
+        targets = self._targets
+        kwargs = self._kwargs
+        self._targets = {i: targets[r] for i, r in enumerate(ranks)}
+        self._kwargs = {i: kwargs[r] for i, r in enumerate(ranks)}
+
+    def target_attrs(self, rank):
+        """
+        Attributes to set on a target instance before it is run.
+
+        Parameters
+        ----------
+        rank : int
+            MPI rank of target.
+
+        Returns
+        -------
+        attrs : dict
+            Attribute values keyed by attribute name. Subclasses may override
+            this method to ship data to a spawned target without passing it
+            to the target's constructor.
+        """
+
+        return {}
+
     @memoized_property
     def _is_parent(self):
         """
@@ -231,50 +536,104 @@ class ProcessManager(LoggerMixin):
 
         return MPI.Comm.Get_parent() == MPI.COMM_NULL
 
-    def spawn(self):
+    def spawn(self, info=None, pool=None):
         """
         Spawn MPI processes for and execute each of the managed targets.
+
+        Parameters
+        ----------
+        info : dict
+            Keys and values of the MPI info object passed to the spawn call,
+            e.g., {'hostfile': file_name} to start the processes on the hosts
+            listed in an MPI hostfile.
+        pool : ProcessPool
+            Pool of previously spawned processes in which to run the targets
+            instead of spawning new processes. The pool must contain at least
+            as many processes as there are targets; `info` is ignored.
+
+        Notes
+        -----
+        This method returns after all targets have been instantiated; the time
+        taken to do so is stored in the `startup_time` attribute. The
+        durations of the phases of each target's startup (see
+        `startup_phases()`) are stored in the `startup_phases` attribute keyed
+        by rank; processes that were spawned for the targets report the time
+        taken to start the interpreter, import modules, and set up logging as
+        well as the time taken to receive the routing table, receive the
+        target, and instantiate it.
         """
 
         if self._is_parent:
-            # Find the path to the mpi_backend.py script (which should be in the
-            # same directory as this module:
-            parent_dir = os.path.dirname(__file__)
-            mpi_backend_path = os.path.join(parent_dir, 'mpi_backend.py')
-
-            # Spawn processes:
-            self._intercomm = MPI.COMM_SELF.Spawn(sys.executable,
-                                            args=[mpi_backend_path],
-                                            maxprocs=len(self))
-
-            # First, transmit twiggy logging emitters to spawned processes so
-            # that they can configure their logging facilities:
-            for i in self._targets.keys():
-                self._intercomm.send(twiggy.emitters, i)
+            start = time.time()
+            if pool is None:
+                self._intercomm = _spawn_backend(len(self), info)
+            else:
+                self._intercomm = pool.acquire(len(self))
 
-            # Next, serialize the routing table ONCE and then transmit it to all
+            # Serialize the routing table ONCE and then transmit it to all
             # of the child nodes:
-            self._intercomm.bcast(self.routing_table, root=MPI.ROOT)
+            self._intercomm.bcast(_dumps(self.routing_table), root=MPI.ROOT)
 
             # Transmit class to instantiate, globals required by the class, and
             # the constructor arguments; the backend will wait to receive
             # them and then start running the targets on the appropriate nodes.
             req = MPI.Request()
             r_list = []
+            arrays = []
             for i in self._targets.keys():
-                target_globals = all_global_vars(self._targets[i])
+
+                # Classes that the spawned processes can import need not be
+                # accompanied by their globals:
+                if _is_importable(self._targets[i]):
+                    target_globals = {}
+                else:
+                    target_globals = all_global_vars(self._targets[i])
 
                 # Serializing atexit with dill appears to fail in virtualenvs
                 # sometimes if atexit._exithandlers contains an unserializable function:
                 if 'atexit' in target_globals:
                     del target_globals['atexit']
-                data = (self._targets[i], target_globals, self._kwargs[i])
+
+                # Transmit large arrays in the constructor arguments and
+                # attributes as raw buffers after the pickled data:
+                (kwargs, attrs), a_list = \
+                    _extract_arrays([self._kwargs[i], self.target_attrs(i)],
+                                    self.min_out_of_band_nbytes)
+                a_list = [a for a in a_list if a.size]
+                data = (self._targets[i], target_globals, _dumps(kwargs),
+                        _dumps(attrs), len(a_list))
                 r_list.append(self._intercomm.isend(data, i))
+                for a in a_list:
+                    r_list.append(self._intercomm.Isend([a, MPI.BYTE], i))
+                arrays.extend(a_list)
 
                 # Need to clobber data to prevent all_global_vars from
                 # including it in its output:
-                del data
+                del data, kwargs, attrs, a_list
+
+            # Pooled processes not needed by this manager are left idle:
+            for i in xrange(len(self), self._intercomm.Get_remote_size()):
+                r_list.append(self._intercomm.isend(None, i))
             req.Waitall(r_list)
+            del arrays
+
+            # Wait for all targets to be instantiated:
+            results = self._intercomm.gather(None, root=MPI.ROOT)
+            failed = [(i, r[0]) for i, r in enumerate(results) \
+                      if r[0] is not None]
+            self._intercomm.bcast(not failed, root=MPI.ROOT)
+            if failed:
+                raise RuntimeError('target %s failed to start:\n%s' % \
+                                   failed[0])
+            self.startup_time = time.time()-start
+            self.startup_phases = {i: startup_phases(start, results[i][1]) \
+                                   for i in self._targets.keys()}
+            if pool is not None:
+                pool.startup_times.append(self.startup_time)
+            self.log_info('started %i targets in %s s' % \
+                          (len(self), self.startup_time))
+            self.log_info('longest startup phases: %s' % \
+                          _format_phases(self.startup_phases))
 
     def send(self, data, dest, tag=0):
         """
@@ -283,13 +642,116 @@ class ProcessManager(LoggerMixin):
 
         self.intercomm.send(data, dest, tag=0)
 
-    def recv(self, tag=MPI.ANY_TAG):
+    def recv(self, tag=None):
         """
         Receive data from child process.
         """
 
+        if tag is None:
+            tag = MPI.ANY_TAG
         return self.intercomm.recv(tag=tag)
 
+class ProcessPool(LoggerMixin):
+    """
+    Pool of MPI processes reused by successive process managers.
+
+    Spawning MPI processes and importing the packages required by the targets
+    in them can take much longer than running a short emulation. The
+    processes in a pool remain alive after a manager's targets finish so that
+    the targets of other managers (e.g., the emulations in a parameter sweep)
+    can be run in them by passing the pool to `ProcessManager.spawn()`.
+
+    Parameters
+    ----------
+    size : int
+        Number of processes to spawn.
+    info : dict
+        Keys and values of the MPI info object passed to the spawn call.
+
+    Attributes
+    ----------
+    size : int
+        Number of processes in the pool.
+    spawn_time : float
+        Time taken to spawn the processes in seconds.
+    startup_phases : dict
+        Durations of the startup phases of each process keyed by rank (see
+        `startup_phases()`).
+    startup_times : list of float
+        Time taken to start the targets of each run in the pool in seconds.
+
+    Notes
+    -----
+    Only one manager may use the pool at a time; a run ends when the
+    manager's `wait()` method returns. Since the processes are reused, state
+    stored in module-level variables or class attributes of the targets
+    persists between runs. Targets of a run that uses fewer processes than
+    the pool contains communicate with each other through an
+    intracommunicator that excludes the idle processes.
+    """
+
+    def __init__(self, size, info=None):
+        LoggerMixin.__init__(self, 'pool')
+        self.size = size
+        self.startup_times = []
+        start = time.time()
+        self._intercomm = _spawn_backend(size, info, ['--pool'])
+        marks = self._intercomm.gather(None, root=MPI.ROOT)
+        self.spawn_time = time.time()-start
+        self.startup_phases = {i: startup_phases(start, m) \
+                               for i, m in enumerate(marks)}
+        self.log_info('spawned %i processes in %s s' % (size, self.spawn_time))
+        self.log_info('longest startup phases: %s' % \
+                      _format_phases(self.startup_phases))
+
+    @property
+    def intercomm(self):
+        """
+        Intercommunicator to the pooled processes.
+        """
+
+        return self._intercomm
+
+    def acquire(self, n):
+        """
+        Tell the pooled processes to prepare for a new run.
+
+        Parameters
+        ----------
+        n : int
+            Number of targets to run.
+
+        Returns
+        -------
+        intercomm : mpi4py.MPI.Intercomm
+            Intercommunicator to the pooled processes.
+        """
+
+        if self._intercomm == MPI.COMM_NULL:
+            raise ValueError('pool is closed')
+        if n > self.size:
+            raise ValueError('pool contains only %i processes' % self.size)
+        self._intercomm.bcast('run', root=MPI.ROOT)
+        return self._intercomm
+
+    def close(self):
+        """
+        Tell the pooled processes to exit.
+        """
+
+        if self._intercomm != MPI.COMM_NULL:
+            # Like other spawned processes, the pooled processes remain
+            # connected to the current process until MPI is finalized:
+            self._intercomm.bcast(None, root=MPI.ROOT)
+            self._intercomm = MPI.COMM_NULL
+            self.log_info('closed pool')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 if __name__ == '__main__':
     import mpi_relaunch
 
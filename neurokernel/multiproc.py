@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+"""
+Execution of emulations in forked processes on a single node.
+
+The manager in this module runs each module in a separate process created with
+the multiprocessing package rather than spawned by MPI. The data transmitted
+along each connection is exchanged through buffers in anonymous shared memory
+that are allocated before the processes are forked; the processes signal the
+availability and consumption of the data in these buffers through pipes.
+
+Neurokernel imports `mpi4py.MPI` (and thereby initializes MPI) only when MPI is
+first used, so the module processes are not forked from a process in which MPI
+has been initialized unless the program has used MPI itself.
+"""
+
+import mmap
+import multiprocessing as mp
+import os
+import traceback
+from Queue import Empty
+
+import numpy as np
+
+from core import CTRL_TAG
+from local import LocalManager
+from transport import Transport
+
+class _Link(object):
+    """
+    Shared memory and pipes for the data transmitted along a connection.
+
+    Parameters
+    ----------
+    lengths : dict of int
+        Number of elements of each type of port data transmitted. Types of
+        data that are not transmitted may be omitted.
+    dtypes : dict of numpy.dtype
+        Types of the transmitted data.
+
+    Notes
+    -----
+    The shared memory contains two slots for each type of data so that the
+    source module may write the data for the next step while the destination
+    module reads the data for the current step. The source module writes one
+    byte to the `ready` pipe after filling a slot; the destination module
+    writes one byte to the `done` pipe after reading it.
+    """
+
+    def __init__(self, lengths, dtypes):
+        sizes = {t: lengths[t]*np.dtype(dtypes[t]).itemsize \
+                 for t in lengths}
+        sizes = {t: n+(-n % 8) for t, n in sizes.iteritems()}
+        self.mem = mmap.mmap(-1, max(2*sum(sizes.values()), 1))
+        self.slots = {}
+        offset = 0
+        for t in sorted(lengths):
+            self.slots[t] = []
+            for i in xrange(2):
+                self.slots[t].append(np.frombuffer(self.mem, dtypes[t],
+                                                   lengths[t], offset))
+                offset += sizes[t]
+        self.ready = os.pipe()
+        self.done = os.pipe()
+
+    def close(self):
+        for fd in self.ready+self.done:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+class SharedMemoryPipeTransport(Transport):
+    """
+    Transport that exchanges data through shared memory between forked processes.
+
+    Parameters
+    ----------
+    module : core.Module
+        Module whose buffers are transmitted and received.
+    links : dict of _Link
+        Shared memory and pipes keyed by (source id, destination id) tuples.
+    """
+
+    def __init__(self, module, links):
+        super(SharedMemoryPipeTransport, self).__init__(module)
+        self.links = links
+        self._step = 0
+
+    def setup(self):
+        m = self.module
+        self._out = [(dest_id, self.links[(m.id, dest_id)]) \
+                     for dest_id in m._out_ids]
+        self._in = [(src_id, self.links[(src_id, m.id)]) \
+                    for src_id in m._in_ids]
+
+    def exchange(self):
+        m = self.module
+        k = self._step
+        slot = k % 2
+
+        # Write the output data once the destination module has read the data
+        # previously written to the same slot:
+        for dest_id, link in self._out:
+            if k >= 2:
+                os.read(link.done[0], 1)
+            for t in ['gpot', 'spike']:
+                if m._out_buf[t][dest_id] is not None:
+                    link.slots[t][slot][:] = m._out_buf[t][dest_id]
+            os.write(link.ready[1], b'1')
+        self._posted()
+
+        # Read the input data once the source modules have written it:
+        for src_id, link in self._in:
+            os.read(link.ready[0], 1)
+            self._received(src_id)
+            for t in ['gpot', 'spike']:
+                if m._in_buf[t][src_id] is not None:
+                    m._in_buf[t][src_id][:] = link.slots[t][slot]
+            os.write(link.done[1], b'1')
+        self._step += 1
+
+class _QueueComm(object):
+    """
+    Stand-in for the intercommunicator between a module and its manager.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def isend(self, data, dest=0, tag=None):
+        self.queue.put(data)
+
+def _run_module(m, conn, queue):
+    """
+    Body of a forked module process.
+    """
+
+    try:
+        m.pre_run()
+
+        # Sampling messages may precede the number of steps:
+        msg = conn.recv()
+        while isinstance(msg, list) and msg[0] == 'sample':
+            m._set_sampling(msg[1])
+            msg = conn.recv()
+        steps = msg
+        for i in xrange(steps):
+            m.do_work()
+            m.steps += 1
+        m._set_sampling(None)
+        m.post_run()
+    except Exception:
+
+        # Report the error before the exception terminates the process:
+        queue.put(['error', (m.rank, traceback.format_exc())])
+        raise
+
+class MultiprocessingManager(LocalManager):
+    """
+    Module manager that runs each module in a forked process.
+
+    Parameters
+    ----------
+    required_args : list of str
+        Arguments that must be passed to the constructors of added modules;
+        the graded potential and spiking port selectors are needed to compute
+        the sizes of the shared memory buffers.
+    ctrl_tag : int
+        Tag to identify control messages.
+    plan_cache_dir : str
+        Directory in which to cache routing plans.
+
+    Attributes
+    ----------
+    poll_interval : float
+        Interval in seconds at which `wait()` checks whether any module
+        process exited without reporting that it finished.
+
+    Notes
+    -----
+    The manager exposes the same `add()`, `connect()`, `spawn()`, `start()`,
+    and `wait()` methods and the same synchronization statistics as
+    `neurokernel.core.Manager`, but does not use MPI to start processes or
+    transmit data. `start()` must be called with a finite number of steps.
+    Since the processes are forked, the module classes need not be
+    serializable.
+    """
+
+    poll_interval = 1.0
+
+    def __init__(self, required_args=['sel', 'sel_in', 'sel_out',
+                                      'sel_gpot', 'sel_spike'],
+                 ctrl_tag=CTRL_TAG, plan_cache_dir=None):
+        super(MultiprocessingManager, self).__init__(required_args, ctrl_tag,
+                                                     plan_cache_dir, False)
+        self._processes = {}
+        self._conns = {}
+        self._links = {}
+
+    def spawn(self, info=None, pool=None):
+        """
+        Allocate shared memory and fork a process for each added module.
+
+        Parameters
+        ----------
+        info, pool : object
+            Ignored; accepted for compatibility with `core.Manager.spawn()`.
+        """
+
+        modules = self._instantiate()
+        for m in modules:
+            if m.id not in self.routing_plans:
+                raise ValueError('cannot determine buffer sizes of %s' % m.id)
+
+        # Allocate the shared memory for each connection from the lengths of
+        # the destination modules' input buffers:
+        for m in modules:
+            plan = self.routing_plans[m.id]
+            for src_id in plan.in_ids:
+                lengths = {t: plan.in_buf_len[t][src_id] \
+                           for t in ['gpot', 'spike'] \
+                           if plan.in_buf_len[t][src_id]}
+                dtypes = {t: m.pm[t].dtype for t in lengths}
+                self._links[(src_id, m.id)] = _Link(lengths, dtypes)
+
+        self._queue = mp.Queue()
+        for m in modules:
+            m._intercomm = _QueueComm(self._queue)
+            m.transport = SharedMemoryPipeTransport(m, self._links)
+            parent_conn, child_conn = mp.Pipe()
+            p = mp.Process(target=_run_module, args=(m, child_conn, self._queue),
+                           name=str(m.id))
+            p.daemon = True
+            p.start()
+            self._processes[m.rank] = p
+            self._conns[m.rank] = parent_conn
+        self.log_info('forked %i module processes' % len(modules))
+
+    def start(self, steps):
+        """
+        Tell the module processes to run the specified number of steps.
+        """
+
+        if steps == float('inf'):
+            raise ValueError('number of steps must be finite')
+        self.steps = int(steps)
+        self.log_info('sending steps message (%s)' % self.steps)
+        for conn in self._conns.itervalues():
+            conn.send(self.steps)
+
+    def sample(self, interval=0.005, prefix='profile', timer='prof'):
+        """
+        Tell the module processes to sample their call stacks.
+
+        Each module writes its samples to the file
+        '<prefix>.<module id>.folded' when it finishes. Must be called after
+        `spawn()` and before `start()`; see
+        `neurokernel.mpi.WorkerManager.sample()` for a description of the
+        parameters.
+        """
+
+        for rank, conn in self._conns.iteritems():
+            file_name = '%s.%s.folded' % (prefix, self._worker_label(rank))
+            conn.send(['sample', (interval, file_name, timer)])
+
+    def stop_sampling(self):
+        self.log_info('module processes stop sampling when they finish')
+
+    def wait(self):
+        """
+        Wait for the module processes to finish.
+
+        Raises
+        ------
+        RuntimeError
+            If a module process raised an exception or exited without
+            reporting that it finished (e.g., because it was killed by a
+            signal); all other module processes are terminated.
+        """
+
+        workers = set(self._processes.keys())
+        exited = set()
+        try:
+            while workers:
+                try:
+                    msg = self._queue.get(timeout=self.poll_interval)
+                except Empty:
+
+                    # A process flushes its messages to the queue before it
+                    # exits, so a process that had already exited before the
+                    # last poll and still has not reported will never do so:
+                    lost = workers & exited
+                    if lost:
+                        for p in self._processes.itervalues():
+                            p.terminate()
+                        rank = min(lost)
+                        raise RuntimeError('module %s exited with code %s '
+                                           'without finishing' % \
+                                           (self.rank_to_id[rank],
+                                            self._processes[rank].exitcode))
+                    exited = set([rank for rank in workers \
+                                  if self._processes[rank].exitcode is not None])
+                    continue
+                if msg[0] == 'done':
+                    self.log_info('removing %s from worker list' % msg[1])
+                    workers.discard(msg[1])
+                elif msg[0] == 'error':
+                    rank, tb = msg[1]
+                    for p in self._processes.itervalues():
+                        p.terminate()
+                    raise RuntimeError('module %s failed:\n%s' % \
+                                       (self.rank_to_id[rank], tb))
+                else:
+                    self.process_worker_msg(msg)
+        finally:
+            for p in self._processes.itervalues():
+                p.join()
+            for link in self._links.itervalues():
+                link.close()
+            self._processes = {}
+            self._conns = {}
+            self._links = {}
+        self.log_info('avg step sync time/avg per-step throughput' \
+                      '/total transm throughput/run loop duration:' \
+                      '%s, %s, %s, %s' % \
+                      (self.average_step_sync_time, self.average_throughput,
+                       self.total_throughput, self.stop_time-self.start_time))
+        self._log_step_profile()
+        self._log_load_balance()
+        self._log_peak_rss()
+        self._write_trace()
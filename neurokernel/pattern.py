@@ -7,6 +7,7 @@ Represent connectivity pattern using pandas DataFrame.
 from collections import OrderedDict
 import itertools
 import re
+import time
 
 import networkx as nx
 import numpy as np
@@ -14,6 +15,77 @@ import pandas as pd
 
 from plsel import Selector, SelectorMethods
 from pm import BasePortMapper
+from tools.memory import pandas_memory_usage
+from tools.npz import encode_values, decode_values, load_npz, save_npz
+
+def _assigned_values(s):
+    """
+    Return the set of non-null values in a (possibly categorical) Series.
+    """
+
+    if s.dtype.name == 'category':
+        codes = np.asarray(s.cat.codes)
+        return set(s.cat.categories[np.unique(codes[codes >= 0])])
+    else:
+        return set(s.dropna().unique())
+
+def _code_dtype(n):
+    """
+    Return the smallest signed integer type that can hold codes in [-1, n).
+    """
+
+    return np.int32 if n < np.iinfo(np.int32).max else np.int64
+
+def _index_codes(idx):
+    """
+    Return the levels of an index and the integer codes of its rows.
+    """
+
+    if isinstance(idx, pd.MultiIndex):
+        return list(idx.levels), [np.asarray(c) for c in idx.labels]
+    else:
+        codes, uniques = pd.factorize(idx)
+        return [pd.Index(uniques)], [codes]
+
+def _encode_columns(df, prefix, arrays):
+    """
+    Dictionary-encode the columns of a DataFrame into a dict of arrays.
+    """
+
+    arrays[prefix+'columns'], arrays[prefix+'column_kinds'] = \
+        encode_values(df.columns)
+    for j, k in enumerate(df.columns):
+        s = df[k]
+        is_cat = s.dtype.name == 'category'
+        if is_cat:
+            codes, uniques = np.asarray(s.cat.codes), s.cat.categories
+        else:
+            codes, uniques = pd.factorize(s)
+        arrays[prefix+'col_%i' % j] = codes.astype(_code_dtype(len(uniques)))
+        arrays[prefix+'col_values_%i' % j], arrays[prefix+'col_kinds_%i' % j] = \
+            encode_values(uniques)
+        arrays[prefix+'col_cat_%i' % j] = np.array(is_cat)
+
+def _decode_columns(arrays, prefix, idx):
+    """
+    Create a DataFrame from columns encoded by `_encode_columns`.
+    """
+
+    columns = decode_values(arrays[prefix+'columns'],
+                            arrays[prefix+'column_kinds'])
+    df = pd.DataFrame(index=idx)
+    for j, k in enumerate(columns):
+        codes = np.asarray(arrays[prefix+'col_%i' % j])
+        values = decode_values(arrays[prefix+'col_values_%i' % j],
+                               arrays[prefix+'col_kinds_%i' % j])
+        if arrays[prefix+'col_cat_%i' % j]:
+            c = pd.Categorical.from_codes(codes, values)
+        else:
+
+            # Codes of -1 select the trailing NaN:
+            c = np.array(values+[np.nan], dtype=object)[codes]
+        df[k] = pd.Series(c, index=idx)
+    return df
 
 class Interface(object):
     """
@@ -36,6 +108,14 @@ class Interface(object):
     (i.e., every 'in' port in one interface must be mirrored by an 'out' port
     in the other interface.
 
+    The 'interface', 'io', and 'type' attributes are stored as categorical
+    columns so that filtering ports by attribute compares small integer codes
+    rather than arrays of Python objects. The positions of the ports in each
+    combination of these attributes are indexed the first time they are
+    requested; the index is discarded whenever the interface is modified via
+    its methods or its `data` attribute is replaced. If the contents of
+    `data` are modified in place, `clear_port_cache()` must be called.
+
     Examples
     --------
     >>> i = Interface('/foo[0:4],/bar[0:3]')
@@ -63,6 +143,12 @@ class Interface(object):
     plsel.SelectorMethods
     """
 
+    # Categories always present in the categorical attribute columns; values
+    # not listed here are added as extra categories when they are assigned:
+    _categories = OrderedDict([('interface', []),
+                               ('io', ['in', 'out']),
+                               ('type', ['gpot', 'spike'])])
+
     def __init__(self, selector='', columns=['interface', 'io', 'type']):
 
         # All ports in an interface must contain at least the following
@@ -75,10 +161,234 @@ class Interface(object):
         idx = self.sel.make_index(selector, names)
         self.__validate_index__(idx)
         self.data = pd.DataFrame(index=idx, columns=columns, dtype=object)
+        self._to_categorical(self.data)
 
         # Dictionary containing mappers for different port types:
         self.pm = {}
-        
+
+    @property
+    def data(self):
+        """
+        Port attribute data.
+        """
+
+        return self._data
+
+    @data.setter
+    def data(self, df):
+        self._data = df
+        self.clear_port_cache()
+
+    def clear_port_cache(self):
+        """
+        Discard the cached positions of the ports in each port class.
+        """
+
+        self._port_classes = None
+        self._port_inds = {}
+
+    def _get_port_classes(self):
+        """
+        Return the positions of the ports for each (interface, io, type) combination.
+
+        Returns
+        -------
+        port_classes : dict of numpy.ndarray
+            Sorted integer positions of the ports in the interface's rows keyed by
+            tuples of 'interface', 'io', and 'type' attribute values; unset
+            attribute values are represented by None.
+        """
+
+        if self._port_classes is not None:
+            return self._port_classes
+
+        # Combine the categorical codes of the three attributes into a single
+        # key per port (the codes of unset values are -1):
+        key = np.zeros(len(self.data), dtype=np.int64)
+        categories = []
+        for k in ['interface', 'io', 'type']:
+            c = self.data[k].values
+            if self.data[k].dtype.name != 'category':
+                c = pd.Categorical(c)
+            key = key*(len(c.categories)+1)+(np.asarray(c.codes, np.int64)+1)
+            categories.append(c.categories)
+
+        # A stable sort keeps the positions in each class in ascending order:
+        order = np.argsort(key, kind='mergesort')
+        key_sorted = key[order]
+        keys, starts = np.unique(key_sorted, return_index=True)
+        stops = np.append(starts[1:], len(key_sorted))
+
+        self._port_classes = {}
+        for key, start, stop in zip(keys, starts, stops):
+            attrs = []
+            for cat in reversed(categories):
+                key, code = divmod(key, len(cat)+1)
+                attrs.insert(0, cat[code-1] if code else None)
+            self._port_classes[tuple(attrs)] = order[start:stop]
+        return self._port_classes
+
+    def port_inds(self, i=None, io=None, type=None):
+        """
+        Return the positions of the ports with the specified attributes.
+
+        Parameters
+        ----------
+        i : int
+            Interface identifier. If None, ports in all interfaces are
+            considered.
+        io : str
+            Input/output attribute ('in' or 'out'). If None, both input and
+            output ports are considered.
+        type : str
+            Port type ('gpot' or 'spike'). If None, ports of all types are
+            considered.
+
+        Returns
+        -------
+        inds : numpy.ndarray of int
+            Sorted integer positions of the selected ports in the interface's
+            rows; may be used to index the rows of `data` or `index`.
+
+        Notes
+        -----
+        The returned array may be shared with the interface's cache and should
+        not be modified.
+        """
+
+        q = (i, io, type)
+        if q in self._port_inds:
+            return self._port_inds[q]
+        result = [v for k, v in self._get_port_classes().iteritems() \
+                  if all([a is None or a == b for a, b in zip(q, k)])]
+        if not result:
+            inds = np.array([], dtype=np.int64)
+        elif len(result) == 1:
+            inds = result[0]
+        else:
+            inds = np.sort(np.concatenate(result))
+        self._port_inds[q] = inds
+        return inds
+
+    def memory_usage(self):
+        """
+        Memory used by the interface.
+
+        Returns
+        -------
+        usage : collections.OrderedDict
+            Number of bytes used by the port index and attribute columns (see
+            `neurokernel.tools.memory.pandas_memory_usage()`), the cached
+            port positions ('port_cache'), and the port mappers in `pm`
+            ('pm.<type>').
+        """
+
+        usage = pandas_memory_usage(self.data)
+        arrays = {}
+        if self._port_classes is not None:
+            arrays.update({id(a): a for a in self._port_classes.itervalues()})
+        arrays.update({id(a): a for a in self._port_inds.itervalues()})
+        usage['port_cache'] = sum([a.nbytes for a in arrays.itervalues()])
+        for t in sorted(self.pm.keys()):
+            usage['pm.%s' % t] = sum(self.pm[t].memory_usage().values())
+        return usage
+
+    def filter_ports(self, i=None, io=None, type=None, tuples=False):
+        """
+        Restrict Interface ports to those with the specified attributes.
+
+        Examples
+        --------
+        >>> i = Interface('/foo[0:4]')
+        >>> i['/foo[0:2]'] = [0, 'in', 'gpot']
+        >>> i['/foo[2:4]'] = [0, 'out', 'spike']
+        >>> i.filter_ports(io='in', type='gpot', tuples=True)
+        [('foo', 0), ('foo', 1)]
+
+        Parameters
+        ----------
+        i : int
+            Interface identifier. If None, ports in all interfaces are returned.
+        io : str
+            Input/output attribute ('in' or 'out'). If None, both input and
+            output ports are returned.
+        type : str
+            Port type ('gpot' or 'spike'). If None, ports of all types are
+            returned.
+        tuples : bool
+            If True, return a list of tuples; if False, return an
+            Interface instance.
+
+        Returns
+        -------
+        interface : Interface or list of tuples
+            Either an Interface instance containing the selected ports and their
+            attributes, or a list of tuples corresponding to the expanded ports.
+            Single-level identifiers are returned as 1-tuples.
+        """
+
+        inds = self.port_inds(i, io, type)
+        if tuples:
+            idx = self.index[inds]
+            if isinstance(idx, pd.MultiIndex):
+                return idx.tolist()
+            else:
+                return [(t,) for t in idx]
+        else:
+            return self.from_df(self.data.iloc[inds])
+
+    @classmethod
+    def _make_categories(cls, k, values):
+        """
+        Return the sorted categories of an attribute column given its values.
+        """
+
+        extra = set(v for v in values if not pd.isnull(v))
+        extra.difference_update(cls._categories[k])
+        return cls._categories[k]+sorted(extra)
+
+    @classmethod
+    def _to_categorical(cls, df):
+        """
+        Convert the attribute columns of a DataFrame to categorical columns in place.
+        """
+
+        for k in cls._categories:
+            if k not in df.columns:
+                continue
+            c = pd.Categorical(np.asarray(df[k], dtype=object),
+                               categories=cls._make_categories(k,
+                                   _assigned_values(df[k])))
+            df[k] = pd.Series(c, index=df.index)
+
+    def _add_categories(self, k, value):
+        """
+        Ensure that a value can be assigned to a categorical attribute column.
+        """
+
+        if k not in self._categories or k not in self.data.columns or \
+           self.data[k].dtype.name != 'category':
+            return
+        values = [value] if np.isscalar(value) else np.asarray(value).ravel()
+        categories = self.data[k].cat.categories
+        if all([pd.isnull(v) or v in categories for v in values]):
+            return
+        self.data[k] = self.data[k].cat.set_categories(
+            self._make_categories(k, list(categories)+list(values)))
+
+    def _attr_mask(self, k, value):
+        """
+        Return a boolean array that is True for ports whose attribute `k` is `value`.
+        """
+
+        s = self.data[k]
+        if s.dtype.name != 'category':
+            return np.asarray(s == value)
+        categories = s.cat.categories
+        if value not in categories:
+            return np.zeros(len(s), dtype=np.bool)
+        return s.cat.codes.values == categories.get_loc(value)
+
     def __validate_index__(self, idx):
         """
         Raise an exception if the specified index will result in an invalid interface.
@@ -130,7 +440,9 @@ class Interface(object):
                 raise ValueError('cannot assign specified value')
 
         for k, v in data.iteritems():
+            self._add_categories(k, v)
             self.data[k].ix[idx] = v
+        self.clear_port_cache()
 
     def __setitem__(self, key, value):
         if type(key) == tuple:
@@ -180,8 +492,10 @@ class Interface(object):
             s = self.sel.pad_selector(selector.expanded,
                                       len(self.index.shape))
         for k, v in data.iteritems():
+            self._add_categories(k, v)
             self.data[k].ix[s] = v
-        
+        self.clear_port_cache()
+
     @property
     def index(self):
         """
@@ -193,6 +507,7 @@ class Interface(object):
     @index.setter
     def index(self, i):
         self.data.index = i
+        self.clear_port_cache()
 
     @property
     def interface_ids(self):
@@ -200,7 +515,13 @@ class Interface(object):
         Interface identifiers.
         """
 
-        return set(self.data['interface'])
+        result = _assigned_values(self.data['interface'])
+
+        # Include a null entry if any ports are not associated with an
+        # interface:
+        if self.data['interface'].isnull().any():
+            result.add(np.nan)
+        return result
 
     @property
     def io_inv(self):
@@ -217,6 +538,7 @@ class Interface(object):
         data_inv = self.data.copy()
         f = lambda x: 'out' if x == 'in' else \
             ('in' if x == 'out' else x)
+        data_inv['io'] = np.asarray(data_inv['io'], dtype=object)
         data_inv['io'] = data_inv['io'].apply(f)
         return self.from_df(data_inv)
 
@@ -237,6 +559,7 @@ class Interface(object):
         """
 
         self.data.drop(self.data.index, inplace=True)
+        self.clear_port_cache()
 
     def data_select(self, f, inplace=False):
         """
@@ -297,7 +620,8 @@ class Interface(object):
         Notes
         -----
         The contents of the specified DataFrame instance are copied into the
-        new Interface instance.
+        new Interface instance. The 'interface', 'io', and 'type' columns of the
+        copy are converted to categorical columns.
         """
 
         assert set(df.columns).issuperset(['interface', 'io', 'type'])
@@ -314,6 +638,7 @@ class Interface(object):
         else:
             raise ValueError('invalid index type')
         i.data = df.copy()
+        cls._to_categorical(i.data)
         i.__validate_index__(i.index)
         return i
 
@@ -433,6 +758,57 @@ class Interface(object):
             i[sel_int, 'interface'] = n
         return i
 
+    @classmethod
+    def load(cls, file_name, mmap_mode=None):
+        """
+        Load an Interface from a file written by `Interface.save()`.
+
+        Parameters
+        ----------
+        file_name : str
+            Input file name.
+        mmap_mode : {None, 'r', 'r+', 'c'}
+            If not None, memory-map the arrays in the file with the specified
+            mode rather than reading them into memory.
+
+        Returns
+        -------
+        i : Interface
+            Loaded Interface instance.
+        """
+
+        arrays = load_npz(file_name, mmap_mode)
+        if unicode(arrays['kind']) != u'interface':
+            raise ValueError('file does not contain an interface')
+        return cls._from_arrays(arrays, 'int_')
+
+    @classmethod
+    def _from_arrays(cls, arrays, prefix):
+        """
+        Create an Interface from arrays created by `_to_arrays()`.
+        """
+
+        num_levels = int(arrays[prefix+'num_levels'])
+        idx_levels = int(arrays[prefix+'idx_levels'])
+        levels = [decode_values(arrays[prefix+'level_%i' % j],
+                                arrays[prefix+'level_kinds_%i' % j]) \
+                  for j in xrange(idx_levels)]
+        codes = [np.asarray(arrays[prefix+'codes_%i' % j]) \
+                 for j in xrange(idx_levels)]
+        if arrays[prefix+'multi']:
+            idx = pd.MultiIndex(levels=levels, labels=codes,
+                                names=range(num_levels),
+                                verify_integrity=False)
+        else:
+            idx = pd.Index(np.array(levels[0]+[np.nan], dtype=object)[codes[0]],
+                           name=0 if num_levels else None)
+        df = _decode_columns(arrays, prefix, idx)
+
+        i = cls('', df.columns)
+        i.num_levels = num_levels
+        i.data = df
+        return i
+
     def gpot_ports(self, i=None, tuples=False):
         """
         Restrict Interface ports to graded potential ports.
@@ -453,27 +829,20 @@ class Interface(object):
             corresponding to the expanded ports.
         """
 
-        if i is None:
-            try:
-                df = self.data[self.data['type'] == 'gpot']
-            except:
-                df = None
-        else:
-            try:
-                df = self.data[(self.data['type'] == 'gpot') & \
-                               (self.data['interface'] == i)]
-            except:
-                df = None
+        try:
+            inds = self.port_inds(i, type='gpot')
+        except:
+            inds = None
         if tuples:
-            if df is None:
+            if inds is None:
                 return []
             else:
-                return df.index.tolist()
+                return self.index[inds].tolist()
         else:
-            if df is None:
+            if inds is None:
                 return Interface()
             else:
-                return self.from_df(df)
+                return self.from_df(self.data.iloc[inds])
 
     def in_ports(self, i=None, tuples=False):
         """
@@ -495,27 +864,20 @@ class Interface(object):
             corresponding to the expanded ports.
         """
 
-        if i is None:
-            try:
-                df = self.data[self.data['io'] == 'in']
-            except:
-                df = None
-        else:
-            try:
-                df = self.data[(self.data['io'] == 'in') & \
-                               (self.data['interface'] == i)]
-            except:
-                df = None
+        try:
+            inds = self.port_inds(i, io='in')
+        except:
+            inds = None
         if tuples:
-            if df is None:
+            if inds is None:
                 return []
             else:
-                return df.index.tolist()
+                return self.index[inds].tolist()
         else:
-            if df is None:
+            if inds is None:
                 return Interface()
             else:
-                return self.from_df(df)
+                return self.from_df(self.data.iloc[inds])
 
     def interface_ports(self, i=None, tuples=False):
         """
@@ -544,19 +906,19 @@ class Interface(object):
                 return self.copy()
         else:
             try:
-                df = self.data[self.data['interface'] == i]
+                inds = self.port_inds(i)
             except:
-                df = None
+                inds = None
             if tuples:
-                if df is None:
+                if inds is None:
                     return []
                 else:
-                    return df.index.tolist()
+                    return self.index[inds].tolist()
             else:
-                if df is None:
+                if inds is None:
                     return Interface()
                 else:
-                    return self.from_df(df)
+                    return self.from_df(self.data.iloc[inds])
 
     def _merge_on_interfaces(self, a, i, b):
         """
@@ -572,8 +934,8 @@ class Interface(object):
         """
 
         assert isinstance(i, Interface)
-        df_left = self.data[self.data['interface'] == a]
-        df_right = i.data[i.data['interface'] == b]
+        df_left = self.data[self._attr_mask('interface', a)]
+        df_right = i.data[i._attr_mask('interface', b)]
         n_left_names = len(self.data.index.names)
         n_right_names = len(i.data.index.names)
 
@@ -626,11 +988,13 @@ class Interface(object):
         """
 
         if t is None:
-            x = self.data[self.data['interface'] == a]
-            y = i.data[i.data['interface'] == b]
+            x = self.data[self._attr_mask('interface', a)]
+            y = i.data[i._attr_mask('interface', b)]
         else:
-            x = self.data[(self.data['interface'] == a) & (self.data['type'] == t)]
-            y = i.data[(i.data['interface'] == b) & (i.data['type'] == t)]
+            x = self.data[self._attr_mask('interface', a) & \
+                          self._attr_mask('type', t)]
+            y = i.data[i._attr_mask('interface', b) & \
+                       i._attr_mask('type', t)]
         if isinstance(x.index, pd.MultiIndex):
             x_list = [tuple(a for a in b if a != '') \
                       for b in x.index]
@@ -708,8 +1072,8 @@ class Interface(object):
             
             # If one interface contains identifiers not in the other, they are
             # incompatible:
-            if len(data_merged) < max(len(self.data[self.data['interface'] == a]),
-                                      len(i.data[i.data['interface'] == b])):
+            if len(data_merged) < max(self._attr_mask('interface', a).sum(),
+                                      i._attr_mask('interface', b).sum()):
                 return False
 
             # Compatible identifiers must have the same non-null 'type'
@@ -780,27 +1144,20 @@ class Interface(object):
             corresponding to the expanded ports.
         """
 
-        if i is None:
-            try:
-                df = self.data[self.data['io'] == 'out']
-            except:
-                df = None
-        else:
-            try:
-                df = self.data[(self.data['io'] == 'out') & \
-                               (self.data['interface'] == i)]
-            except:
-                df = None
+        try:
+            inds = self.port_inds(i, io='out')
+        except:
+            inds = None
         if tuples:
-            if df is None:
+            if inds is None:
                 return []
             else:
-                return df.index.tolist()
+                return self.index[inds].tolist()
         else:
-            if df is None:
+            if inds is None:
                 return Interface()
             else:
-                return self.from_df(df)
+                return self.from_df(self.data.iloc[inds])
 
     def port_select(self, f, inplace=False):
         """
@@ -831,6 +1188,43 @@ class Interface(object):
         else:
             return Interface.from_df(self.data.select(f))
 
+    def save(self, file_name):
+        """
+        Save the Interface to a binary file.
+
+        The port identifiers are stored as per-level dictionaries of token
+        values together with an array of integer codes per level; the port
+        attributes are stored as integer codes into per-column dictionaries.
+
+        Parameters
+        ----------
+        file_name : str
+            Output file name. The extension '.npz' is appended if not present.
+
+        See Also
+        --------
+        Interface.load
+        """
+
+        arrays = {'kind': np.array(u'interface')}
+        self._to_arrays('int_', arrays)
+        save_npz(file_name, arrays)
+
+    def _to_arrays(self, prefix, arrays):
+        """
+        Encode the Interface's ports and attributes into a dict of arrays.
+        """
+
+        levels, codes = _index_codes(self.index)
+        arrays[prefix+'multi'] = np.array(isinstance(self.index, pd.MultiIndex))
+        arrays[prefix+'num_levels'] = np.array(self.num_levels)
+        arrays[prefix+'idx_levels'] = np.array(len(levels))
+        for j, (l, c) in enumerate(zip(levels, codes)):
+            arrays[prefix+'level_%i' % j], arrays[prefix+'level_kinds_%i' % j] = \
+                encode_values(l)
+            arrays[prefix+'codes_%i' % j] = c.astype(_code_dtype(len(l)))
+        _encode_columns(self.data, prefix, arrays)
+
     def spike_ports(self, i=None, tuples=False):
         """
         Restrict Interface ports to spiking ports.
@@ -851,27 +1245,20 @@ class Interface(object):
             corresponding to the expanded ports.
         """
 
-        if i is None:
-            try:
-                df = self.data[self.data['type'] == 'spike']
-            except:
-                df = None
-        else:
-            try:
-                df = self.data[(self.data['type'] == 'spike') & \
-                               (self.data['interface'] == i)]
-            except:
-                df = None
+        try:
+            inds = self.port_inds(i, type='spike')
+        except:
+            inds = None
         if tuples:
-            if df is None:
+            if inds is None:
                 return []
             else:
-                return df.index.tolist()
+                return self.index[inds].tolist()
         else:
-            if df is None:
+            if inds is None:
                 return Interface()
             else:
-                return self.from_df(df)
+                return self.from_df(self.data.iloc[inds])
 
     def to_selectors(self, i=None):
         """
@@ -921,10 +1308,7 @@ class Interface(object):
             else:
                 return [(t,) for t in self.index]
         try:
-            if isinstance(self.index, pd.MultiIndex):
-                return self.data[self.data['interface'] == i].index.tolist()
-            else:
-                return [(t,) for t in self.data[self.data['interface'] == i].index]
+            return self.filter_ports(i, tuples=True)
         except:
             return []
     
@@ -949,16 +1333,12 @@ class Interface(object):
             if not isinstance(self.data.index, pd.MultiIndex):
                 idx = [x[0] for x in idx]
             d = self.data['interface'].ix[idx]
-            s = set(d)
-            s.discard(np.nan)
-            return s
+            return _assigned_values(d)
         except:
             try:
-                s = set(self[s, 'interface'].values.flatten())
 
                 # Ignore unset entries:
-                s.discard(np.nan)
-                return s
+                return _assigned_values(self[s, 'interface']['interface'])
             except KeyError:
                 return set()
 
@@ -1012,7 +1392,17 @@ class Interface(object):
         """
 
         assert isinstance(other, Interface)
-        return self.data.equals(other.data)
+        if not self.data.index.equals(other.data.index) or \
+           list(self.data.columns) != list(other.data.columns):
+            return False
+
+        # Compare the attribute values rather than their categorical encodings:
+        for k in self.data.columns:
+            x = pd.Series(np.asarray(self.data[k], dtype=object))
+            y = pd.Series(np.asarray(other.data[k], dtype=object))
+            if not x.equals(y):
+                return False
+        return True
 
     def __len__(self):
         return self.data.__len__()
@@ -1112,7 +1502,45 @@ class Pattern(object):
         idx = pd.MultiIndex(levels=levels, labels=labels, names=names)
 
         self.data = pd.DataFrame(index=idx, columns=columns, dtype=object)
-        
+
+    @property
+    def data(self):
+        """
+        Connection attribute data.
+        """
+
+        return self._data
+
+    @data.setter
+    def data(self, df):
+        self._data = df
+        self.clear_conn_cache()
+
+    def clear_conn_cache(self):
+        """
+        Discard the cached interface positions of the connected ports.
+        """
+
+        self._conn_pos = None
+
+    def memory_usage(self):
+        """
+        Memory used by the pattern.
+
+        Returns
+        -------
+        usage : collections.OrderedDict
+            Number of bytes used by the connection index and attribute
+            columns (see `neurokernel.tools.memory.pandas_memory_usage()`)
+            followed by those used by the pattern's interface (see
+            `Interface.memory_usage()`) with keys prefixed by 'interface.'.
+        """
+
+        usage = pandas_memory_usage(self.data)
+        for k, v in self.interface.memory_usage().iteritems():
+            usage['interface.%s' % k] = v
+        return usage
+
     @property
     def from_slice(self):
         """
@@ -1140,6 +1568,7 @@ class Pattern(object):
     @index.setter
     def index(self, i):
         self.data.index = i
+        self.clear_conn_cache()
 
     @property
     def interface_ids(self):
@@ -1238,6 +1667,7 @@ class Pattern(object):
 
         self.interface.clear()
         self.data.drop(self.data.index, inplace=True)
+        self.clear_conn_cache()
 
     @classmethod
     def from_df(cls, df_int, df_pat):
@@ -1589,8 +2019,7 @@ class Pattern(object):
             # Validate updated DataFrame's index before updating the instance's
             # data attribute:
             self.__validate_index__(new_data.index)
-            self.data = new_data
-            self.data.sort_index(inplace=True)
+            self.data = new_data.sort_index()
 
         # Update the `io` attributes of the pattern's interfaces:
         self.interface[key[0], 'io'] = 'in'
@@ -1606,6 +2035,87 @@ class Pattern(object):
         else:
             return self.sel.select(self.data, selector=selector)
 
+    def _port_inds(self, i, t=None, ports=None):
+        """
+        Return the positions of the ports in an interface with the specified type.
+
+        Parameters
+        ----------
+        i : int
+            Interface identifier.
+        t : str
+            Port type. If None, ports of all types are returned.
+        ports : str
+            Path-like selector used to further restrict the returned ports.
+
+        Returns
+        -------
+        inds : numpy.ndarray of int
+            Positions of the ports in the interface's rows.
+        """
+
+        inds = self.interface.port_inds(i, type=t)
+        if ports is None:
+            return inds
+        idx = self.sel.select(self.interface.data.iloc[inds], ports).index
+        return self.interface.index.get_indexer(idx)
+
+    def _conn_positions(self):
+        """
+        Return the interface positions of the ports of each connection.
+
+        Returns
+        -------
+        from_pos, to_pos : numpy.ndarray of int
+            Positions in the interface index of the source and destination
+            ports of each connection in the order of the pattern's rows.
+
+        Notes
+        -----
+        The positions are cached until `data` or the interface's data are
+        replaced.
+        """
+
+        if self._conn_pos is None or \
+           self._conn_pos[0] is not self.interface.data:
+            self._conn_pos = (self.interface.data,
+                              self._port_positions(self.from_slice),
+                              self._port_positions(self.to_slice))
+        return self._conn_pos[1:]
+
+    def _port_ids(self, inds):
+        """
+        Return the identifiers of the interface ports at the specified positions.
+
+        Single-level identifiers are returned as 1-tuples.
+        """
+
+        idx = self.interface.index[inds]
+        if isinstance(idx, pd.MultiIndex):
+            return idx.tolist()
+        else:
+            return [(x,) for x in idx]
+
+    def _conn_rows(self, from_inds, to_inds):
+        """
+        Return the rows of the connections between the specified ports.
+
+        Parameters
+        ----------
+        from_inds, to_inds : numpy.ndarray of int
+            Interface positions of the source and destination ports.
+
+        Returns
+        -------
+        rows : numpy.ndarray of int
+            Positions of the pattern rows whose source and destination ports
+            are among the specified ports.
+        """
+
+        from_pos, to_pos = self._conn_positions()
+        return np.nonzero(np.in1d(from_pos, from_inds) & \
+                          np.in1d(to_pos, to_inds))[0]
+
     def src_idx(self, src_int, dest_int, 
                 src_type=None, dest_type=None, dest_ports=None, duplicates=False):
         """
@@ -1644,50 +2154,24 @@ class Pattern(object):
         assert src_int != dest_int
         assert src_int in self.interface.interface_ids and \
             dest_int in self.interface.interface_ids
-        
-        # Filter destination ports by specified type:
-        if dest_type is None:
-            to_int = self.interface.interface_ports(dest_int)
-        else:
-            to_f = lambda x: x['type'] == dest_type
-            to_int = self.interface.interface_ports(dest_int).data_select(to_f)
 
-        # Filter destination ports by specified ports:
-        if dest_ports is None:
-            to_idx = to_int.index
-        else:
-            to_idx = to_int[dest_ports].index
+        # Filter destination ports by specified type and ports:
+        to_inds = self._port_inds(dest_int, dest_type, dest_ports)
 
         # Filter source ports by specified type:
-        if src_type is None:
-            from_int = self.interface.interface_ports(src_int)
-        else:
-            from_f = lambda x: x['type'] == src_type
-            from_int = self.interface.interface_ports(src_int).data_select(from_f)
+        from_inds = self._port_inds(src_int, src_type)
 
-        from_idx = from_int.index
+        # Find the source ports of those rows in the pattern whose ports have
+        # been selected by the above code:
+        from_pos = self._conn_positions()[0][self._conn_rows(from_inds,
+                                                             to_inds)]
 
-        # Construct index from those rows in the pattern whose ports have been
-        # selected by the above code:
-        if isinstance(from_idx, pd.MultiIndex):
-            if isinstance(to_idx, pd.MultiIndex):
-                f = lambda x: x[self.from_slice] in from_idx and x[self.to_slice] in to_idx
-            else:
-                f = lambda x: x[self.from_slice] in from_idx and x[self.to_slice][0] in to_idx
-        else:
-            if isinstance(to_idx, pd.MultiIndex):
-                f = lambda x: x[self.from_slice][0] in from_idx and x[self.to_slice] in to_idx
-            else:
-                f = lambda x: x[self.from_slice][0] in from_idx and x[self.to_slice][0] in to_idx
-        idx = self.data.select(f).index
-                
         if not duplicates:
 
-            # Remove duplicate tuples from output without perturbing the order
-            # of the remaining tuples:
-            return OrderedDict.fromkeys([x[self.from_slice] for x in idx]).keys()
-        else:
-            return [x[self.from_slice] for x in idx]
+            # Remove duplicate ports from output without perturbing the order
+            # of the remaining ports:
+            from_pos = pd.unique(from_pos)
+        return self._port_ids(from_pos)
 
     def dest_idx(self, src_int, dest_int, 
                  src_type=None, dest_type=None, src_ports=None):
@@ -1731,45 +2215,18 @@ class Pattern(object):
         assert src_int in self.interface.interface_ids and \
             dest_int in self.interface.interface_ids
 
-        # Filter source ports by specified type:
-        if src_type is None:
-            from_int = self.interface.interface_ports(src_int)
-        else:
-            from_f = lambda x: x['type'] == src_type
-            from_int = self.interface.interface_ports(src_int).data_select(from_f)
+        # Filter source ports by specified type and ports:
+        from_inds = self._port_inds(src_int, src_type, src_ports)
 
-        # Filter source ports by specified ports:
-        if src_ports is None:
-            from_idx = from_int.index    
-        else:
-            from_idx = from_int[src_ports].index
-            
         # Filter destination ports by specified type:
-        if dest_type is None:
-            to_int = self.interface.interface_ports(dest_int)
-        else:
-            to_f = lambda x: x['type'] == dest_type
-            to_int = self.interface.interface_ports(dest_int).data_select(to_f)
-
-        to_idx = to_int.index
-
-        # Construct index from those rows in the pattern whose ports have been
-        # selected by the above code:
-        if isinstance(from_idx, pd.MultiIndex):
-            if isinstance(to_idx, pd.MultiIndex):
-                f = lambda x: x[self.from_slice] in from_idx and x[self.to_slice] in to_idx
-            else:
-                f = lambda x: x[self.from_slice] in from_idx and x[self.to_slice][0] in to_idx
-        else:
-            if isinstance(to_idx, pd.MultiIndex):
-                f = lambda x: x[self.from_slice][0] in from_idx and x[self.to_slice] in to_idx
-            else:
-                f = lambda x: x[self.from_slice][0] in from_idx and x[self.to_slice][0] in to_idx
-        idx = self.data.select(f).index
+        to_inds = self._port_inds(dest_int, dest_type)
 
-        # Remove duplicate tuples from output without perturbing the order
-        # of the remaining tuples:
-        return OrderedDict.fromkeys([x[self.to_slice] for x in idx]).keys()
+        # Find the destination ports of those rows in the pattern whose ports
+        # have been selected by the above code; since fan-in is not
+        # permitted, each destination port appears at most once:
+        to_pos = self._conn_positions()[1][self._conn_rows(from_inds,
+                                                           to_inds)]
+        return self._port_ids(to_pos)
 
     def __len__(self):
         return self.data.__len__()
@@ -1824,30 +2281,137 @@ class Pattern(object):
                 return True
         return False
 
-    def from_csv(self, file_name, **kwargs):
+    def from_csv(self, file_name, chunksize=100000, validate=True, **kwargs):
         """
         Read connectivity data from CSV file.
 
         Given N 'from' levels and M 'to' levels in the internal index, 
         the method assumes that the first N+M columns in the file specify
-        the index levels.
+        the index levels; the remaining columns are assigned to the
+        pattern's data columns in order. The file is read in chunks; the
+        port identifiers in each chunk are converted to the positions of the
+        ports in the pattern's interface as the chunk is read, so that only
+        the positions and the data columns of the connections are retained.
+        The loaded connections replace those already in the pattern, and the
+        'io' attributes of the connected ports are updated.
+
+        Parameters
+        ----------
+        file_name : str
+            Name of CSV file.
+        chunksize : int
+            Number of rows to read at a time.
+        validate : bool
+            If True, check that the loaded connections do not include
+            duplicate connections, fan-in connections, ports that both send
+            and receive data, or connections between ports in the same
+            interface.
+        kwargs : dict
+            Options to pass to `pandas.read_csv()`.
+
+        Returns
+        -------
+        stats : dict
+            Number of rows read ('rows'), number of chunks read ('chunks'),
+            elapsed time in seconds ('time'), and throughput in rows/second
+            ('rows_per_sec').
+
+        Notes
+        -----
+        Padding levels of identifiers with fewer levels than the interface
+        must be empty fields. Token values are matched by their string
+        representations.
 
         See Also
         --------
         pandas.read_csv
         """
 
-        # XXX this should refuse to load identifiers that are not in any of the
-        # sets of ports comprised by the pattern:
-        data_names = self.data.columns
-        index_names = self.data.index.names
-        kwargs['names'] = data_names
-        kwargs['index_col'] = range(len(index_names))
-        data = pd.read_csv(file_name, **kwargs)
+        start = time.time()
+        num_levels = self.interface.num_levels
+        data_names = list(self.data.columns)
+        index_names = ['from_%i' % i for i in xrange(num_levels)]+\
+                      ['to_%i' % i for i in xrange(num_levels)]
+        kwargs['names'] = index_names+data_names
+        kwargs['chunksize'] = chunksize
+        kwargs['dtype'] = {k: str for k in index_names}
+
+        # Look up the token values of each level by their string
+        # representations; entire identifiers are looked up by combining the
+        # codes of their tokens into a single integer unless there are too
+        # many combinations of token values to represent with int64, in which
+        # case the tuples of codes are looked up:
+        levels, codes = _index_codes(self.interface.index)
+        lookup = [pd.Index([unicode(v) for v in l]) for l in levels]
+        dims = [len(l) for l in levels]
+        if np.prod(dims, dtype=float) < 2**63:
+            combine = lambda c: np.ravel_multi_index(c, dims)
+        else:
+            combine = lambda c: pd.MultiIndex.from_arrays(c)
+        ports = pd.Index(combine(codes)) \
+                if len(self.interface) else pd.Index([])
+        int_codes = np.asarray(self.interface.data['interface'].cat.codes)
+
+        def get_positions(chunk, names):
+            c = [lookup[j].get_indexer(chunk[k].fillna('').values) \
+                 for j, k in enumerate(names)]
+            valid = np.logical_and.reduce([x >= 0 for x in c])
+            pos = np.full(len(chunk), -1, dtype=np.int64)
+            if valid.any():
+                pos[valid] = ports.get_indexer(combine([x[valid] for x in c]))
+            if (pos < 0).any():
+                row = chunk.iloc[np.where(pos < 0)[0][0]]
+                raise ValueError('pattern contains identifiers not in '
+                                 'interface: %s' % \
+                                 self.sel.tokens_to_str(tuple(row[k] \
+                                     for k in names if not pd.isnull(row[k]))))
+            return pos.astype(_code_dtype(len(self.interface)))
+
+        from_list = []
+        to_list = []
+        data_list = []
+        rows = 0
+        chunks = 0
+        for chunk in pd.read_csv(file_name, **kwargs):
+            from_pos = get_positions(chunk, index_names[:num_levels])
+            to_pos = get_positions(chunk, index_names[num_levels:])
+            if validate and (int_codes[from_pos] == int_codes[to_pos]).any():
+                raise ValueError('cannot connect ports in the same interface')
+            from_list.append(from_pos)
+            to_list.append(to_pos)
+            data_list.append(chunk[data_names].reset_index(drop=True))
+            rows += len(chunk)
+            chunks += 1
+        dtype = _code_dtype(len(self.interface))
+        from_pos = np.concatenate(from_list) if from_list else \
+                   np.array([], dtype)
+        to_pos = np.concatenate(to_list) if to_list else \
+                 np.array([], dtype)
+
+        if validate:
+            self._validate_positions(from_pos, to_pos)
+
+        idx = self._index_from_positions(from_pos, to_pos)
+        if data_list:
+            data = pd.concat(data_list, ignore_index=True)
+            data.index = idx
+        else:
+            data = pd.DataFrame(index=idx, columns=data_names, dtype=object)
         self.data = data
 
-        # Restore MultiIndex level names:
-        self.data.index.names = index_names
+        # Update the `io` attributes of the pattern's interfaces:
+        s = self.interface.data['io']
+        io_codes = np.array(s.cat.codes)
+        io_codes[from_pos] = s.cat.categories.get_loc('in')
+        io_codes[to_pos] = s.cat.categories.get_loc('out')
+        self.interface.data['io'] = \
+            pd.Series(pd.Categorical.from_codes(io_codes, s.cat.categories),
+                      index=s.index)
+        self.interface.clear_port_cache()
+
+        t = time.time()-start
+        return {'rows': rows, 'chunks': chunks, 'time': t,
+                'rows_per_sec': rows/t if t > 0 else float('inf')}
 
     @classmethod
     def from_graph(cls, g):
@@ -1866,56 +2430,228 @@ class Pattern(object):
         Notes
         -----
         The nodes in the specified graph must contain an 'interface' attribute.
+        The interfaces are numbered consecutively in the order of the sorted
+        values of the nodes' 'interface' attributes.
 
         Port attributes other than 'interface', 'io', and 'type' are not stored
-        in the created Pattern instance's interface.
+        in the created Pattern instance's interface. The 'io' attributes are 
+        determined from the connection directions.
         """
 
         assert type(g) == nx.DiGraph
 
-        # Group port identifiers by interface number and whether the ports are
-        # graded potential, or spiking:
-        ports_by_int = {}
-        ports_gpot = []
-        ports_spike = []
-        ports_from = []
-        ports_to = []
-        for n, data in g.nodes(data=True):
-            assert SelectorMethods.is_identifier(n)
+        # Tokenize the port identifiers and collect the port attributes:
+        nodes = g.nodes(data=True)
+        node_pos = {}
+        tokens = []
+        int_ids = []
+        types = []
+        for n, data in nodes:
             assert data.has_key('interface')
-            if not ports_by_int.has_key(data['interface']):
-                ports_by_int[data['interface']] = []
-            ports_by_int[data['interface']].append(n)
-
-            if data.has_key('type'):
-                if data['type'] == 'gpot':
-                    ports_gpot.append(n)
-                elif data['type'] == 'spike':
-                    ports_spike.append(n)
+            node_pos[n] = len(tokens)
+            tokens.append(SelectorMethods.identifier_to_tokens(n))
+            int_ids.append(data['interface'])
+            types.append(data['type'] if data.get('type') in ['gpot', 'spike'] \
+                         else np.nan)
+        int_map = {k: i for i, k in enumerate(sorted(set(int_ids)))}
 
         # Use connection direction to determine whether ports are source or
         # destination (XXX should this check whether the io attributes are
         # consistent with the connection directions?):
-        for f, t in g.edges():
-            ports_from.append(f)
-            ports_to.append(t)
-
-        # Create selectors for each interface number:
-        selector_list = []
-        for interface in sorted(ports_by_int.keys()):
-            selector_list.append(','.join(ports_by_int[interface]))
-
-        p = cls.from_concat(*selector_list,
-                            from_sel=','.join(ports_from),
-                            to_sel=','.join(ports_to),
-                            gpot_sel=','.join(ports_gpot),
-                            spike_sel=','.join(ports_spike),
-                            data=1)
-
-        p.data.sort_index(inplace=True)
-        p.interface.data.sort_index(inplace=True)
+        edges = g.edges()
+        from_pos = np.array([node_pos[f] for f, t in edges], dtype=np.int64)
+        to_pos = np.array([node_pos[t] for f, t in edges], dtype=np.int64)
+        io = np.full(len(nodes), np.nan, dtype=object)
+        io[from_pos] = 'in'
+        io[to_pos] = 'out'
+
+        # Create the interface with its ports in sorted order:
+        num_levels = max([len(t) for t in tokens]) if tokens else 0
+        if num_levels == 1:
+            idx = pd.Index([t[0] for t in tokens], name=0)
+        else:
+            idx = pd.MultiIndex.from_tuples([t+('',)*(num_levels-len(t)) \
+                                             for t in tokens],
+                                            names=range(num_levels))
+        df = pd.DataFrame({'interface': [int_map[k] for k in int_ids],
+                           'io': io, 'type': types},
+                          index=idx, columns=['interface', 'io', 'type'],
+                          dtype=object).sort_index()
+        Interface._to_categorical(df)
+        i = Interface('', df.columns)
+        i.num_levels = num_levels
+        i.data = df
+
+        # Create pattern with phony selectors:
+        p = cls('/foo[0]', '/bar[0]')
+        p.interface = i
+        p.num_levels = {'from': num_levels, 'to': num_levels}
+
+        # Map the ports' original positions to those in the sorted interface:
+        sorted_pos = df.index.get_indexer(idx)
+        from_pos = sorted_pos[from_pos]
+        to_pos = sorted_pos[to_pos]
+        p._validate_positions(from_pos, to_pos)
+        p.data = pd.DataFrame({'conn': 1},
+                              index=p._index_from_positions(from_pos, to_pos),
+                              columns=['conn'], dtype=object).sort_index()
         return p
 
+    @classmethod
+    def load(cls, file_name, mmap_mode=None):
+        """
+        Load a Pattern from a file written by `Pattern.save()`.
+
+        Parameters
+        ----------
+        file_name : str
+            Input file name.
+        mmap_mode : {None, 'r', 'r+', 'c'}
+            If not None, memory-map the arrays in the file with the specified
+            mode rather than reading them into memory.
+
+        Returns
+        -------
+        p : Pattern
+            Loaded Pattern instance.
+
+        Notes
+        -----
+        The arrays containing the interface positions of the source and
+        destination ports of each connection are retained as the pattern's
+        cached port positions, which are used by `src_idx()`, `dest_idx()`,
+        and `save()`; when `mmap_mode` is set, these arrays remain mapped to
+        the file and their pages are shared with other processes mapping the
+        same file. The pattern's index is still built from copies of them.
+        Attribute columns other than the interface's 'interface', 'io', and
+        'type' columns are restored with dtype object.
+        """
+
+        arrays = load_npz(file_name, mmap_mode)
+        if unicode(arrays['kind']) != u'pattern':
+            raise ValueError('file does not contain a pattern')
+
+        # Create pattern with phony selectors:
+        pat = cls('/foo[0]', '/bar[0]')
+        pat.interface = Interface._from_arrays(arrays, 'int_')
+        num_levels = pat.interface.num_levels
+        pat.num_levels = {'from': num_levels, 'to': num_levels}
+
+        idx = pat._index_from_positions(arrays['from'], arrays['to'])
+        pat.data = _decode_columns(arrays, 'pat_', idx)
+        pat._conn_pos = (pat.interface.data, arrays['from'], arrays['to'])
+        return pat
+
+    def save(self, file_name):
+        """
+        Save the Pattern to a binary file.
+
+        The pattern's interface is stored as described in `Interface.save()`;
+        each connection is stored as the positions of its source and
+        destination ports in the interface, and the connection attributes are
+        stored as integer codes into per-column dictionaries. The file is an
+        uncompressed numpy .npz archive, so its arrays can be memory-mapped by
+        `Pattern.load()`.
+
+        Parameters
+        ----------
+        file_name : str
+            Output file name. The extension '.npz' is appended if not present.
+        """
+
+        arrays = {'kind': np.array(u'pattern')}
+        self._to_arrays(arrays)
+        save_npz(file_name, arrays)
+
+    def _to_arrays(self, arrays):
+        """
+        Encode the Pattern's interface and connections into a dict of arrays.
+        """
+
+        self.interface._to_arrays('int_', arrays)
+        dtype = _code_dtype(len(self.interface))
+        from_pos, to_pos = self._conn_positions()
+        arrays['from'] = from_pos.astype(dtype)
+        arrays['to'] = to_pos.astype(dtype)
+        _encode_columns(self.data, 'pat_', arrays)
+
+    def _port_positions(self, s):
+        """
+        Find the positions in the interface of the ports in part of the index.
+
+        Parameters
+        ----------
+        s : slice
+            Slice of the pattern index levels containing the port identifiers,
+            i.e., `from_slice` or `to_slice`.
+
+        Returns
+        -------
+        pos : numpy.ndarray
+            Positions of the ports in the interface index.
+        """
+
+        if isinstance(self.interface.index, pd.MultiIndex):
+            ports = pd.MultiIndex(levels=self.index.levels[s],
+                                  labels=self.index.labels[s],
+                                  verify_integrity=False)
+        else:
+            ports = self.index.get_level_values(s.start)
+        pos = self.interface.index.get_indexer(ports)
+        if (pos < 0).any():
+            raise ValueError('pattern contains identifiers not in interface')
+        return pos
+
+    def _validate_positions(self, from_pos, to_pos):
+        """
+        Raise an exception if the specified connections form an invalid pattern.
+
+        Parameters
+        ----------
+        from_pos, to_pos : numpy.ndarray
+            Positions in the interface index of the source and destination
+            ports of each connection.
+
+        See Also
+        --------
+        Pattern.__validate_index__
+        """
+
+        n = len(self.interface)
+        if pd.Index(np.asarray(from_pos, np.int64)*n+to_pos).duplicated().any():
+            raise ValueError('Duplicate pattern entries detected.')
+        if pd.Index(to_pos).duplicated().any():
+            raise ValueError('Fan-in pattern entries detected.')
+        if np.intersect1d(from_pos, to_pos).size:
+            raise ValueError('Ports cannot both receive input and send output.')
+
+    def _index_from_positions(self, from_pos, to_pos):
+        """
+        Create a pattern index from the interface positions of connected ports.
+
+        Parameters
+        ----------
+        from_pos, to_pos : numpy.ndarray
+            Positions in the interface index of the source and destination
+            ports of each connection.
+
+        Returns
+        -------
+        idx : pandas.MultiIndex
+            Pattern index whose levels are shared with the interface index.
+        """
+
+        # The identifiers of the connected ports are recovered by indexing the
+        # per-level codes of the interface's ports with the port positions:
+        levels, codes = _index_codes(self.interface.index)
+        num_levels = self.interface.num_levels
+        names = ['from_%i' % i for i in xrange(num_levels)]+\
+                ['to_%i' % i for i in xrange(num_levels)]
+        return pd.MultiIndex(levels=levels+levels,
+                             labels=[c[from_pos] for c in codes]+\
+                                    [c[to_pos] for c in codes],
+                             names=names, verify_integrity=False)
+
     @classmethod
     def split_multiindex(cls, idx, a, b):
         """
@@ -1960,35 +2696,39 @@ class Pattern(object):
 
         g = nx.DiGraph()
 
-        # Add all of the ports as nodes:
-        for t in self.interface.data.index:    
-            if not isinstance(self.interface.data.index,
-                              pd.MultiIndex):
-                t = (t,)
-            id = self.sel.tokens_to_str(t)
-
-            # Replace NaNs with empty strings:
-            d = {k: (v if str(v) != 'nan' else '') \
-                 for k, v in self.interface.data.ix[t].to_dict().iteritems()}
-
-            # Each node's name corresponds to the port identifier string:
-            g.add_node(id, d)
-
-        # Add all of the connections as edges:
-        for t in self.data.index:
-            t_from = t[self.from_slice]
-            t_to = t[self.to_slice]
-            id_from = self.sel.tokens_to_str(t_from)
-            id_to = self.sel.tokens_to_str(t_to)
-            d = self.data.ix[t].to_dict()
-
-            # Discard the 'conn' attribute because the existence of the edge
-            # indicates that the connection exists:
-            if d.has_key('conn'):
-                d.pop('conn')
-
-            g.add_edge(id_from, id_to, d)
-
+        # Each node's name corresponds to the port identifier string:
+        idx = self.interface.data.index
+        if isinstance(idx, pd.MultiIndex):
+            ids = [self.sel.tokens_to_str(t) for t in idx]
+        else:
+            ids = [self.sel.tokens_to_str((t,)) for t in idx]
+
+        # Add all of the ports as nodes with their attributes; NaNs are
+        # replaced with empty strings:
+        columns = list(self.interface.data.columns)
+        values = []
+        for k in columns:
+            v = np.asarray(self.interface.data[k], dtype=object)
+            v[pd.isnull(v)] = ''
+            values.append(v)
+        g.add_nodes_from((n, dict(zip(columns, d))) \
+                         for n, d in itertools.izip(ids, zip(*values)))
+
+        # Add all of the connections as edges, discarding the 'conn'
+        # attribute because the existence of the edge indicates that the
+        # connection exists:
+        ids = np.array(ids, dtype=object)
+        from_pos, to_pos = self._conn_positions()
+        ids_from = ids[from_pos]
+        ids_to = ids[to_pos]
+        columns = [k for k in self.data.columns if k != 'conn']
+        values = [np.asarray(self.data[k], dtype=object) for k in columns]
+        if values:
+            g.add_edges_from((f, t, dict(zip(columns, d))) \
+                             for f, t, d in itertools.izip(ids_from, ids_to,
+                                                           zip(*values)))
+        else:
+            g.add_edges_from(itertools.izip(ids_from, ids_to))
         return g
 
 def are_compatible(sel_in_0, sel_out_0, sel_spike_0, sel_gpot_0, 
@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+
+"""
+Placement of modules on the ranks of a multi-node MPI job.
+
+The manager assigns MPI ranks to modules in the order in which they are added;
+when the spawned processes are distributed across several nodes, modules that
+exchange a lot of data may therefore end up on different nodes. The tools in
+this module weight the connections in a routing table by the number of bytes
+they transmit during each execution step and partition the modules among nodes
+so as to minimize the number of bytes that must cross node boundaries.
+"""
+
+import itertools
+
+import numpy as np
+
+def link_bytes(routing_table, gpot_dtype=np.double, spike_dtype=np.int_):
+    """
+    Number of bytes transmitted along each connection during each step.
+
+    Parameters
+    ----------
+    routing_table : routing_table.RoutingTable
+        Routing table whose connections contain the patterns and interface
+        identifiers stored by `core.Manager.connect()`.
+    gpot_dtype, spike_dtype : numpy.dtype
+        Data types of the graded potential and spiking port data.
+
+    Returns
+    -------
+    weights : dict of int
+        Number of bytes transmitted from the first to the second module in
+        each step keyed by (source id, destination id) tuples.
+    """
+
+    itemsize = {'gpot': np.dtype(gpot_dtype).itemsize,
+                'spike': np.dtype(spike_dtype).itemsize}
+    weights = {}
+    for id_0, id_1 in routing_table.connections:
+        data = routing_table[id_0, id_1]
+        pat = data['pattern']
+        int_0 = data['int_0']
+        int_1 = data['int_1']
+
+        # Each source port's data is transmitted once regardless of how many
+        # destination ports it is connected to:
+        nbytes = 0
+        for t in ['gpot', 'spike']:
+            src_idx = pat.src_idx(int_0, int_1, t, t)
+            nbytes += len(set(src_idx))*itemsize[t]
+        weights[(id_0, id_1)] = nbytes
+    return weights
+
+def _adjacency(ids, weights):
+    """
+    Undirected adjacency structure of weighted directed connections.
+    """
+
+    adj = {i: {} for i in ids}
+    for (id_0, id_1), w in weights.iteritems():
+        if id_0 == id_1 or not w:
+            continue
+        adj[id_0][id_1] = adj[id_0].get(id_1, 0)+w
+        adj[id_1][id_0] = adj[id_1].get(id_0, 0)+w
+    return adj
+
+def _coarsen(adj, size, part_size):
+    """
+    Collapse pairs of vertices connected by heavy edges.
+
+    Parameters
+    ----------
+    adj : dict of dict
+        Undirected weighted adjacency structure.
+    size : dict of int
+        Number of modules comprised by each vertex.
+    part_size : int
+        Maximum number of modules that a collapsed vertex may comprise.
+
+    Returns
+    -------
+    match : dict
+        Vertex in the coarsened graph keyed by vertex in the input graph.
+    """
+
+    match = {}
+
+    # Visit the vertices with the fewest connections first so that they are
+    # less likely to be left unmatched:
+    for u in sorted(adj, key=lambda u: (len(adj[u]), u)):
+        if u in match:
+            continue
+        candidates = [v for v in adj[u] if v not in match and \
+                      size[u]+size[v] <= part_size]
+        if candidates:
+            v = max(candidates, key=lambda v: (adj[u][v], -size[v], v))
+            match[u] = match[v] = (u, v)
+        else:
+            match[u] = (u,)
+    return match
+
+def partition(ids, weights, n_parts, part_size, max_passes=20):
+    """
+    Partition modules so as to minimize the weight of cut connections.
+
+    Parameters
+    ----------
+    ids : sequence
+        Module identifiers.
+    weights : dict
+        Weights of connections keyed by (source id, destination id) tuples.
+        Connections in either direction between two modules are combined.
+    n_parts : int
+        Number of parts.
+    part_size : int
+        Maximum number of modules in each part.
+    max_passes : int
+        Maximum number of refinement passes.
+
+    Returns
+    -------
+    parts : list of list
+        Module identifiers in each part.
+
+    Notes
+    -----
+    The modules are partitioned with a simple multilevel scheme: the graph of
+    connections is repeatedly coarsened by collapsing heavy edges, the
+    coarsest graph is partitioned by greedily assigning each of its vertices
+    to the part to which it is most strongly connected, and the resulting
+    partition is refined by Kernighan-Lin-style moves and swaps of individual
+    modules while the weight of the cut connections decreases.
+    """
+
+    ids = list(ids)
+    if len(ids) > n_parts*part_size:
+        raise ValueError('%i modules do not fit in %i parts of size %i' % \
+                         (len(ids), n_parts, part_size))
+    adj = _adjacency(ids, weights)
+
+    # Coarsen the graph until it has no more vertices than there are parts or
+    # no more heavy edges can be collapsed; the modules comprised by each
+    # coarse vertex are tracked so that it can be expanded later:
+    members = {u: [u] for u in ids}
+    g = adj
+    while len(g) > n_parts:
+        size = {u: len(members[u]) for u in g}
+        match = _coarsen(g, size, part_size)
+        if len(set(match.values())) == len(g):
+            break
+        coarse = {}
+        coarse_members = {}
+        for u, c in match.iteritems():
+            coarse.setdefault(c, {})
+            coarse_members.setdefault(c, []).extend(members[u])
+            for v, w in g[u].iteritems():
+                if match[v] != c:
+                    coarse[c][match[v]] = coarse[c].get(match[v], 0)+w
+        g = coarse
+        members = coarse_members
+
+    # Assign coarse vertices to parts in decreasing order of size and
+    # connectivity; vertices that do not fit in any part are split into their
+    # constituent modules:
+    part_of = {}
+    load = [0]*n_parts
+    def conn(u, p):
+        return sum(w for v, w in adj[u].iteritems() if part_of.get(v) == p)
+    def assign(us):
+        free = [p for p in xrange(n_parts) if load[p]+len(us) <= part_size]
+        if not free:
+            return False
+        p = max(free, key=lambda p: (sum(conn(u, p) for u in us),
+                                     -load[p], -p))
+        for u in us:
+            part_of[u] = p
+        load[p] += len(us)
+        return True
+    order = sorted(g, key=lambda c: (-len(members[c]),
+                                     -sum(g[c].itervalues()), str(c)))
+    for c in order:
+        if not assign(members[c]):
+            for u in members[c]:
+                assign([u])
+
+    # Refine the partition by moving modules to parts with spare capacity or
+    # swapping modules in different parts whenever doing so reduces the weight
+    # of the cut connections:
+    for i in xrange(max_passes):
+        improved = False
+        for u in ids:
+            for p in xrange(n_parts):
+                p_u = part_of[u]
+                if p != p_u and load[p] < part_size and \
+                   conn(u, p) > conn(u, p_u):
+                    load[p_u] -= 1
+                    load[p] += 1
+                    part_of[u] = p
+                    improved = True
+        for u, v in itertools.combinations(ids, 2):
+            p_u = part_of[u]
+            p_v = part_of[v]
+            if p_u == p_v:
+                continue
+            gain = conn(u, p_v)-conn(u, p_u)+conn(v, p_u)-conn(v, p_v)- \
+                   2*adj[u].get(v, 0)
+            if gain > 0:
+                part_of[u], part_of[v] = p_v, p_u
+                improved = True
+        if not improved:
+            break
+
+    return [[u for u in ids if part_of[u] == p] for p in xrange(n_parts)]
+
+class Placement(object):
+    """
+    Assignment of modules to the nodes of a multi-node MPI job.
+
+    Parameters
+    ----------
+    parts : list of list
+        Module identifiers placed on each node.
+    weights : dict
+        Number of bytes transmitted during each step keyed by (source id,
+        destination id) tuples.
+    slots_per_node : int
+        Number of MPI processes that may be started on each node.
+
+    Attributes
+    ----------
+    parts : list of list
+        Module identifiers placed on each node.
+    weights : dict
+        Number of bytes transmitted during each step keyed by (source id,
+        destination id) tuples.
+    slots_per_node : int
+        Number of MPI processes that may be started on each node.
+
+    Methods
+    -------
+    compute(routing_table, n_nodes, slots_per_node, ids=None, ...)
+        Place modules so as to minimize inter-node traffic.
+    in_order(ids, weights, n_nodes, slots_per_node)
+        Place modules on nodes in the specified order.
+    node_pair_bytes()
+        Number of bytes transmitted between each pair of nodes.
+    report()
+        Summary of inter-node traffic.
+    write_hostfile(file_name, hosts)
+        Write an MPI hostfile for the placement.
+    """
+
+    def __init__(self, parts, weights, slots_per_node):
+        for part in parts:
+            if len(part) > slots_per_node:
+                raise ValueError('too many modules on node')
+        self.parts = [list(part) for part in parts]
+        self.weights = weights
+        self.slots_per_node = slots_per_node
+
+    @classmethod
+    def compute(cls, routing_table, n_nodes, slots_per_node, ids=None,
+                gpot_dtype=np.double, spike_dtype=np.int_):
+        """
+        Place modules so as to minimize inter-node traffic.
+
+        Parameters
+        ----------
+        routing_table : routing_table.RoutingTable
+            Routing table containing connection patterns.
+        n_nodes : int
+            Number of nodes.
+        slots_per_node : int
+            Number of MPI processes that may be started on each node.
+        ids : sequence
+            Identifiers of modules to place. If None, all modules in the
+            routing table are placed.
+        gpot_dtype, spike_dtype : numpy.dtype
+            Data types of the graded potential and spiking port data.
+
+        Returns
+        -------
+        result : Placement
+            Computed placement.
+        """
+
+        if ids is None:
+            ids = sorted(routing_table.ids)
+        weights = link_bytes(routing_table, gpot_dtype, spike_dtype)
+        parts = partition(ids, weights, n_nodes, slots_per_node)
+        return cls(parts, weights, slots_per_node)
+
+    @classmethod
+    def in_order(cls, ids, weights, n_nodes, slots_per_node):
+        """
+        Place modules on nodes in the specified order.
+
+        This corresponds to the placement obtained when consecutive MPI ranks
+        are assigned to the modules in the order in which they were added to
+        the manager.
+        """
+
+        ids = list(ids)
+        if len(ids) > n_nodes*slots_per_node:
+            raise ValueError('%i modules do not fit on %i nodes' % \
+                             (len(ids), n_nodes))
+        parts = [ids[i*slots_per_node:(i+1)*slots_per_node] \
+                 for i in xrange(n_nodes)]
+        return cls(parts, weights, slots_per_node)
+
+    @property
+    def rank_order(self):
+        """
+        Module identifiers in order of the MPI ranks to assign to them.
+
+        The modules placed on each node are assigned consecutive ranks.
+        """
+
+        return [id for part in self.parts for id in part]
+
+    @property
+    def node_of(self):
+        """
+        Node index keyed by module identifier.
+        """
+
+        return {id: n for n, part in enumerate(self.parts) for id in part}
+
+    def node_pair_bytes(self):
+        """
+        Number of bytes transmitted between each pair of nodes in each step.
+
+        Returns
+        -------
+        result : dict of int
+            Bytes keyed by (source node, destination node) tuples; traffic
+            between modules on the same node is not included.
+        """
+
+        node_of = self.node_of
+        result = {}
+        for (id_0, id_1), w in self.weights.iteritems():
+            n_0 = node_of.get(id_0)
+            n_1 = node_of.get(id_1)
+            if n_0 is None or n_1 is None or n_0 == n_1:
+                continue
+            result[(n_0, n_1)] = result.get((n_0, n_1), 0)+w
+        return result
+
+    @property
+    def inter_node_bytes(self):
+        """
+        Total number of bytes transmitted between nodes in each step.
+        """
+
+        return sum(self.node_pair_bytes().itervalues())
+
+    @property
+    def intra_node_bytes(self):
+        """
+        Total number of bytes transmitted within nodes in each step.
+        """
+
+        node_of = self.node_of
+        return sum(w for (id_0, id_1), w in self.weights.iteritems() \
+                   if id_0 in node_of and node_of[id_0] == node_of.get(id_1))
+
+    def report(self, baseline=None):
+        """
+        Summary of inter-node traffic.
+
+        Parameters
+        ----------
+        baseline : Placement
+            Placement with which to compare this placement, e.g., the
+            placement obtained with `in_order()`.
+
+        Returns
+        -------
+        result : str
+            Human-readable report.
+        """
+
+        lines = []
+        for n, part in enumerate(self.parts):
+            lines.append('node %i: %s' % (n, ', '.join(map(str, part))))
+        for (n_0, n_1), w in sorted(self.node_pair_bytes().iteritems()):
+            lines.append('node %i -> node %i: %i bytes/step' % (n_0, n_1, w))
+        lines.append('inter-node: %i bytes/step' % self.inter_node_bytes)
+        lines.append('intra-node: %i bytes/step' % self.intra_node_bytes)
+        if baseline is not None:
+            b = baseline.inter_node_bytes
+            lines.append('baseline inter-node: %i bytes/step' % b)
+            if b:
+                lines.append('reduction: %.1f%%' % \
+                             (100.0*(b-self.inter_node_bytes)/b))
+        return '\n'.join(lines)
+
+    def write_hostfile(self, file_name, hosts):
+        """
+        Write an MPI hostfile for the placement.
+
+        Parameters
+        ----------
+        file_name : str
+            Output file name.
+        hosts : sequence of str
+            Host names of the nodes; the modules in `parts[i]` are started on
+            `hosts[i]`.
+
+        Notes
+        -----
+        Each host is listed with as many slots as modules placed on it; when
+        ranks are mapped to hosts by slot (the default for Open MPI and
+        MPICH), the ranks in `rank_order` are therefore started on the
+        intended nodes.
+        """
+
+        if len(hosts) < len(self.parts):
+            raise ValueError('insufficient number of hosts')
+        with open(file_name, 'w') as f:
+            for host, part in zip(hosts, self.parts):
+                if part:
+                    f.write('%s slots=%i\n' % (host, len(part)))
+
+    def __repr__(self):
+        return 'Placement(%s)' % self.parts
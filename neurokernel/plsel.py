@@ -581,6 +581,12 @@ class SelectorMethods(SelectorParser):
     therefore contain no ambiguous symbols such as '*' or '[:]').
     """
 
+    # Regex matching a single level of a port identifier string:
+    _identifier_level_re = re.compile(r'/([^*/\[\]\(\):,\.\d][^+*/\[\]\(\):,\.]*)|'
+                                      r'/?(\d+)|'
+                                      r'/?\[(\d+)\]|'
+                                      r'/?\[([^*/\[\]\(\):,\.\d][^+*/\[\]\(\):,\.]*)\]')
+
     @classmethod
     def is_identifier(cls, s):
         """
@@ -679,6 +685,54 @@ class SelectorMethods(SelectorParser):
                 raise ValueError('Cannot convert to single port identifier.')
         return result
 
+    @classmethod
+    def identifier_to_tokens(cls, s):
+        """
+        Convert a single port identifier string into a tuple of tokens.
+
+        Parameters
+        ----------
+        s : str or unicode
+            Port identifier string (e.g., '/foo[0]').
+
+        Returns
+        -------
+        tokens : tuple
+            Tokens of the identifier (e.g., ('foo', 0)).
+
+        Notes
+        -----
+        Identifiers comprising only string and integer levels are tokenized
+        with a regular expression rather than the selector parser; other
+        strings are expanded with the parser and must expand into a single
+        identifier.
+        """
+
+        tokens = []
+        pos = 0
+        n = len(s)
+        while pos < n:
+            m = cls._identifier_level_re.match(s, pos)
+            if m is None:
+                break
+            str_token, int_token, int_set_token, str_set_token = m.groups()
+            if str_token is not None:
+                tokens.append(str_token)
+            elif int_token is not None:
+                tokens.append(int(int_token))
+            elif int_set_token is not None:
+                tokens.append(int(int_set_token))
+            else:
+                tokens.append(str_set_token)
+            pos = m.end()
+        if pos == n and tokens:
+            return tuple(tokens)
+
+        s_exp = cls.expand(s)
+        if len(s_exp) != 1:
+            raise ValueError('%s is not a single port identifier' % s)
+        return tuple(s_exp[0])
+
     @classmethod
     def is_ambiguous(cls, selector):
         """
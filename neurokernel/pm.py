@@ -8,6 +8,7 @@ import numpy as np
 import pandas as pd
 
 from plsel import SelectorMethods
+from tools.memory import pandas_memory_usage
 
 class BasePortMapper(object):
     """
@@ -69,6 +70,22 @@ class BasePortMapper(object):
         c.portmap = self.portmap.copy()
         return c
 
+    def memory_usage(self):
+        """
+        Memory used by the port mapper.
+
+        Returns
+        -------
+        usage : collections.OrderedDict
+            Number of bytes used by the levels and codes of the port index
+            (see `neurokernel.tools.memory.pandas_memory_usage()`) and by the
+            integer indices of the ports ('portmap').
+        """
+
+        usage = pandas_memory_usage(self.portmap)
+        usage['portmap'] = usage.pop('data')
+        return usage
+
     @classmethod
     def from_index(cls, idx, portmap=None):
         """
@@ -362,6 +379,21 @@ class PortMapper(BasePortMapper):
         else:
             raise ValueError('incompatible or invalid data array specified')
 
+    def memory_usage(self):
+        """
+        Memory used by the port mapper.
+
+        Returns
+        -------
+        usage : collections.OrderedDict
+            Number of bytes used by the port index and port map (see
+            `BasePortMapper.memory_usage()`) and by the data array ('data').
+        """
+
+        usage = super(PortMapper, self).memory_usage()
+        usage['data'] = self._data.nbytes if self._data is not None else 0
+        return usage
+
     def copy(self):
         """
         Return copy of this port mapper.
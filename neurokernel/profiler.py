@@ -0,0 +1,746 @@
+#!/usr/bin/env python
+
+"""
+Per-phase timing of module execution steps.
+
+Each execution step of a module is divided into the following phases:
+
+compute
+    Execution of the module's `run_step()` method.
+gather
+    Copying of output port data into the contiguous transmission buffers.
+post
+    Initiation of the transfers by the transport (e.g., posting of
+    nonblocking sends and receives).
+wait
+    Waiting for the transfers to complete.
+scatter
+    Copying of the received data into the module's input ports.
+
+Transports that cannot distinguish between posting and waiting for transfers
+attribute the entire exchange to the wait phase.
+
+The phase timestamps and the control messages received by each module may
+also be combined into a timeline in the Chrome trace event format, which can
+be viewed with trace viewers such as chrome://tracing or Perfetto.
+
+The traffic received by the modules along their connections may be assembled
+into a communication matrix with `comm_matrix()`, and the compute phase
+durations of all modules in each step may be compared with `LoadBalance` to
+find modules that delay the others.
+
+Finally, `StackSampler` periodically records the Python call stack of a
+process; the samples are written in the collapsed stack format used by flame
+graph tools and may be merged and rendered with `flame_graph()`.
+"""
+
+import collections
+import json
+import os
+import signal
+import sys
+import thread
+import time
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+try:
+    from time import monotonic as clock
+except ImportError:
+    from timeit import default_timer as clock
+
+PHASES = ('compute', 'gather', 'post', 'wait', 'scatter')
+
+# Columns of the timestamp buffer marking the end of each phase; column 0
+# contains the start of the step:
+COMPUTE, GATHER, POST, WAIT, SCATTER = range(1, len(PHASES)+1)
+
+class StepProfiler(object):
+    """
+    Ring buffer of the phase durations of the most recent execution steps.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of steps for which timing data is retained; the data of older
+        steps is overwritten.
+
+    Attributes
+    ----------
+    steps : int
+        Number of steps recorded since the profiler was created.
+
+    Notes
+    -----
+    The buffer is allocated when the profiler is created; recording a step
+    only stores one timestamp per phase.
+    """
+
+    def __init__(self, capacity=10000):
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self.steps = 0
+        self._times = np.zeros((capacity, len(PHASES)+1), np.double)
+        self._row = self._times[0]
+
+    def begin(self):
+        """
+        Mark the start of a step.
+        """
+
+        self._row = self._times[self.steps % self.capacity]
+        self._row[0] = clock()
+
+    def mark(self, phase):
+        """
+        Mark the end of a phase of the current step.
+
+        Parameters
+        ----------
+        phase : int
+            Column of the phase, i.e., one of `COMPUTE`, `GATHER`, `POST`,
+            `WAIT`, or `SCATTER`.
+        """
+
+        self._row[phase] = clock()
+
+    def end(self):
+        """
+        Mark the end of the scatter phase and of the current step.
+        """
+
+        self._row[SCATTER] = clock()
+        self.steps += 1
+
+    def elapsed(self, phase):
+        """
+        Duration of a phase of the current step in seconds.
+        """
+
+        return self._row[phase]-self._row[phase-1]
+
+    def timestamps(self):
+        """
+        Phase timestamps of the retained steps.
+
+        Returns
+        -------
+        t : numpy.ndarray
+            Array of shape `(n, len(PHASES)+1)` containing the start time of
+            each of the `n` most recent steps followed by the end times of its
+            phases in the order in which the steps were executed.
+        """
+
+        if self.steps > self.capacity:
+            i = self.steps % self.capacity
+            return np.concatenate([self._times[i:], self._times[:i]])
+        else:
+            return self._times[:self.steps].copy()
+
+    def durations(self):
+        """
+        Phase durations of the retained steps.
+
+        Returns
+        -------
+        d : numpy.ndarray
+            Array of shape `(n, len(PHASES))` containing the duration in
+            seconds of each phase of the `n` most recent steps in the order in
+            which they were executed.
+        """
+
+        return np.diff(self.timestamps(), axis=1)
+
+class Tracer(object):
+    """
+    Ring buffer of timestamped events other than execution steps.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of events retained; older events are overwritten.
+
+    Attributes
+    ----------
+    count : int
+        Number of events recorded since the tracer was created.
+    origin : tuple
+        Wall clock time and the corresponding time of the clock used to
+        record events; used to align the events of different processes.
+    """
+
+    def __init__(self, capacity=10000):
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self.count = 0
+        self._names = []
+        self._codes = {}
+        self._events = np.zeros(capacity, [('name', np.int32),
+                                           ('time', np.double)])
+        self.align(time.time())
+
+    def align(self, wall_time):
+        """
+        Associate the current time of the event clock with a wall clock time.
+        """
+
+        self.origin = (wall_time, clock())
+
+    def event(self, name):
+        """
+        Record an event that occurred now.
+        """
+
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self._names)
+            self._names.append(name)
+        e = self._events[self.count % self.capacity]
+        e['name'] = code
+        e['time'] = clock()
+        self.count += 1
+
+    def events(self):
+        """
+        Retained events.
+
+        Returns
+        -------
+        events : list of tuple
+            Names and times of the retained events in the order in which they
+            were recorded.
+        """
+
+        if self.count > self.capacity:
+            i = self.count % self.capacity
+            e = np.concatenate([self._events[i:], self._events[:i]])
+        else:
+            e = self._events[:self.count]
+        return [(self._names[code], t) for code, t in e]
+
+class LoadBalance(object):
+    """
+    Load imbalance statistics of the execution steps of an emulation.
+
+    Since all modules exchange data after each step, the module with the
+    longest compute phase in a step (the straggler) keeps all other modules
+    idle for the difference between its compute time and theirs.
+
+    Parameters
+    ----------
+    warn_steps : int
+        Number of consecutive steps in which a module must be the straggler
+        to be considered a persistent straggler.
+
+    Attributes
+    ----------
+    steps : int
+        Number of steps whose compute times were compared.
+    average_imbalance, max_imbalance : float
+        Mean and maximum over all steps of the ratio of the longest to the
+        mean compute time of the modules in a step.
+    straggler_steps : collections.Counter
+        Number of steps in which each module was the straggler.
+    idle_caused : collections.Counter
+        Total time in seconds during which each module kept the other
+        modules idle while it was the straggler.
+    """
+
+    def __init__(self, warn_steps=100):
+        self.warn_steps = warn_steps
+        self.steps = 0
+        self.average_imbalance = 0.0
+        self.max_imbalance = 0.0
+        self.straggler_steps = collections.Counter()
+        self.idle_caused = collections.Counter()
+        self._straggler = None
+        self._run = 0
+
+    def update(self, compute_times):
+        """
+        Add the compute times of the modules in a step.
+
+        Parameters
+        ----------
+        compute_times : dict of float
+            Compute phase duration of each module in seconds keyed by module
+            identifier.
+
+        Returns
+        -------
+        straggler : object
+            Identifier of the straggler if it has just been the straggler for
+            `warn_steps` consecutive steps, None otherwise.
+        """
+
+        ids = compute_times.keys()
+        c = np.array([compute_times[id] for id in ids], np.double)
+        if not len(c) or np.isnan(c).any() or c.mean() <= 0:
+            return None
+        i = c.argmax()
+        imbalance = c[i]/c.mean()
+        self.average_imbalance = (self.average_imbalance*self.steps+\
+                                  imbalance)/(self.steps+1)
+        self.max_imbalance = max(self.max_imbalance, imbalance)
+        self.steps += 1
+
+        straggler = ids[i]
+        self.straggler_steps[straggler] += 1
+        self.idle_caused[straggler] += (c[i]-c).sum()
+        if straggler == self._straggler:
+            self._run += 1
+        else:
+            self._straggler = straggler
+            self._run = 1
+        return straggler if self._run == self.warn_steps else None
+
+    def report(self):
+        """
+        Rank the modules by the idle time they caused.
+
+        Returns
+        -------
+        report : pandas.DataFrame
+            Number and fraction of the steps in which each module that was a
+            straggler in at least one step was the straggler and the total
+            idle time in seconds it caused, indexed by module identifier in
+            order of decreasing idle time.
+        """
+
+        ids = sorted(self.straggler_steps.keys(),
+                     key=lambda id: self.idle_caused[id], reverse=True)
+        return pd.DataFrame([[self.straggler_steps[id],
+                              self.straggler_steps[id]/float(self.steps),
+                              self.idle_caused[id]] for id in ids],
+                            index=pd.Index(ids, name='module'),
+                            columns=['straggler_steps', 'straggler_fraction',
+                                     'idle_caused'])
+
+def _frame_name(code):
+    return '%s (%s:%i)' % (code.co_name, os.path.basename(code.co_filename),
+                           code.co_firstlineno)
+
+class StackSampler(object):
+    """
+    Statistical profiler that periodically records the Python call stack.
+
+    Parameters
+    ----------
+    interval : float
+        Sampling interval in seconds.
+    timer : {'prof', 'real'}
+        Timer that triggers the samples. The 'prof' timer measures the CPU
+        time consumed by the process and uses SIGPROF; the 'real' timer
+        measures wall clock time and uses SIGALRM, so that time spent blocked
+        (e.g., waiting for data) is sampled as well.
+    all_threads : bool
+        If True, record the stacks of all threads in each sample; otherwise,
+        only record the stack of the main thread.
+
+    Attributes
+    ----------
+    counts : collections.Counter
+        Number of samples of each stack, keyed by tuples of code objects
+        ordered from the outermost to the innermost frame.
+    samples : int
+        Number of samples taken.
+    running : bool
+        True while sampling.
+
+    Notes
+    -----
+    The sampler must be started and stopped in the main thread because only
+    the main thread receives signals. System calls interrupted by the samples
+    are restarted.
+    """
+
+    _timers = {'prof': (signal.ITIMER_PROF, signal.SIGPROF),
+               'real': (signal.ITIMER_REAL, signal.SIGALRM)}
+
+    def __init__(self, interval=0.005, timer='prof', all_threads=False):
+        if timer not in self._timers:
+            raise ValueError('unrecognized timer %s' % timer)
+        self.interval = interval
+        self.timer = timer
+        self.all_threads = all_threads
+        self.counts = collections.Counter()
+        self.samples = 0
+        self.running = False
+        self._prev_handler = None
+
+    def start(self):
+        """
+        Start sampling.
+        """
+
+        if self.running:
+            return
+        which, signum = self._timers[self.timer]
+        self._prev_handler = signal.signal(signum, self._sample)
+        signal.siginterrupt(signum, False)
+        signal.setitimer(which, self.interval, self.interval)
+        self.running = True
+
+    def stop(self):
+        """
+        Stop sampling.
+        """
+
+        if not self.running:
+            return
+        which, signum = self._timers[self.timer]
+        signal.setitimer(which, 0)
+        signal.signal(signum, self._prev_handler)
+        self.running = False
+
+    def _sample(self, signum, frame):
+        if self.all_threads:
+
+            # The frame interrupted in the main thread is passed to the
+            # handler; sys._current_frames() would return the handler's own:
+            frames = sys._current_frames()
+            frames[thread.get_ident()] = frame
+            frames = frames.values()
+        else:
+            frames = [frame]
+        for f in frames:
+            stack = []
+            while f is not None:
+                stack.append(f.f_code)
+                f = f.f_back
+            self.counts[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        """
+        Sampled stacks in collapsed format.
+
+        Returns
+        -------
+        stacks : collections.Counter
+            Number of samples keyed by stack; each stack is a string of
+            semicolon-separated frame names of the form
+            'function (file:line)' ordered from the outermost frame.
+        """
+
+        stacks = collections.Counter()
+        for stack, n in self.counts.iteritems():
+            stacks[';'.join(map(_frame_name, stack))] += n
+        return stacks
+
+    def write(self, file_name):
+        """
+        Write the sampled stacks to a file in collapsed format.
+        """
+
+        write_collapsed(file_name, self.collapsed())
+
+def read_collapsed(file_name):
+    """
+    Read stacks in collapsed format.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of a file containing one line per stack consisting of the
+        semicolon-separated frame names followed by a space and the number of
+        samples.
+
+    Returns
+    -------
+    stacks : collections.Counter
+        Number of samples keyed by stack.
+    """
+
+    stacks = collections.Counter()
+    with open(file_name) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line:
+                stack, n = line.rsplit(' ', 1)
+                stacks[stack] += int(n)
+    return stacks
+
+def write_collapsed(file_name, stacks):
+    """
+    Write stacks in collapsed format.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of output file.
+    stacks : dict of int
+        Number of samples keyed by stack.
+    """
+
+    with open(file_name, 'w') as f:
+        for stack in sorted(stacks):
+            f.write('%s %i\n' % (stack, stacks[stack]))
+
+def merge_collapsed(stacks):
+    """
+    Merge the stacks sampled in several processes.
+
+    Parameters
+    ----------
+    stacks : dict of dict
+        Number of samples keyed by stack for each process, keyed by a label
+        identifying the process (e.g., a module identifier).
+
+    Returns
+    -------
+    merged : collections.Counter
+        Number of samples keyed by stack; each stack is prefixed with a frame
+        named after the label of its process, so that the processes appear
+        side by side in a flame graph.
+    """
+
+    merged = collections.Counter()
+    for label, s in stacks.iteritems():
+        for stack, n in s.iteritems():
+            merged['%s;%s' % (label, stack)] += n
+    return merged
+
+def _color(name):
+    h = hash(name)
+    return 'rgb(%i,%i,%i)' % (205+h % 50, (h >> 8) % 230, (h >> 16) % 55)
+
+def flame_graph(file_name, stacks, title='Flame graph', width=1200,
+                frame_height=16, min_width=0.1):
+    """
+    Render stacks as a flame graph in SVG format.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of output file.
+    stacks : dict of int
+        Number of samples keyed by stack in collapsed format.
+    title : str
+        Title of the graph.
+    width, frame_height : int
+        Width of the graph and height of each frame in pixels.
+    min_width : float
+        Frames narrower than this many pixels are omitted.
+
+    Notes
+    -----
+    Each frame is drawn as a rectangle above its caller whose width is
+    proportional to the number of samples in which it appears; the name,
+    number of samples, and percentage of all samples of each frame are
+    shown when the pointer hovers over it.
+    """
+
+    # Build a tree of frames in which each node contains the number of
+    # samples and the children of a frame:
+    root = [0, {}]
+    for stack, n in stacks.iteritems():
+        root[0] += n
+        node = root
+        for name in stack.split(';'):
+            node = node[1].setdefault(name, [0, {}])
+            node[0] += n
+    total = float(max(root[0], 1))
+    scale = (width-20)/total
+
+    rects = []
+    def draw(name, node, x, depth):
+        w = node[0]*scale
+        if w < min_width:
+            return
+        rects.append((name, node[0], x, depth, w))
+        for child in sorted(node[1]):
+            draw(child, node[1][child], x, depth+1)
+            x += node[1][child][0]*scale
+    draw('all', root, 10, 0)
+
+    max_depth = max([r[3] for r in rects]) if rects else 0
+    height = (max_depth+1)*frame_height+50
+    lines = ['<?xml version="1.0" standalone="no"?>',
+             '<svg version="1.1" width="%i" height="%i" ' \
+             'xmlns="http://www.w3.org/2000/svg">' % (width, height),
+             '<rect x="0" y="0" width="%i" height="%i" fill="#f8f8f8"/>' % \
+             (width, height),
+             '<text x="%i" y="24" font-size="17" font-family="Verdana" ' \
+             'text-anchor="middle">%s</text>' % (width/2, escape(title))]
+    for name, n, x, depth, w in rects:
+        y = height-(depth+1)*frame_height-10
+        label = escape(name)
+        lines.append('<g><title>%s (%i samples, %.2f%%)</title>' % \
+                     (label, n, 100*n/total))
+        lines.append('<rect x="%.1f" y="%i" width="%.1f" height="%i" ' \
+                     'fill="%s" rx="2" ry="2"/>' % \
+                     (x, y, w, frame_height-1, _color(name)))
+
+        # Only label frames wide enough to contain a few characters:
+        chars = int(w/7)
+        if chars >= 3:
+            text = name if len(name) <= chars else name[:chars-2]+'..'
+            lines.append('<text x="%.1f" y="%i" font-size="12" ' \
+                         'font-family="Verdana">%s</text>' % \
+                         (x+3, y+frame_height-4, escape(text)))
+        lines.append('</g>')
+    lines.append('</svg>')
+    with open(file_name, 'w') as f:
+        f.write('\n'.join(lines))
+
+def summarize(durations, percentiles=(50, 90, 99)):
+    """
+    Summarize phase durations.
+
+    Parameters
+    ----------
+    durations : dict of numpy.ndarray
+        Phase durations returned by `StepProfiler.durations()` keyed by module
+        identifier.
+    percentiles : sequence of float
+        Percentiles of the durations to compute.
+
+    Returns
+    -------
+    summary : pandas.DataFrame
+        Mean and percentiles of the duration of each phase in seconds and the
+        fraction of the mean step duration taken by the phase, indexed by
+        module identifier and phase. The statistics of the steps of all
+        modules are indexed by the module identifier 'all'.
+    """
+
+    columns = ['mean']+['p%g' % p for p in percentiles]+['fraction']
+    rows = collections.OrderedDict()
+    def add(id, d):
+        total = d.sum(axis=1).mean() if len(d) else 0.0
+        for i, phase in enumerate(PHASES):
+            x = d[:, i]
+            if len(x):
+                mean = x.mean()
+                values = [mean]+list(np.percentile(x, percentiles))+\
+                         [mean/total if total > 0 else 0.0]
+            else:
+                values = [np.nan]*len(columns)
+            rows[(id, phase)] = values
+    for id in sorted(durations.keys()):
+        add(id, durations[id])
+    if durations:
+        add('all', np.concatenate([durations[id] for id in durations]))
+    index = pd.MultiIndex.from_tuples(rows.keys(), names=['module', 'phase']) \
+            if rows else None
+    return pd.DataFrame(rows.values(), index=index, columns=columns)
+
+def comm_matrix(link_stats, ids, quantity='bytes', port_type=None):
+    """
+    Assemble a module-by-module communication matrix.
+
+    Parameters
+    ----------
+    link_stats : dict of tuple
+        Number of data exchanges, total bytes and messages received from each
+        source module per port type, and mean wait time for each source
+        module (see `core.Module._link_stats()`) keyed by destination module
+        identifier.
+    ids : sequence
+        Identifiers of all modules in the emulation.
+    quantity : {'bytes', 'messages', 'wait'}
+        Quantity in the matrix; the average number of bytes or messages
+        received per exchange or the mean wait time in seconds.
+    port_type : {None, 'gpot', 'spike'}
+        If set, only count the data of the specified port type. Ignored if
+        `quantity` is 'wait'.
+
+    Returns
+    -------
+    matrix : pandas.DataFrame
+        Matrix whose rows and columns are respectively indexed by the source
+        and destination module identifiers in sorted order. Entries for pairs
+        of modules that are not connected are 0 for counts and NaN for wait
+        times.
+    """
+
+    if quantity not in ['bytes', 'messages', 'wait']:
+        raise ValueError('invalid quantity: %s' % quantity)
+    if port_type is None:
+        port_types = ['gpot', 'spike']
+    elif port_type in ['gpot', 'spike']:
+        port_types = [port_type]
+    else:
+        raise ValueError('invalid port type: %s' % port_type)
+    ids = sorted(ids)
+    m = pd.DataFrame(np.nan if quantity == 'wait' else 0.0,
+                     index=pd.Index(ids, name='source'),
+                     columns=pd.Index(ids, name='destination'))
+    for dest_id, (steps, nbytes, nmsgs, wait) in link_stats.iteritems():
+        for src_id in wait:
+            if quantity == 'wait':
+                m.loc[src_id, dest_id] = wait[src_id]
+            elif steps:
+                counts = nbytes if quantity == 'bytes' else nmsgs
+                m.loc[src_id, dest_id] = \
+                    sum([counts[src_id].get(t, 0) for t in port_types])/float(steps)
+    return m
+
+def chrome_trace(traces):
+    """
+    Combine module timelines into events in the Chrome trace event format.
+
+    Parameters
+    ----------
+    traces : dict of tuple
+        Timeline of each module keyed by module identifier. Each timeline
+        consists of the module's `Tracer.origin`, the number of the first
+        step whose timestamps are included, the phase timestamps returned by
+        `StepProfiler.timestamps()`, and the events returned by
+        `Tracer.events()`.
+
+    Returns
+    -------
+    events : list of dict
+        Trace events. Each module is represented as a process whose execution
+        steps contain slices for their phases; times are in microseconds
+        since the earliest wall clock time in the modules' origins.
+    """
+
+    if not traces:
+        return []
+    t0 = min([origin[0] for origin, _, _, _ in traces.itervalues()])
+    events = []
+    for pid, id in enumerate(sorted(traces.keys())):
+        (wall_time, clock_time), first_step, timestamps, ctrl = traces[id]
+        def us(t):
+            return (wall_time+(t-clock_time)-t0)*1e6
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                       'tid': 0, 'args': {'name': str(id)}})
+        for i, t in enumerate(timestamps):
+
+            # Skip steps that were interrupted by an exception:
+            if (np.diff(t) < 0).any():
+                continue
+            events.append({'name': 'step', 'ph': 'X', 'pid': pid, 'tid': 0,
+                           'ts': us(t[0]), 'dur': (t[-1]-t[0])*1e6,
+                           'args': {'step': first_step+i}})
+            for j, phase in enumerate(PHASES):
+                events.append({'name': phase, 'ph': 'X', 'pid': pid,
+                               'tid': 0, 'ts': us(t[j]),
+                               'dur': (t[j+1]-t[j])*1e6})
+        for name, t in ctrl:
+            events.append({'name': name, 'ph': 'i', 's': 'p', 'pid': pid,
+                           'tid': 0, 'ts': us(t)})
+    return events
+
+def write_chrome_trace(file_name, traces):
+    """
+    Write module timelines to a file in the Chrome trace event format.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of output file.
+    traces : dict of tuple
+        Timelines of the modules; see `chrome_trace()`.
+    """
+
+    with open(file_name, 'w') as f:
+        json.dump({'traceEvents': chrome_trace(traces),
+                   'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,449 @@
+#!/usr/bin/env python
+
+"""
+Precomputed port index arrays for transmitting data between modules.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from mixins import LoggerMixin
+from pm import BasePortMapper
+from tools.npz import encode_values, decode_values, load_npz, save_npz
+
+class RoutingPlan(object):
+    """
+    Port index arrays used by a module to exchange data with other modules.
+
+    A routing plan contains all of the information about a module's
+    connections that the module needs to assemble the buffers it transmits
+    to its destination modules and to copy the contents of the buffers it
+    receives from its source modules into its port data arrays. Plans can be
+    computed once by the manager, cached on disk, and shipped to the module
+    so that the latter need not query the connectivity patterns itself.
+
+    Attributes
+    ----------
+    id : str
+        Module identifier.
+    in_ids, out_ids : list
+        Identifiers of source and destination modules.
+    in_ranks, out_ranks : list of int
+        MPI ranks of source and destination modules.
+    out_inds : dict of dict of numpy.ndarray
+        Indices of the entries in the module's port data arrays of each port
+        type ('gpot' or 'spike') that must be gathered into the buffer
+        transmitted to each destination module.
+    in_inds : dict of dict of numpy.ndarray
+        Indices of the entries in the module's port data arrays of each port
+        type into which the data received from each source module must be
+        scattered.
+    in_buf_inds : dict of dict of numpy.ndarray
+        Indices of the entries in the buffer received from each source module
+        that must be copied into the entries `in_inds`; these are needed to
+        support fan-out.
+    in_buf_len : dict of dict of int
+        Lengths of the buffers received from each source module.
+    port_digest : str
+        Digest of the module's ports from which the plan was computed (see
+        `port_digest()`); the index arrays are only valid for a module whose
+        port mappers have the same digest.
+
+    Parameters
+    ----------
+    id : str
+        Module identifier.
+    """
+
+    port_types = ['gpot', 'spike']
+
+    def __init__(self, id):
+        self.id = id
+        self.in_ids = []
+        self.in_ranks = []
+        self.out_ids = []
+        self.out_ranks = []
+        self.out_inds = {t: {} for t in self.port_types}
+        self.in_inds = {t: {} for t in self.port_types}
+        self.in_buf_inds = {t: {} for t in self.port_types}
+        self.in_buf_len = {t: {} for t in self.port_types}
+        self.port_digest = None
+
+    @classmethod
+    def compute(cls, id, routing_table, rank_to_id, pm):
+        """
+        Compute the routing plan of a module.
+
+        Parameters
+        ----------
+        id : str
+            Module identifier.
+        routing_table : routing_table.RoutingTable
+            Table of connections between modules.
+        rank_to_id : bidict.bidict
+            Mapping between MPI ranks and module identifiers.
+        pm : dict of pm.BasePortMapper
+            Mappers between the module's ports and their indices in the
+            module's data arrays, keyed by port type ('gpot' or 'spike').
+
+        Returns
+        -------
+        plan : RoutingPlan
+            Routing plan.
+        """
+
+        plan = cls(id)
+        plan.port_digest = port_digest(pm)
+
+        # Extract identifiers of source ports in the current module's interface
+        # for all modules receiving output from the current module:
+        plan.out_ids = routing_table.dest_ids(id)
+        plan.out_ranks = [rank_to_id.inv[i] for i in plan.out_ids]
+        for out_id in plan.out_ids:
+
+            # Get interfaces of pattern connecting the current module to
+            # destination module `out_id`; `int_0` is connected to the
+            # current module, `int_1` is connected to the other module:
+            pat = routing_table[id, out_id]['pattern']
+            int_0 = routing_table[id, out_id]['int_0']
+            int_1 = routing_table[id, out_id]['int_1']
+            for t in cls.port_types:
+                plan.out_inds[t][out_id] = \
+                    pm[t].ports_to_inds(pat.src_idx(int_0, int_1, t, t))
+
+        # Extract identifiers of destination ports in the current module's
+        # interface for all modules sending input to the current module:
+        plan.in_ids = routing_table.src_ids(id)
+        plan.in_ranks = [rank_to_id.inv[i] for i in plan.in_ids]
+        for in_id in plan.in_ids:
+
+            # Get interfaces of pattern connecting the current module to
+            # source module `in_id`; `int_1` is connected to the current
+            # module, `int_0` is connected to the other module:
+            pat = routing_table[in_id, id]['pattern']
+            int_0 = routing_table[in_id, id]['int_0']
+            int_1 = routing_table[in_id, id]['int_1']
+            for t in cls.port_types:
+                plan.in_inds[t][in_id] = \
+                    pm[t].ports_to_inds(pat.dest_idx(int_0, int_1, t, t))
+
+                # The buffer transmitted by the source module contains the
+                # data of each connected source port once in the order of the
+                # ports in the pattern's interface; map the source port of
+                # every connection (including fan-out) to its buffer entry:
+                src_ports = pat.src_idx(int_0, int_1, t, t, duplicates=True)
+                src_inds = BasePortMapper(pat.interface.filter_ports(int_0,
+                    type=t, tuples=True)).ports_to_inds(src_ports)
+                plan.in_buf_inds[t][in_id] = pd.factorize(src_inds)[0]
+
+                # The size of the input buffer to the current module must be
+                # the same length as the output buffer of module `in_id`:
+                plan.in_buf_len[t][in_id] = \
+                    len(pat.src_idx(int_0, int_1, t, t))
+        return plan
+
+    def save(self, file_name):
+        """
+        Save the routing plan to a binary file.
+
+        Parameters
+        ----------
+        file_name : str
+            Output file name. The extension '.npz' is appended if not present.
+        """
+
+        arrays = {'kind': np.array(u'routing_plan')}
+        arrays['id'], arrays['id_kind'] = encode_values([self.id])
+        arrays['in_ids'], arrays['in_id_kinds'] = encode_values(self.in_ids)
+        arrays['out_ids'], arrays['out_id_kinds'] = encode_values(self.out_ids)
+        arrays['port_digest'] = np.array(unicode(self.port_digest))
+        arrays['in_ranks'] = np.array(self.in_ranks, dtype=np.int64)
+        arrays['out_ranks'] = np.array(self.out_ranks, dtype=np.int64)
+        for t in self.port_types:
+            for j, out_id in enumerate(self.out_ids):
+                arrays['out_inds_%s_%i' % (t, j)] = self.out_inds[t][out_id]
+            for j, in_id in enumerate(self.in_ids):
+                arrays['in_inds_%s_%i' % (t, j)] = self.in_inds[t][in_id]
+                arrays['in_buf_inds_%s_%i' % (t, j)] = \
+                    self.in_buf_inds[t][in_id]
+            arrays['in_buf_len_%s' % t] = \
+                np.array([self.in_buf_len[t][i] for i in self.in_ids],
+                         dtype=np.int64)
+        save_npz(file_name, arrays)
+
+    @classmethod
+    def load(cls, file_name, mmap_mode=None):
+        """
+        Load a routing plan from a file written by `RoutingPlan.save()`.
+
+        Parameters
+        ----------
+        file_name : str
+            Input file name.
+        mmap_mode : {None, 'r', 'r+', 'c'}
+            If not None, memory-map the index arrays in the file with the
+            specified mode rather than reading them into memory.
+
+        Returns
+        -------
+        plan : RoutingPlan
+            Loaded routing plan.
+        """
+
+        arrays = load_npz(file_name, mmap_mode)
+        if unicode(arrays['kind']) != u'routing_plan':
+            raise ValueError('file does not contain a routing plan')
+        plan = cls(decode_values(arrays['id'], arrays['id_kind'])[0])
+        plan.in_ids = decode_values(arrays['in_ids'], arrays['in_id_kinds'])
+        plan.out_ids = decode_values(arrays['out_ids'], arrays['out_id_kinds'])
+        plan.port_digest = str(arrays['port_digest'])
+        plan.in_ranks = [int(r) for r in arrays['in_ranks']]
+        plan.out_ranks = [int(r) for r in arrays['out_ranks']]
+        for t in cls.port_types:
+            for j, out_id in enumerate(plan.out_ids):
+                plan.out_inds[t][out_id] = arrays['out_inds_%s_%i' % (t, j)]
+            for j, in_id in enumerate(plan.in_ids):
+                plan.in_inds[t][in_id] = arrays['in_inds_%s_%i' % (t, j)]
+                plan.in_buf_inds[t][in_id] = \
+                    arrays['in_buf_inds_%s_%i' % (t, j)]
+                plan.in_buf_len[t][in_id] = \
+                    int(arrays['in_buf_len_%s' % t][j])
+        return plan
+
+    def __repr__(self):
+        return 'RoutingPlan(%s): in=%s, out=%s' % (self.id, self.in_ids,
+                                                   self.out_ids)
+
+def port_digest(pm):
+    """
+    Compute a digest of the ports of a module.
+
+    Parameters
+    ----------
+    pm : dict of pm.BasePortMapper
+        Mappers between the module's ports and their indices in the
+        module's data arrays, keyed by port type ('gpot' or 'spike').
+
+    Returns
+    -------
+    digest : str
+        Hexadecimal SHA-1 digest of the ports of each type in the order of
+        their indices.
+    """
+
+    h = hashlib.sha1()
+    for t in RoutingPlan.port_types:
+        h.update(t)
+        h.update(repr(pm[t].index.tolist()))
+    return h.hexdigest()
+
+def pattern_digest(pat):
+    """
+    Compute a digest of the contents of a pattern.
+
+    Parameters
+    ----------
+    pat : pattern.Pattern
+        Pattern instance.
+
+    Returns
+    -------
+    digest : str
+        Hexadecimal SHA-1 digest of the pattern's interface and connections.
+    """
+
+    arrays = {}
+    pat._to_arrays(arrays)
+    h = hashlib.sha1()
+    for k in sorted(arrays.keys()):
+        a = np.ascontiguousarray(arrays[k])
+        h.update(k)
+        h.update(str(a.dtype))
+        h.update(str(a.shape))
+        h.update(a.tostring())
+    return h.hexdigest()
+
+def routing_plan_key(id, routing_table, rank_to_id, pm, digests=None):
+    """
+    Compute the key identifying the routing plan of a module.
+
+    The key is a digest of everything the plan is computed from: the module's
+    ports, the identifiers and ranks of the modules it is connected to, and
+    the patterns and pattern interfaces used to connect them.
+
+    Parameters
+    ----------
+    id : str
+        Module identifier.
+    routing_table : routing_table.RoutingTable
+        Table of connections between modules.
+    rank_to_id : bidict.bidict
+        Mapping between MPI ranks and module identifiers.
+    pm : dict of pm.BasePortMapper
+        Mappers between the module's ports and their indices in the
+        module's data arrays, keyed by port type ('gpot' or 'spike').
+    digests : dict
+        Cache of pattern digests keyed by pattern; updated with the digests
+        of the patterns not already in it.
+
+    Returns
+    -------
+    key : str
+        Hexadecimal SHA-1 digest.
+    """
+
+    if digests is None:
+        digests = {}
+    h = hashlib.sha1()
+    h.update(repr(id))
+    h.update(port_digest(pm))
+    for label, edges in [('out', [(id, i) for i in routing_table.dest_ids(id)]),
+                         ('in', [(i, id) for i in routing_table.src_ids(id)])]:
+        for edge in edges:
+            data = routing_table[edge]
+            pat = data['pattern']
+            if pat not in digests:
+                digests[pat] = pattern_digest(pat)
+            h.update(repr((label, edge, rank_to_id.inv[edge[0]],
+                           rank_to_id.inv[edge[1]], data['int_0'],
+                           data['int_1'], digests[pat])))
+    return h.hexdigest()
+
+class RoutingPlanCache(LoggerMixin):
+    """
+    Content-addressed on-disk cache of routing plans.
+
+    Each plan is stored in a file in the cache directory whose name is the
+    plan's key (see `routing_plan_key`); since the key changes whenever any
+    of the data used to compute the plan changes, stale entries are never
+    returned and need not be invalidated.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache directory; created if it does not exist.
+    """
+
+    def __init__(self, cache_dir):
+        LoggerMixin.__init__(self, 'plan cache')
+        self.cache_dir = cache_dir
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def _file_name(self, key):
+        return os.path.join(self.cache_dir, key+'.npz')
+
+    def __contains__(self, key):
+        return os.path.exists(self._file_name(key))
+
+    def get(self, key, mmap_mode=None):
+        """
+        Retrieve a routing plan.
+
+        Parameters
+        ----------
+        key : str
+            Plan key.
+        mmap_mode : {None, 'r', 'r+', 'c'}
+            Memory-mapping mode to use when loading the plan.
+
+        Returns
+        -------
+        plan : RoutingPlan
+            Cached plan, or None if no plan with the specified key is cached.
+        """
+
+        if key not in self:
+            return None
+        return RoutingPlan.load(self._file_name(key), mmap_mode)
+
+    def put(self, key, plan):
+        """
+        Store a routing plan.
+
+        Parameters
+        ----------
+        key : str
+            Plan key.
+        plan : RoutingPlan
+            Plan to store.
+        """
+
+        # Write to a temporary file first so that concurrent readers never
+        # see a partially written plan:
+        tmp_name = os.path.join(self.cache_dir,
+                                '%s.%i.tmp.npz' % (key, os.getpid()))
+        plan.save(tmp_name)
+        os.rename(tmp_name, self._file_name(key))
+
+    def get_or_compute(self, id, routing_table, rank_to_id, pm, digests=None):
+        """
+        Retrieve a module's routing plan, computing and storing it if necessary.
+
+        Parameters
+        ----------
+        id : str
+            Module identifier.
+        routing_table : routing_table.RoutingTable
+            Table of connections between modules.
+        rank_to_id : bidict.bidict
+            Mapping between MPI ranks and module identifiers.
+        pm : dict of pm.BasePortMapper
+            Mappers between the module's ports and their indices in the
+            module's data arrays, keyed by port type ('gpot' or 'spike').
+        digests : dict
+            Cache of pattern digests (see `routing_plan_key`).
+
+        Returns
+        -------
+        plan : RoutingPlan
+            Routing plan.
+        """
+
+        key = routing_plan_key(id, routing_table, rank_to_id, pm, digests)
+        plan = self.get(key)
+        if plan is None:
+            self.log_info('computing routing plan for %s' % id)
+            plan = RoutingPlan.compute(id, routing_table, rank_to_id, pm)
+            self.put(key, plan)
+        else:
+            self.log_info('loaded cached routing plan for %s' % id)
+        return plan
+
+def compute_routing_plans(routing_table, rank_to_id, sels, cache=None):
+    """
+    Compute the routing plans of several modules.
+
+    Parameters
+    ----------
+    routing_table : routing_table.RoutingTable
+        Table of connections between modules.
+    rank_to_id : bidict.bidict
+        Mapping between MPI ranks and module identifiers.
+    sels : dict
+        Graded potential and spiking port selectors of each module, keyed by
+        module identifier.
+    cache : RoutingPlanCache
+        Cache from which to load and in which to store plans. If None, all
+        plans are computed.
+
+    Returns
+    -------
+    plans : dict
+        Routing plans keyed by module identifier.
+    """
+
+    digests = {}
+    plans = {}
+    for id, (sel_gpot, sel_spike) in sels.iteritems():
+        pm = {'gpot': BasePortMapper(sel_gpot),
+              'spike': BasePortMapper(sel_spike)}
+        if cache is not None:
+            plans[id] = cache.get_or_compute(id, routing_table, rank_to_id,
+                                             pm, digests)
+        else:
+            plans[id] = RoutingPlan.compute(id, routing_table, rank_to_id, pm)
+    return plans
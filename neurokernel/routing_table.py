@@ -4,10 +4,14 @@
 Routing table class.
 """
 
+from collections import OrderedDict
+
 import numpy as np
 import networkx as nx
 import pandas as pd
 
+from tools.memory import nbytes
+
 class RoutingTable(object):
     """
     Routing table class.
@@ -171,6 +175,26 @@ class RoutingTable(object):
         
         return RoutingTable(self.data.subgraph(ids))
 
+    def memory_usage(self):
+        """
+        Memory used by the data associated with each connection.
+
+        Returns
+        -------
+        usage : collections.OrderedDict
+            Number of bytes used by the arrays and patterns (or other objects
+            with a `memory_usage()` method) associated with each connection
+            keyed by (source, destination) identifier tuples. Objects
+            associated with several connections are only counted for the
+            first of them in sorted order.
+        """
+
+        seen = set()
+        usage = OrderedDict()
+        for src, dest in sorted(self.data.edges()):
+            usage[(src, dest)] = nbytes(self.data.edge[src][dest], seen)
+        return usage
+
     def to_df(self):
         """
         Return a pandas DataFrame listing all of the connections.
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""
+Merge call stack samples written by workers into a flame graph.
+
+Run with, e.g.,
+
+python -m neurokernel.tools.flamegraph -o profile.svg profile.*.folded
+python -m neurokernel.tools.flamegraph -p run.1 run.1.*.folded
+python -m neurokernel.tools.flamegraph lpu0=a.folded lpu1=b.folded
+
+Each input file contains the samples of one worker in collapsed stack format
+(see `neurokernel.mpi.WorkerManager.sample()`); the stacks of each worker are
+placed under a frame named after the worker's label, which is either specified
+before the file name as 'label=file' or obtained by removing the prefix passed
+to `sample()` and the extension from the file name.
+"""
+
+import argparse
+import os
+
+from neurokernel.profiler import flame_graph, merge_collapsed, \
+     read_collapsed, write_collapsed
+
+def file_label(file_name, prefix='profile'):
+    """
+    Label of the worker that wrote a sample file.
+
+    The label is obtained by removing the directory, the specified prefix, and
+    the extension '.folded' from the file name; for example, the label of
+    'out/profile.lpu0.folded' is 'lpu0'. Only the directory and the extension
+    are removed if the file name does not start with the prefix.
+    """
+
+    name = os.path.basename(file_name)
+    if name.endswith('.folded'):
+        name = name[:-len('.folded')]
+    prefix = os.path.basename(prefix)+'.'
+    if name.startswith(prefix) and len(name) > len(prefix):
+        name = name[len(prefix):]
+    return name
+
+def parse_file_arg(arg, prefix='profile'):
+    """
+    Split an argument of the form 'label=file' or 'file' into a label and a
+    file name; the label of the latter is obtained with `file_label()`.
+    """
+
+    if '=' in arg:
+        label, file_name = arg.split('=', 1)
+        return label, file_name
+    return file_label(arg, prefix), arg
+
+def merge_files(file_names, separate=True, prefix='profile'):
+    """
+    Read and merge sample files.
+
+    Parameters
+    ----------
+    file_names : list of str
+        Names of sample files, each optionally preceded by a label as in
+        'label=file'.
+    separate : bool
+        If True, prefix the stacks of each file with a frame named after the
+        file's label; otherwise, add the numbers of samples of identical
+        stacks in all files.
+    prefix : str
+        Prefix removed from the names of files without labels to obtain
+        their labels.
+
+    Returns
+    -------
+    stacks : collections.Counter
+        Number of samples keyed by stack.
+    """
+
+    stacks = {}
+    for arg in file_names:
+        label, file_name = parse_file_arg(arg, prefix)
+        if label in stacks:
+            raise ValueError('duplicate label: %s' % label)
+        stacks[label] = read_collapsed(file_name)
+    if separate:
+        return merge_collapsed(stacks)
+    return reduce(lambda a, b: a+b, stacks.values())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='+',
+                        help='Sample files in collapsed stack format, ' \
+                        'optionally specified as label=file')
+    parser.add_argument('-p', '--prefix', default='profile',
+                        help='Prefix of file names removed to obtain the ' \
+                        'labels of workers [default: %(default)s]')
+    parser.add_argument('-o', '--out_file', default='profile.svg',
+                        help='Output SVG file [default: %(default)s]')
+    parser.add_argument('-f', '--folded', default=None,
+                        help='Also write merged stacks in collapsed format ' \
+                        'to this file')
+    parser.add_argument('-c', '--combine', action='store_true',
+                        help='Combine identical stacks of all workers ' \
+                        'instead of showing each worker separately')
+    parser.add_argument('-t', '--title', default='Flame graph',
+                        help='Title [default: %(default)s]')
+    parser.add_argument('-w', '--width', default=1200, type=int,
+                        help='Width in pixels [default: %(default)s]')
+    args = parser.parse_args()
+
+    stacks = merge_files(args.files, not args.combine, args.prefix)
+    if args.folded is not None:
+        write_collapsed(args.folded, stacks)
+    flame_graph(args.out_file, stacks, args.title, args.width)
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,8 @@ import pycuda.elementwise as elementwise
 import pycuda.gpuarray as gpuarray
 from pycuda.tools import dtype_to_ctype
 
+from misc import bufint
+
 # List of available numerical types provided by numpy: 
 # XXX This try/except is an ugly hack to prevent the doc build on
 # ReadTheDocs from failing:
@@ -70,31 +72,6 @@ def set_realloc(x_gpu, data):
     # Update the GPU memory:
     x_gpu.set(data)
 
-def bufint(a):
-    """
-    Return buffer interface to GPU or numpy array.
-
-    Parameters
-    ----------
-    a : pycuda.gpuarray.GPUArray or numpy.ndarray
-        GPU or numpy array.
-
-    Returns
-    -------
-    b : buffer
-        Buffer interface to array. Returns None if `a` has a length of 0.
-    """
-
-    if not a.size:
-        return None
-    else:
-        if isinstance(a, gpuarray.GPUArray):
-            return a.gpudata.as_buffer(a.nbytes)
-        elif isinstance(a, np.ndarray):
-            return a.data
-        else:
-            raise TypeError('argument must be a GPU or numpy array')
-
 def get_by_inds(src_gpu, ind):
     """
     Get values in a GPUArray by index.
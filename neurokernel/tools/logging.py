@@ -12,10 +12,6 @@ import twiggy
 
 # Try to import various dependencies here so that they can be serialized
 # and transmitted to mpi_backend during model execution:
-try:
-    import mpi4py.MPI
-except ImportError:
-    pass
 try:
     import neurokernel.tools.zmq
 except ImportError:
@@ -117,9 +113,11 @@ def setup_logger(name='', level=twiggy.levels.DEBUG,
 
     if file_name:
         if mpi_comm:
+            # mpi4py.MPI is imported (and initializes MPI) when first used;
+            # a communicator cannot exist before then:
             if 'mpi4py.MPI' not in sys.modules:
                 raise ValueError('mpi4py not available')
-            if not isinstance(mpi_comm, mpi4py.MPI.Intracomm):
+            if not isinstance(mpi_comm, sys.modules['mpi4py.MPI'].Intracomm):
                 raise ValueError('mpi_comm must be an instance of '
                                  'mpi4py.MPI.Intracomm')
             if 'neurokernel.tools.mpi' not in sys.modules:
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""
+Memory usage accounting utilities.
+"""
+
+from collections import OrderedDict
+import resource
+import sys
+
+import numpy as np
+import pandas as pd
+
+def pandas_memory_usage(obj):
+    """
+    Memory used by a pandas Series or DataFrame.
+
+    Parameters
+    ----------
+    obj : pandas.Series or pandas.DataFrame
+        Object whose memory usage is computed.
+
+    Returns
+    -------
+    usage : collections.OrderedDict
+        Number of bytes used by the levels of the index, the integer codes of
+        a MultiIndex, any tuples of index labels cached by a MultiIndex, and
+        the values of each column (or the values of a series), keyed by
+        'index.levels', 'index.codes', 'index.tuples', and 'data.<column>'
+        (or 'data'). Python objects referenced by the index and columns are
+        included.
+    """
+
+    usage = OrderedDict()
+    idx = obj.index
+    if isinstance(idx, pd.MultiIndex):
+        usage['index.levels'] = sum([l.memory_usage(deep=True) \
+                                     for l in idx.levels])
+        codes = idx.codes if hasattr(idx, 'codes') else idx.labels
+        usage['index.codes'] = sum([np.asarray(c).nbytes for c in codes])
+
+        # MultiIndex instances cache an array of label tuples once their
+        # values have been accessed:
+        tuples = getattr(idx, '_tuples', None)
+        if tuples is not None:
+            usage['index.tuples'] = tuples.nbytes+\
+                sum([sys.getsizeof(t) for t in tuples])
+        else:
+            usage['index.tuples'] = 0
+    else:
+        usage['index.levels'] = idx.memory_usage(deep=True)
+        usage['index.codes'] = 0
+        usage['index.tuples'] = 0
+    if isinstance(obj, pd.DataFrame):
+        for c in obj.columns:
+            usage['data.%s' % c] = obj[c].memory_usage(index=False, deep=True)
+    else:
+        usage['data'] = obj.memory_usage(index=False, deep=True)
+    return usage
+
+def nbytes(obj, seen=None):
+    """
+    Memory used by the arrays referenced by an object.
+
+    Parameters
+    ----------
+    obj : object
+        NumPy array, object with a `memory_usage()` method that returns a
+        dict of byte counts, or dict, list, tuple, or instance whose
+        contents or attributes are searched for such objects.
+    seen : set
+        Identities of objects that have already been counted and should be
+        skipped; updated with the objects counted by this call.
+
+    Returns
+    -------
+    n : int
+        Number of bytes. Objects referenced more than once are only counted
+        once; Python objects other than arrays are ignored.
+    """
+
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    elif isinstance(obj, (pd.Series, pd.DataFrame)):
+        return sum(pandas_memory_usage(obj).values())
+    elif isinstance(obj, pd.Index):
+        return obj.memory_usage(deep=True)
+    elif hasattr(obj, 'memory_usage') and not isinstance(obj, type):
+        return sum(obj.memory_usage().values())
+    elif isinstance(obj, dict):
+        return sum([nbytes(v, seen) for v in obj.itervalues()])
+    elif isinstance(obj, (list, tuple)):
+        return sum([nbytes(v, seen) for v in obj])
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        return nbytes(vars(obj), seen)
+    else:
+        return 0
+
+def peak_rss():
+    """
+    Peak resident set size of the current process in bytes.
+    """
+
+    n = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # The size is reported in kilobytes on Linux but in bytes on macOS:
+    if sys.platform == 'darwin':
+        return n
+    else:
+        return n*1024
+
+def format_bytes(n):
+    """
+    Format a number of bytes with a binary prefix (e.g., '1.5 MiB').
+    """
+
+    for prefix in ['', 'Ki', 'Mi', 'Gi']:
+        if abs(n) < 1024:
+            return '%.3g %sB' % (n, prefix)
+        n /= 1024.0
+    return '%.3g TiB' % n
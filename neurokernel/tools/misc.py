@@ -8,9 +8,10 @@ import subprocess
 import sys
 import traceback
 
-from mpi4py import MPI
 import numpy as np
 
+from mpi import MPI
+
 try:
     from subprocess import DEVNULL
 except ImportError:
@@ -166,6 +167,37 @@ def memoized_property(fget):
         return getattr(self, attr_name)
     return property(fget_memoized)
 
+def bufint(a):
+    """
+    Return buffer interface to GPU or numpy array.
+
+    Parameters
+    ----------
+    a : pycuda.gpuarray.GPUArray or numpy.ndarray
+        GPU or numpy array.
+
+    Returns
+    -------
+    b : buffer
+        Buffer interface to array. Returns None if `a` has a length of 0.
+
+    Notes
+    -----
+    PyCUDA is only imported if `a` is not a numpy array so that modules
+    that don't use GPUs need not import it.
+    """
+
+    if not a.size:
+        return None
+    elif isinstance(a, np.ndarray):
+        return a.data
+    else:
+        import pycuda.gpuarray as gpuarray
+        if isinstance(a, gpuarray.GPUArray):
+            return a.gpudata.as_buffer(a.nbytes)
+        else:
+            raise TypeError('argument must be a GPU or numpy array')
+
 def dtype_to_mpi(t):
     """
     Convert Numpy data type to MPI type.
@@ -4,20 +4,77 @@
 MPI utilities.
 """
 
-from mpi4py import MPI
+import sys
+
 import twiggy
 
+class _LazyMPI(object):
+    """
+    Proxy for the `mpi4py.MPI` module that imports it when first used.
+
+    Importing `mpi4py.MPI` initializes MPI. Modules that refer to MPI through
+    this proxy can therefore be imported by programs that run emulations
+    without MPI (e.g., in processes forked by `neurokernel.multiproc`).
+    """
+
+    def __init__(self):
+        self._module = None
+        self._hooks = []
+
+    def on_import(self, f):
+        """
+        Register a function to call with `mpi4py.MPI` once it is imported.
+        """
+
+        if self._module is not None:
+            f(self._module)
+        else:
+            self._hooks.append(f)
+
+    def __reduce__(self):
+
+        # Serialize the proxy by reference:
+        return 'MPI'
+
+    def __getattr__(self, name):
+        if name in ('_module', '_hooks'):
+            raise AttributeError(name)
+        if self._module is None:
+            from mpi4py import MPI as module
+            self._module = module
+            for f in self._hooks:
+                f(module)
+        return getattr(self._module, name)
+
+MPI = _LazyMPI()
+
+def mpi_initialized():
+    """
+    Check whether MPI has been initialized in the current process.
+
+    Unlike `mpi4py.MPI.Is_initialized()`, this does not import `mpi4py.MPI`
+    (and thereby initialize MPI) if it has not been imported yet.
+
+    Returns
+    -------
+    result : bool
+        True if MPI has been initialized.
+    """
+
+    return 'mpi4py.MPI' in sys.modules and \
+        sys.modules['mpi4py.MPI'].Is_initialized()
+
 class MPIOutput(twiggy.outputs.Output):
     """
     Output messages to a file via MPI I/O.
     """
 
-    def __init__(self, name, format, comm,
-                 mode=MPI.MODE_CREATE | MPI.MODE_WRONLY,
-                 close_atexit=True):
+    def __init__(self, name, format, comm, mode=None, close_atexit=True):
         self.filename = name
         self._format = format if format is not None else self._noop_format
         self.comm = comm
+        if mode is None:
+            mode = MPI.MODE_CREATE | MPI.MODE_WRONLY
         self.mode = mode
         super(MPIOutput, self).__init__(format, close_atexit)
 
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+"""
+Tools for storing collections of arrays in uncompressed numpy .npz files.
+"""
+
+import numbers
+import struct
+import zipfile
+
+import numpy as np
+
+# Kinds of scalar values that can be dictionary-encoded:
+VALUE_KINDS = ['str', 'int', 'float', 'bool']
+
+def encode_values(values):
+    """
+    Encode a sequence of scalars as a string array and an array of kinds.
+
+    Parameters
+    ----------
+    values : sequence
+        Strings, integers, floats, or booleans.
+
+    Returns
+    -------
+    strs : numpy.ndarray of unicode
+        String representations of the values.
+    kinds : numpy.ndarray of int8
+        Indices into `VALUE_KINDS` of the types of the values.
+
+    See Also
+    --------
+    decode_values
+    """
+
+    strs = []
+    kinds = []
+    for v in values:
+        if isinstance(v, basestring):
+            strs.append(unicode(v))
+            kinds.append(0)
+        elif isinstance(v, (bool, np.bool_)):
+            strs.append(unicode(int(v)))
+            kinds.append(3)
+        elif isinstance(v, numbers.Integral):
+            strs.append(unicode(int(v)))
+            kinds.append(1)
+        elif isinstance(v, numbers.Real):
+            strs.append(unicode(repr(float(v))))
+            kinds.append(2)
+        else:
+            raise ValueError('cannot encode value %r' % v)
+    return np.array(strs, dtype=np.unicode_), np.array(kinds, dtype=np.int8)
+
+def decode_values(strs, kinds):
+    """
+    Decode values encoded by `encode_values`.
+
+    Parameters
+    ----------
+    strs : numpy.ndarray of unicode
+        String representations of the values.
+    kinds : numpy.ndarray of int8
+        Indices into `VALUE_KINDS` of the types of the values.
+
+    Returns
+    -------
+    values : list
+        Decoded values.
+    """
+
+    f = [unicode, int, float, lambda s: bool(int(s))]
+    return [f[k](s) for s, k in zip(strs, kinds)]
+
+def save_npz(file_name, arrays):
+    """
+    Save arrays to an uncompressed .npz file.
+
+    Parameters
+    ----------
+    file_name : str or file
+        Output file name. If a string that does not end in '.npz', the
+        extension is appended.
+    arrays : dict
+        Arrays to save; the keys are used as the array names.
+
+    Notes
+    -----
+    The arrays are not compressed so that they can subsequently be
+    memory-mapped by `load_npz`.
+    """
+
+    np.savez(file_name, **arrays)
+
+def load_npz(file_name, mmap_mode=None):
+    """
+    Load arrays from an uncompressed .npz file.
+
+    Parameters
+    ----------
+    file_name : str
+        Input file name.
+    mmap_mode : {None, 'r', 'r+', 'c'}
+        If not None, memory-map the arrays in the file with the specified
+        mode (see `numpy.memmap`) rather than reading them into memory.
+        Arrays containing Python objects are always read into memory.
+
+    Returns
+    -------
+    arrays : dict
+        Loaded arrays.
+    """
+
+    if mmap_mode is None:
+        f = np.load(file_name)
+        try:
+            return {k: f[k] for k in f.files}
+        finally:
+            f.close()
+
+    z = zipfile.ZipFile(file_name)
+    try:
+        infos = z.infolist()
+    finally:
+        z.close()
+
+    arrays = {}
+    with open(file_name, 'rb') as fh:
+        for info in infos:
+            name = info.filename
+            if name.endswith('.npy'):
+                name = name[:-4]
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('cannot memory-map compressed array %s' % name)
+
+            # Skip the zip member's local header; its length must be read from
+            # the header itself because the extra field may differ from that
+            # in the central directory:
+            fh.seek(info.header_offset)
+            header = fh.read(30)
+            name_len, extra_len = struct.unpack('<HH', header[26:30])
+            fh.seek(info.header_offset+30+name_len+extra_len)
+
+            version = np.lib.format.read_magic(fh)
+            if version == (1, 0):
+                shape, fortran_order, dtype = \
+                    np.lib.format.read_array_header_1_0(fh)
+            else:
+                shape, fortran_order, dtype = \
+                    np.lib.format.read_array_header_2_0(fh)
+            if dtype.hasobject:
+                arrays[name] = np.lib.format.read_array(fh)
+            elif np.prod(shape) == 0:
+                arrays[name] = np.empty(shape, dtype)
+            else:
+                arrays[name] = np.memmap(file_name, dtype=dtype, mode=mmap_mode,
+                                         offset=fh.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
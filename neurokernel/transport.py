@@ -0,0 +1,658 @@
+#!/usr/bin/env python
+
+"""
+Transports used by modules to exchange port data.
+
+A transport transmits the contents of a module's output buffers to the
+modules connected to it and fills the module's input buffers with the data
+transmitted by its source modules during each execution step. The buffers
+themselves are allocated by the module (see `core.Module._init_comm_bufs()`);
+copying port data into the output buffers and out of the input buffers
+remains the module's responsibility.
+
+All modules in an emulation must use the same transport because the setup of
+some transports requires collective communication.
+"""
+
+import collections
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from profiler import POST, clock
+from tools.mpi import MPI
+
+class Transport(object):
+    """
+    Base class for module data transports.
+
+    Parameters
+    ----------
+    module : core.Module
+        Module whose buffers are transmitted and received. The module's
+        routing information and communication buffers must be initialized
+        before `setup()` is called.
+
+    Methods
+    -------
+    setup()
+        Prepare the transport for use.
+    exchange()
+        Send the module's output buffers and receive its input buffers.
+    close()
+        Release resources held by the transport.
+
+    Notes
+    -----
+    Transports that initiate all transfers before waiting for any of them to
+    complete should call `_posted()` in between so that the module's step
+    profiler can distinguish the two phases. Transports that can tell when the
+    data from each source module has arrived should then call `_received()`
+    for each source module so that the module can report the time spent
+    waiting for data on each of its incoming connections.
+    """
+
+    def __init__(self, module):
+        self.module = module
+
+    def _posted(self):
+        """
+        Record that all transfers of the current step have been initiated.
+        """
+
+        self._post_time = clock()
+        p = self.module.profiler
+        if p is not None:
+            p.mark(POST)
+
+    def _received(self, src_id):
+        """
+        Record that all data transmitted by a source module has been received.
+        """
+
+        m = self.module
+        m._link_wait[src_id] += clock()-self._post_time
+        m._link_wait_count[src_id] += 1
+
+    def setup(self):
+        """
+        Prepare the transport for use.
+        """
+
+        pass
+
+    def exchange(self):
+        """
+        Send the module's output buffers and receive its input buffers.
+        """
+
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release resources held by the transport.
+        """
+
+        pass
+
+class MPITransport(Transport):
+    """
+    Transport based on nonblocking MPI point-to-point communication.
+
+    Parameters
+    ----------
+    module : core.Module
+        Module whose buffers are transmitted and received.
+    comm : mpi4py.MPI.Comm
+        Communicator containing the module processes. Defaults to the
+        module's intracommunicator.
+    """
+
+    def __init__(self, module, comm=None):
+        super(MPITransport, self).__init__(module)
+        self.comm = module.intracomm if comm is None else comm
+        self.req = MPI.Request()
+
+    def _start(self, out_ids, out_ranks, in_ids, in_ranks):
+        """
+        Start transmitting and receiving the buffers of the specified peers.
+
+        Returns
+        -------
+        requests : list of mpi4py.MPI.Request
+            Requests that must be completed to finish the transfers.
+        """
+
+        m = self.module
+        tags = {'gpot': m._gpot_tag, 'spike': m._spike_tag}
+        requests = []
+
+        # Source module of each receive request (None for send requests):
+        self._sources = []
+        for dest_id, dest_rank in zip(out_ids, out_ranks):
+            for t in ['gpot', 'spike']:
+                if m._out_buf[t][dest_id] is not None:
+                    r = self.comm.Isend([m._out_buf_int[t][dest_id],
+                                         m._out_buf_mtype[t][dest_id]],
+                                        dest_rank, tags[t])
+                    requests.append(r)
+                    self._sources.append(None)
+            if not m.time_sync:
+                m.log_info('sending to %s' % dest_id)
+        for src_id, src_rank in zip(in_ids, in_ranks):
+            for t in ['gpot', 'spike']:
+                if m._in_buf[t][src_id] is not None:
+                    r = self.comm.Irecv([m._in_buf_int[t][src_id],
+                                         m._in_buf_mtype[t][src_id]],
+                                        source=src_rank, tag=tags[t])
+                    requests.append(r)
+                    self._sources.append(src_id)
+            if not m.time_sync:
+                m.log_info('receiving from %s' % src_id)
+        return requests
+
+    def _waitall(self, requests):
+        """
+        Wait for the requests returned by `_start()` to complete.
+
+        The time at which the last receive request for each source module
+        completes is recorded with `_received()`.
+        """
+
+        remaining = collections.Counter([src_id for src_id in self._sources \
+                                         if src_id is not None])
+        while remaining:
+            indices = MPI.Request.Waitsome(requests)
+
+            # Requests that were already completed while testing them
+            # elsewhere are no longer active:
+            if indices is None:
+                break
+            for i in indices:
+                src_id = self._sources[i]
+                if src_id is not None:
+                    remaining[src_id] -= 1
+                    if not remaining[src_id]:
+                        del remaining[src_id]
+                        self._received(src_id)
+        for src_id in remaining:
+            self._received(src_id)
+        if requests:
+            self.req.Waitall(requests)
+
+    def exchange(self):
+        m = self.module
+        requests = self._start(m._out_ids, m._out_ranks,
+                               m._in_ids, m._in_ranks)
+        self._posted()
+        self._waitall(requests)
+
+class SharedMemoryTransport(MPITransport):
+    """
+    Transport that uses shared memory to exchange data with co-located modules.
+
+    Modules running on the same node (as determined by splitting the
+    communicator with `MPI.COMM_TYPE_SHARED`) exchange data through an MPI-3
+    shared memory window allocated by each receiving module; data is
+    exchanged with modules on other nodes via MPI point-to-point
+    communication. If the MPI implementation does not support shared memory
+    windows, all data is exchanged via point-to-point communication.
+
+    Parameters
+    ----------
+    module : core.Module
+        Module whose buffers are transmitted and received.
+    comm : mpi4py.MPI.Comm
+        Communicator containing the module processes. Defaults to the
+        module's intracommunicator.
+
+    Notes
+    -----
+    The window of each receiving module contains two slots for the data
+    transmitted by each co-located source module so that a source module may
+    write the data for the next step while the data for the current step is
+    being read. Two counters per link respectively record the number of steps
+    whose data has been written by the source module and read by the
+    destination module; modules wait on these counters rather than on a
+    node-wide barrier.
+    """
+
+    # Number of polling iterations after which a waiting process yields:
+    spin_count = 100
+
+    def setup(self):
+        m = self.module
+        self._step = 0
+
+        # Peers on other nodes are served by point-to-point communication:
+        self._remote_out = (list(m._out_ids), list(m._out_ranks))
+        self._remote_in = (list(m._in_ids), list(m._in_ranks))
+        self._local_out = []
+        self._local_in = []
+        try:
+            self.node_comm = self._split_node()
+        except (NotImplementedError, AttributeError, MPI.Exception):
+            m.log_info('shared memory not supported - using MPI only')
+            self.node_comm = None
+            self.win = None
+            return
+        node_ranks = self.node_comm.allgather(self.comm.rank)
+        node_rank = {r: i for i, r in enumerate(node_ranks)}
+
+        # Lay out the window of the current module: two counters followed by
+        # two slots for each type of data per co-located source module:
+        in_layout = {}
+        local_in = [(src_id, src_rank) for src_id, src_rank in \
+                    zip(m._in_ids, m._in_ranks) if src_rank in node_rank]
+        offset = 16*len(local_in)
+        for i, (src_id, src_rank) in enumerate(local_in):
+            in_layout[src_rank] = {'counters': 16*i}
+            for t in ['gpot', 'spike']:
+                n = m._in_buf_len[t][src_id]
+                if not n:
+                    continue
+                nbytes = n*m.pm[t].dtype.itemsize
+                in_layout[src_rank][t] = (offset, n)
+                offset += 2*(nbytes+(-nbytes % 8))
+
+        try:
+            self.win = MPI.Win.Allocate_shared(offset, 1, comm=self.node_comm)
+        except (NotImplementedError, MPI.Exception):
+            m.log_info('shared memory window allocation failed - using MPI only')
+            self.node_comm.Free()
+            self.node_comm = None
+            self.win = None
+            return
+        self.win.Lock_all(MPI.MODE_NOCHECK)
+
+        # Make the layouts of all windows on the node available to the source
+        # modules:
+        layouts = self.node_comm.allgather(in_layout)
+
+        def slots(win_rank, layout, t):
+            buf, itemsize = self.win.Shared_query(win_rank)
+            offset, n = layout[t]
+            dtype = m.pm[t].dtype
+            nbytes = n*dtype.itemsize+(-n*dtype.itemsize % 8)
+            return [np.ndarray(n, dtype, buf, offset+i*nbytes) \
+                    for i in xrange(2)]
+
+        def counters(win_rank, layout):
+            buf, itemsize = self.win.Shared_query(win_rank)
+            return np.ndarray(2, np.int64, buf, layout['counters'])
+
+        for src_id, src_rank in local_in:
+            layout = in_layout[src_rank]
+            c = counters(self.node_comm.rank, layout)
+            c[:] = 0
+            self._local_in.append((src_id, c,
+                                   {t: slots(self.node_comm.rank, layout, t) \
+                                    for t in ['gpot', 'spike'] if t in layout}))
+        for dest_id, dest_rank in zip(m._out_ids, m._out_ranks):
+            if dest_rank not in node_rank:
+                continue
+            layout = layouts[node_rank[dest_rank]][self.comm.rank]
+            self._local_out.append((dest_id,
+                                    counters(node_rank[dest_rank], layout),
+                                    {t: slots(node_rank[dest_rank], layout, t) \
+                                     for t in ['gpot', 'spike'] if t in layout}))
+        self._remote_out = ([], [])
+        for dest_id, dest_rank in zip(m._out_ids, m._out_ranks):
+            if dest_rank not in node_rank:
+                self._remote_out[0].append(dest_id)
+                self._remote_out[1].append(dest_rank)
+        self._remote_in = ([], [])
+        for src_id, src_rank in zip(m._in_ids, m._in_ranks):
+            if src_rank not in node_rank:
+                self._remote_in[0].append(src_id)
+                self._remote_in[1].append(src_rank)
+
+        # Ensure that all counters are zeroed before any module uses them:
+        self.win.Sync()
+        self.node_comm.Barrier()
+        m.log_info('exchanging data with %i co-located modules via shared memory' % \
+                   len(set([x[0] for x in self._local_in+self._local_out])))
+
+    def _split_node(self):
+        """
+        Create a communicator containing the processes on the current node.
+        """
+
+        return self.comm.Split_type(MPI.COMM_TYPE_SHARED)
+
+    def _wait(self, counter, i, value, requests):
+        """
+        Wait until the specified counter reaches a value.
+
+        Pending point-to-point requests are tested while waiting so that
+        transfers to and from modules on other nodes progress.
+        """
+
+        count = 0
+        while counter[i] < value:
+            self.win.Sync()
+            count += 1
+            if count % self.spin_count == 0:
+                if requests:
+                    MPI.Request.Testall(requests)
+                time.sleep(1e-6)
+
+    def exchange(self):
+        if self.win is None:
+            return super(SharedMemoryTransport, self).exchange()
+        m = self.module
+        k = self._step
+        slot = k % 2
+
+        # Write the output data into the slots of the co-located destination
+        # modules once they have read the data previously written to those
+        # slots, then publish it:
+        for dest_id, c, s in self._local_out:
+            self._wait(c, 1, k-1, None)
+            for t in ['gpot', 'spike']:
+                if m._out_buf[t][dest_id] is not None:
+                    s[t][slot][:] = m._out_buf[t][dest_id]
+        self.win.Sync()
+        for dest_id, c, s in self._local_out:
+            c[0] = k+1
+        self.win.Sync()
+
+        requests = self._start(self._remote_out[0], self._remote_out[1],
+                               self._remote_in[0], self._remote_in[1])
+        self._posted()
+
+        # Read the data written by the co-located source modules:
+        for src_id, c, s in self._local_in:
+            self._wait(c, 0, k+1, requests)
+            self._received(src_id)
+            for t in ['gpot', 'spike']:
+                if m._in_buf[t][src_id] is not None:
+                    m._in_buf[t][src_id][:] = s[t][slot]
+            self.win.Sync()
+            c[1] = k+1
+        self.win.Sync()
+
+        self._waitall(requests)
+        self._step += 1
+
+    def close(self):
+        if self.win is not None:
+            self.win.Unlock_all()
+            self.win.Free()
+            self.node_comm.Free()
+            self.win = None
+
+class RMATransport(MPITransport):
+    """
+    Transport based on one-sided MPI communication.
+
+    Each module exposes its input buffers in an MPI window; source modules
+    write their output buffers directly into the windows of their destination
+    modules with `MPI.Win.Put`. Each step is synchronized with a
+    post-start-complete-wait epoch involving only the source and destination
+    modules of the current module rather than with a fence over all modules.
+
+    Parameters
+    ----------
+    module : core.Module
+        Module whose buffers are transmitted and received.
+    comm : mpi4py.MPI.Comm
+        Communicator containing the module processes. Defaults to the
+        module's intracommunicator.
+
+    Notes
+    -----
+    The module's input buffers are replaced by views into the memory exposed
+    by the window so that the data written by the source modules need not be
+    copied before being scattered into the module's port data arrays.
+    """
+
+    def setup(self):
+        m = self.module
+
+        # Lay out the input buffers of all source modules in a single
+        # contiguous array:
+        layout = {}
+        offset = 0
+        for src_id, src_rank in zip(m._in_ids, m._in_ranks):
+            layout[src_rank] = {}
+            for t in ['gpot', 'spike']:
+                if m._in_buf[t][src_id] is not None:
+                    layout[src_rank][t] = offset
+                    nbytes = m._in_buf[t][src_id].nbytes
+                    offset += nbytes+(-nbytes % 8)
+        self.mem = np.empty(max(offset, 1), np.uint8)
+        for src_id, src_rank in zip(m._in_ids, m._in_ranks):
+            for t, offset in layout[src_rank].iteritems():
+                buf = m._in_buf[t][src_id]
+                m._in_buf[t][src_id] = \
+                    self.mem[offset:offset+buf.nbytes].view(buf.dtype)
+        self.win = MPI.Win.Create(self.mem, 1, comm=self.comm)
+
+        # Tell each source module where to write its data:
+        send = [{} for i in xrange(self.comm.size)]
+        for src_rank in m._in_ranks:
+            send[src_rank] = layout[src_rank]
+        recv = self.comm.alltoall(send)
+        self._targets = []
+        for dest_id, dest_rank in zip(m._out_ids, m._out_ranks):
+            for t, offset in recv[dest_rank].iteritems():
+                self._targets.append((m._out_buf_int[t][dest_id],
+                                      m._out_buf_mtype[t][dest_id],
+                                      dest_rank,
+                                      (offset, len(m._out_buf[t][dest_id]),
+                                       m._out_buf_mtype[t][dest_id])))
+
+        group = self.comm.Get_group()
+        self._src_group = group.Incl(sorted(set(m._in_ranks))) \
+                          if m._in_ranks else None
+        self._dest_group = group.Incl(sorted(set(m._out_ranks))) \
+                           if m._out_ranks else None
+        group.Free()
+
+    def exchange(self):
+
+        # Expose the input buffers to the source modules only after their
+        # contents from the previous step have been consumed:
+        if self._src_group is not None:
+            self.win.Post(self._src_group)
+        if self._dest_group is not None:
+            self.win.Start(self._dest_group)
+            for buf_int, mtype, dest_rank, target in self._targets:
+                self.win.Put([buf_int, mtype], dest_rank, target)
+        self._posted()
+        if self._dest_group is not None:
+            self.win.Complete()
+        if self._src_group is not None:
+            self.win.Wait()
+
+            # The exposure epoch only ends once all source modules have
+            # written their data, so their data is received at the same time:
+            for src_id in self.module._in_ids:
+                self._received(src_id)
+
+    def close(self):
+        if self.win is not None:
+            self.win.Free()
+            self.win = None
+            for group in [self._src_group, self._dest_group]:
+                if group is not None:
+                    group.Free()
+
+class ZMQTransport(Transport):
+    """
+    Transport based on ZeroMQ PUSH/PULL sockets.
+
+    Each module that receives data binds a PULL socket to its endpoint; each
+    module that transmits data connects a PUSH socket to the endpoint of each
+    of its destination modules. The contents of the output buffers are
+    transmitted without being copied by ZeroMQ. This transport does not use
+    MPI and requires pyzmq.
+
+    Parameters
+    ----------
+    module : core.Module
+        Module whose buffers are transmitted and received.
+
+    Attributes
+    ----------
+    endpoints : dict
+        ZeroMQ endpoints (e.g., 'tcp://host:port') keyed by module
+        identifier. Receiving modules bind TCP endpoints on all interfaces.
+    endpoint_dir : str
+        Directory in which to create IPC endpoints for modules without an
+        entry in `endpoints`. If None, the system's temporary directory is
+        used. The names of the IPC endpoints contain the module's `run_id` so
+        that concurrent emulations do not share them.
+    linger : int
+        Number of milliseconds to wait for pending messages to be transmitted
+        when the transport is closed.
+
+    Notes
+    -----
+    The class attributes may be set for an emulation by creating a subclass
+    with `configure()` and passing it to the modules' constructors. Concurrent
+    emulations on the same host must use different entries in `endpoints`.
+    """
+
+    endpoints = {}
+    endpoint_dir = None
+    linger = 1000
+
+    @classmethod
+    def configure(cls, **attrs):
+        """
+        Create a subclass with the specified class attributes.
+        """
+
+        for k in attrs:
+            if k not in ['endpoints', 'endpoint_dir', 'linger']:
+                raise ValueError('unrecognized attribute: %s' % k)
+        return type(cls.__name__, (cls,), attrs)
+
+    def endpoint(self, id):
+        """
+        ZeroMQ endpoint to which data for the specified module is sent.
+        """
+
+        if id in self.endpoints:
+            return self.endpoints[id]
+        d = self.endpoint_dir or tempfile.gettempdir()
+        if self.module.run_id is None:
+            name = 'neurokernel-%s' % id
+        else:
+            name = 'neurokernel-%s-%s' % (self.module.run_id, id)
+        return 'ipc://%s' % os.path.join(d, name)
+
+    def setup(self):
+        import zmq
+        self._zmq = zmq
+        m = self.module
+        self.ctx = zmq.Context()
+
+        self.pull = None
+        if m._in_ids:
+            self.pull = self.ctx.socket(zmq.PULL)
+            self.pull.setsockopt(zmq.LINGER, self.linger)
+            addr = self.endpoint(m.id)
+            if addr.startswith('tcp://'):
+                addr = 'tcp://*:%s' % addr.rsplit(':', 1)[1]
+            self.pull.bind(addr)
+        self.push = {}
+        for dest_id in m._out_ids:
+            sock = self.ctx.socket(zmq.PUSH)
+            sock.setsockopt(zmq.LINGER, self.linger)
+            sock.connect(self.endpoint(dest_id))
+            self.push[dest_id] = sock
+
+        # Messages that arrive before all messages for the current step have
+        # been received are queued per source module:
+        self._src_ids = {str(src_id): src_id for src_id in m._in_ids}
+        self._pending = {src_id: collections.deque() for src_id in m._in_ids}
+        self._step = 0
+
+    def exchange(self):
+        zmq = self._zmq
+        m = self.module
+        step = str(self._step)
+
+        # Each message contains the source module identifier, the step, and
+        # the graded potential and spiking port data:
+        trackers = []
+        for dest_id, sock in self.push.iteritems():
+            frames = [str(m.id), step]
+            for t in ['gpot', 'spike']:
+                if m._out_buf[t][dest_id] is not None:
+                    f = zmq.Frame(m._out_buf[t][dest_id], track=True)
+                    trackers.append(f.tracker)
+                    frames.append(f)
+                else:
+                    frames.append(b'')
+            sock.send_multipart(frames, copy=False)
+        self._posted()
+
+        missing = set()
+        for src_id, q in self._pending.iteritems():
+            if q:
+                self._received(src_id)
+            else:
+                missing.add(src_id)
+        while missing:
+            frames = self.pull.recv_multipart(copy=False)
+            src_id = self._src_ids[frames[0].bytes]
+            self._pending[src_id].append(frames)
+            if src_id in missing:
+                missing.discard(src_id)
+                self._received(src_id)
+        for src_id, q in self._pending.iteritems():
+            frames = q.popleft()
+            if frames[1].bytes != step:
+                raise RuntimeError('received data for step %s from %s in step %s' % \
+                                   (frames[1].bytes, src_id, step))
+            for t, f in zip(['gpot', 'spike'], frames[2:]):
+                buf = m._in_buf[t][src_id]
+                if buf is not None:
+                    buf[:] = np.frombuffer(f, buf.dtype)
+
+        # The output buffers may only be modified after ZeroMQ is done with
+        # them:
+        for tracker in trackers:
+            tracker.wait()
+        self._step += 1
+
+    def close(self):
+        if self.pull is not None:
+            self.pull.close()
+        for sock in self.push.itervalues():
+            sock.close()
+        self.ctx.term()
+
+# Transports that may be selected by name:
+TRANSPORTS = {'mpi': MPITransport,
+              'shm': SharedMemoryTransport,
+              'rma': RMATransport,
+              'zmq': ZMQTransport}
+
+def get_transport(transport):
+    """
+    Look up a transport class.
+
+    Parameters
+    ----------
+    transport : str or type
+        Name of a transport in `TRANSPORTS` or a subclass of `Transport`.
+
+    Returns
+    -------
+    cls : type
+        Transport class.
+    """
+
+    if isinstance(transport, type) and issubclass(transport, Transport):
+        return transport
+    try:
+        return TRANSPORTS[transport]
+    except (KeyError, TypeError):
+        raise ValueError('unrecognized transport: %s' % str(transport))
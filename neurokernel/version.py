@@ -1,2 +1,4 @@
-import pkg_resources
-__version__ = pkg_resources.require('neurokernel')[0].version
+# The version is defined here rather than looked up with pkg_resources because
+# importing the latter slows down the startup of every spawned process; setup.py
+# reads it from this file:
+__version__ = '0.1'
@@ -14,8 +14,12 @@ from distutils.command.install_headers import install_headers
 from setuptools import find_packages
 from setuptools import setup
 
+# Get the version without importing the package:
+execfile(os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                      'neurokernel', 'version.py'))
+
 NAME =               'neurokernel'
-VERSION =            '0.1'
+VERSION =            __version__
 AUTHOR =             'Neurokernel Development Team'
 AUTHOR_EMAIL =       'neurokernel-dev@columbia.edu'
 URL =                'https://github.com/neurokernel/neurokernel/'
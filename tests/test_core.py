@@ -4,6 +4,7 @@ import neurokernel.mpi_relaunch
 
 import cPickle as pickle
 import os
+import shutil
 import tempfile
 
 from mpi4py import MPI
@@ -13,6 +14,8 @@ from neurokernel.pattern import Pattern
 from neurokernel.plsel import Selector, SelectorMethods
 from neurokernel.core import Module, Manager, CTRL_TAG, GPOT_TAG, SPIKE_TAG
 import neurokernel.mpi as mpi
+from neurokernel.mpi_proc import ProcessPool
+from neurokernel.transport import ZMQTransport
 
 class MyModule1(Module):
     """
@@ -25,14 +28,15 @@ class MyModule1(Module):
                  ctrl_tag=CTRL_TAG, gpot_tag=GPOT_TAG, spike_tag=SPIKE_TAG,
                  id=None, device=None,
                  routing_table=None, rank_to_id=None,
-                 debug=False, time_sync=False, out_spike_data=None):
+                 debug=False, time_sync=False, transport='mpi',
+                 out_spike_data=None):
         super(MyModule1, self).__init__(sel, sel_in, sel_out,
                  sel_gpot, sel_spike, data_gpot, data_spike,
                  columns,
                  ctrl_tag, gpot_tag, spike_tag,
                  id, device,
                  routing_table, rank_to_id,
-                 debug, time_sync)
+                 debug, time_sync, transport)
         self.out_spike_data = out_spike_data
 
     def run_step(self):
@@ -55,17 +59,17 @@ class MyModule2(Module):
                  ctrl_tag=CTRL_TAG, gpot_tag=GPOT_TAG, spike_tag=SPIKE_TAG,
                  id=None, device=None,
                  routing_table=None, rank_to_id=None,
-                 debug=False, time_sync=False, out_file_name=None):
+                 debug=False, time_sync=False, transport='mpi',
+                 out_file_name=None):
         super(MyModule2, self).__init__(sel, sel_in, sel_out,
                  sel_gpot, sel_spike, data_gpot, data_spike,
                  columns,
                  ctrl_tag, gpot_tag, spike_tag,
                  id, device,
                  routing_table, rank_to_id,
-                 debug, time_sync)
+                 debug, time_sync, transport)
         self.out_file_name = out_file_name
-            
-    out_buf = []
+        self.out_buf = []
 
     def run_step(self):
         super(MyModule2, self).run_step()
@@ -77,10 +81,12 @@ class MyModule2(Module):
         self.out_buf.append(in_spike_data)
 
     def post_run(self):
-        super(MyModule2, self).post_run()
+
+        # Save the data before the manager is told that the module is done:
         if self.out_file_name:
             with open(self.out_file_name, 'w') as f:
                 pickle.dump(self.out_buf[1], f)
+        super(MyModule2, self).post_run()
 
 def make_sels(sel_in_gpot, sel_out_gpot, sel_in_spike, sel_out_spike):
     sel_in_gpot = Selector(sel_in_gpot)
@@ -96,15 +102,29 @@ def make_sels(sel_in_gpot, sel_out_gpot, sel_in_spike, sel_out_spike):
     
     return sel, sel_in, sel_out, sel_gpot, sel_spike
 
-from unittest import main, TestCase
+from unittest import main, skipIf, TestCase
+
+try:
+    import zmq
+except ImportError:
+    zmq = None
 
 debug = False
 
 class test_core_gpu(TestCase):
+    transport = 'mpi'
+    pool = None
+
     def setUp(self):
         self.man = Manager()
 
-    def test_transmit_spikes_one_to_one(self):
+    def add_one_to_one(self):
+        """
+        Add a module that transmits spikes to another module along four
+        one-to-one connections and return the name of the file to which the
+        receiving module writes its output.
+        """
+
         m1_sel_in_gpot = Selector('')
         m1_sel_out_gpot = Selector('')
         m1_sel_in_spike = Selector('')
@@ -129,7 +149,8 @@ class test_core_gpu(TestCase):
                      m1_sel_gpot, m1_sel_spike,
                      np.zeros(N1_gpot, dtype=np.double),
                      np.zeros(N1_spike, dtype=int),
-                     device=0, debug=debug, out_spike_data=[0, 0, 1, 1])
+                     device=0, debug=debug, transport=self.transport,
+                     out_spike_data=[0, 0, 1, 1])
 
         f, out_file_name = tempfile.mkstemp()
         os.close(f)
@@ -140,7 +161,8 @@ class test_core_gpu(TestCase):
                      m2_sel_gpot, m2_sel_spike,
                      np.zeros(N2_gpot, dtype=np.double),
                      np.zeros(N2_spike, dtype=int),
-                     device=1, debug=debug, out_file_name=out_file_name)
+                     device=1, debug=debug, transport=self.transport,
+                     out_file_name=out_file_name)
 
         pat12 = Pattern(m1_sel, m2_sel)
         pat12.interface[m1_sel_out_gpot] = [0, 'in', 'gpot']
@@ -156,9 +178,14 @@ class test_core_gpu(TestCase):
         pat12['/m1/out/spike[2]', '/m2/in/spike[2]'] = 1
         pat12['/m1/out/spike[3]', '/m2/in/spike[3]'] = 1
         self.man.connect(m1_id, m2_id, pat12, 0, 1)
+        return out_file_name
+
+    def test_transmit_spikes_one_to_one(self):
+        m1_id, m2_id = 'm1', 'm2'
+        out_file_name = self.add_one_to_one()
 
         # Run emulation for 2 steps:
-        self.man.spawn()
+        self.man.spawn(pool=self.pool)
         self.man.start(2)
         self.man.wait()
 
@@ -169,6 +196,32 @@ class test_core_gpu(TestCase):
         os.remove(out_file_name)
         self.assertSequenceEqual(list(output), [0, 0, 1, 1])
 
+        # The phase durations of the second step are sent to the manager:
+        for id in [m1_id, m2_id]:
+            assert self.man.step_durations[id].shape == (1, 5)
+
+        # Four spikes are received by m2 during each step:
+        m = self.man.comm_matrix()
+        assert m.loc[m1_id, m2_id] == 4*np.dtype(int).itemsize
+        assert m.values.sum() == 4*np.dtype(int).itemsize
+        assert self.man.comm_matrix('wait').loc[m1_id, m2_id] >= 0
+
+    def test_sample(self):
+        out_file_name = self.add_one_to_one()
+
+        # Run emulation for 2 steps while sampling the call stacks:
+        sample_dir = tempfile.mkdtemp()
+        self.man.spawn(pool=self.pool)
+        self.man.sample(0.001, os.path.join(sample_dir, 'profile'))
+        self.man.start(2)
+        self.man.wait()
+        os.remove(out_file_name)
+
+        # Each module writes its samples when it finishes:
+        sample_files = sorted(os.listdir(sample_dir))
+        shutil.rmtree(sample_dir)
+        assert sample_files == ['profile.m1.folded', 'profile.m2.folded']
+
     def test_transmit_spikes_one_to_many(self):
         m1_sel_in_gpot = Selector('')
         m1_sel_out_gpot = Selector('')
@@ -194,7 +247,8 @@ class test_core_gpu(TestCase):
                      m1_sel_gpot, m1_sel_spike,
                      np.zeros(N1_gpot, dtype=np.double),
                      np.zeros(N1_spike, dtype=int),
-                     device=0, debug=debug, out_spike_data=[1, 0, 0, 0])
+                     device=0, debug=debug, transport=self.transport,
+                     out_spike_data=[1, 0, 0, 0])
 
         f, out_file_name = tempfile.mkstemp()
         os.close(f)
@@ -205,7 +259,8 @@ class test_core_gpu(TestCase):
                      m2_sel_gpot, m2_sel_spike,
                      np.zeros(N2_gpot, dtype=np.double),
                      np.zeros(N2_spike, dtype=int),
-                     device=1, debug=debug, out_file_name=out_file_name)
+                     device=1, debug=debug, transport=self.transport,
+                     out_file_name=out_file_name)
 
         pat12 = Pattern(m1_sel, m2_sel)
         pat12.interface[m1_sel_out_gpot] = [0, 'in', 'gpot']
@@ -223,7 +278,7 @@ class test_core_gpu(TestCase):
         self.man.connect(m1_id, m2_id, pat12, 0, 1)
 
         # Run emulation for 2 steps:
-        self.man.spawn()
+        self.man.spawn(pool=self.pool)
         self.man.start(2)
         self.man.wait()
 
@@ -234,6 +289,44 @@ class test_core_gpu(TestCase):
         os.remove(out_file_name)
         self.assertSequenceEqual(list(output), [1, 1, 1, 1])
 
+class test_core_shm(test_core_gpu):
+    transport = 'shm'
+
+class test_core_rma(test_core_gpu):
+    transport = 'rma'
+
+class test_core_out_of_band(test_core_gpu):
+    def setUp(self):
+        super(test_core_out_of_band, self).setUp()
+
+        # Transmit all constructor array arguments without pickling them:
+        self.man.min_out_of_band_nbytes = 0
+
+class test_core_pool(test_core_gpu):
+    @classmethod
+    def setUpClass(cls):
+        # The pool is larger than needed to exercise idle processes:
+        cls.pool = ProcessPool(3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def tearDown(self):
+        self.assertEqual(self.pool.startup_times[-1], self.man.startup_time)
+
+@skipIf(zmq is None, 'pyzmq not installed')
+class test_core_zmq(test_core_gpu):
+    transport = 'zmq'
+
+    def test_endpoint(self):
+        # Emulations run at the same time must not share IPC endpoints:
+        endpoints = set()
+        for man in [self.man, Manager()]:
+            m = type('FakeModule', (object,), {'run_id': man.run_id})()
+            endpoints.add(ZMQTransport(m).endpoint('a'))
+        self.assertEqual(len(endpoints), 2)
+
 if __name__ == '__main__':
     logger = mpi.setup_logger(screen=False,
                               mpi_comm=MPI.COMM_WORLD, multiline=True)
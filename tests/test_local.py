@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+import numpy as np
+
+from neurokernel.core import Module
+from neurokernel.local import Barrier, BarrierAbortedError, LocalManager
+from neurokernel.pattern import Pattern
+from neurokernel.plsel import Selector, SelectorMethods
+
+class EmitterModule(Module):
+    """
+    Module that emits the current step number on its output ports.
+    """
+
+    def run_step(self):
+        super(EmitterModule, self).run_step()
+        self.pm['gpot'][self.out_gpot_ports] = self.steps
+        self.pm['spike'][self.out_spike_ports] = self.steps % 2
+
+class ReceiverModule(Module):
+    """
+    Module that records the data received on its input ports.
+    """
+
+    def run_step(self):
+        super(ReceiverModule, self).run_step()
+        if not hasattr(self, 'received'):
+            self.received = []
+        self.received.append((self.pm['gpot'][self.in_gpot_ports].copy(),
+                              self.pm['spike'][self.in_spike_ports].copy()))
+
+class ReorderedModule(ReceiverModule):
+    """
+    Module that lists its graded potential ports in reverse order.
+    """
+
+    def __init__(self, sel, sel_in, sel_out, sel_gpot, sel_spike,
+                 data_gpot, data_spike, **kwargs):
+        super(ReorderedModule, self).__init__(sel, sel_in, sel_out,
+                                              '/m2/in[1],/m2/in[0]', sel_spike,
+                                              data_gpot, data_spike, **kwargs)
+
+class SyncFailingModule(ReceiverModule):
+    """
+    Module that fails to exchange data during its second step.
+    """
+
+    def _sync(self):
+        if self.steps == 1:
+            raise ValueError('failed')
+        super(SyncFailingModule, self)._sync()
+
+def add_module(man, cls, id, sel_in, sel_out, sel_gpot, sel_spike):
+    sel = Selector.union(Selector(sel_in), Selector(sel_out))
+    man.add(cls, id, sel, sel_in, sel_out, sel_gpot, sel_spike,
+            np.zeros(SelectorMethods.count_ports(sel_gpot), np.double),
+            np.zeros(SelectorMethods.count_ports(sel_spike), np.int32))
+
+class test_local_manager(TestCase):
+    threaded = False
+
+    def setUp(self):
+        self.man = self.make_manager(ReceiverModule)
+
+    def make_manager(self, receiver_cls):
+        man = LocalManager(threaded=self.threaded)
+        add_module(man, EmitterModule, 'm1', '', '/m1/out[0:4]',
+                   '/m1/out[0:2]', '/m1/out[2:4]')
+        add_module(man, receiver_cls, 'm2', '/m2/in[0:4]', '',
+                   '/m2/in[0:2]', '/m2/in[2:4]')
+
+        pat = Pattern('/m1/out[0:4]', '/m2/in[0:4]')
+        pat.interface['/m1/out[0:4]'] = [0, 'in', '']
+        pat.interface['/m1/out[0:2]', 'type'] = 'gpot'
+        pat.interface['/m1/out[2:4]', 'type'] = 'spike'
+        pat.interface['/m2/in[0:4]'] = [1, 'out', '']
+        pat.interface['/m2/in[0:2]', 'type'] = 'gpot'
+        pat.interface['/m2/in[2:4]', 'type'] = 'spike'
+        pat['/m1/out[0]', '/m2/in[1]'] = 1
+        pat['/m1/out[1]', '/m2/in[0]'] = 1
+        pat['/m1/out[2]', '/m2/in[2:4]'] = 1
+        man.connect('m1', 'm2', pat, 0, 1)
+        return man
+
+    def test_run(self):
+        self.man.spawn()
+        self.man.start(4)
+        self.man.wait()
+        received = self.man.modules['m2'].received
+
+        # Data emitted during a step is received at the start of the next:
+        assert len(received) == 4
+        for i, (gpot, spike) in enumerate(received):
+            np.testing.assert_array_equal(gpot, [max(i-1, 0)]*2)
+            np.testing.assert_array_equal(spike, [max(i-1, 0) % 2]*2)
+        assert self.man.modules['m1'].steps == 4
+
+    def test_reordered_ports(self):
+        # The plan computed by the manager from the selectors passed to add()
+        # must not be used by a module whose ports are in a different order:
+        man = self.make_manager(ReorderedModule)
+        man.spawn()
+        man.start(2)
+        man.wait()
+        m = man.modules['m2']
+        assert m.routing_plan is not man.routing_plans['m2']
+        np.testing.assert_array_equal(m.routing_plan.in_inds['gpot']['m1'],
+                                      [0, 1])
+        np.testing.assert_array_equal(
+            man.routing_plans['m2'].in_inds['gpot']['m1'], [1, 0])
+
+    def test_step_profile(self):
+        self.man.spawn()
+        self.man.start(4)
+        self.man.wait()
+
+        # The first step is excluded from the phase durations:
+        for id in ['m1', 'm2']:
+            d = self.man.step_durations[id]
+            assert d.shape == (3, 5)
+            assert (d >= 0).all()
+        s = self.man.step_profile()
+        assert set(s.index.get_level_values('module')) == \
+            set(['m1', 'm2', 'all'])
+        np.testing.assert_almost_equal(s.loc['all']['fraction'].sum(), 1.0)
+
+    def test_memory_usage(self):
+        self.man.spawn()
+        modules, connections = self.man.memory_usage()
+        assert modules.keys() == ['m1', 'm2']
+        assert modules['m1'] > 0
+        assert connections.keys() == [('m1', 'm2')]
+        assert connections[('m1', 'm2')] > 0
+        self.man.start(1)
+        self.man.wait()
+        assert set(self.man.peak_rss.keys()) == set(['m1', 'm2'])
+
+    def test_trace(self):
+        fd, file_name = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            self.man.trace_file = file_name
+            self.man.spawn()
+            self.man.start(4)
+            self.man.wait()
+            with open(file_name, 'r') as f:
+                events = json.load(f)['traceEvents']
+        finally:
+            os.remove(file_name)
+        names = [e['args']['name'] for e in events if e['ph'] == 'M']
+        assert sorted(names) == ['m1', 'm2']
+        assert len([e for e in events if e['name'] == 'step']) == 8
+
+    def test_sample(self):
+        d = tempfile.mkdtemp()
+        try:
+            self.man.spawn()
+            self.man.sample(0.001, os.path.join(d, 'profile'))
+            self.man.start(4)
+            self.man.wait()
+            assert os.listdir(d) == ['profile.local.folded']
+        finally:
+            shutil.rmtree(d)
+
+    def test_start_infinite(self):
+        self.man.spawn()
+        self.assertRaises(ValueError, self.man.start, float('inf'))
+
+class test_local_manager_threaded(test_local_manager):
+    threaded = True
+
+    def test_sync_error(self):
+        man = self.make_manager(SyncFailingModule)
+        man.spawn()
+        man.start(4)
+        self.assertRaises(ValueError, man.wait)
+
+class test_barrier(TestCase):
+    def test_abort(self):
+        b = Barrier(2)
+        b.abort()
+        assert b.aborted
+        self.assertRaises(BarrierAbortedError, b.wait)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+import numpy as np
+import pandas as pd
+
+from neurokernel.tools.memory import format_bytes, nbytes, pandas_memory_usage, \
+     peak_rss
+
+class test_memory(TestCase):
+    def test_pandas_memory_usage_frame(self):
+        df = pd.DataFrame({'x': np.zeros(4), 'y': np.zeros(4, np.int32)},
+                          index=pd.MultiIndex.from_tuples([('a', i) for i in xrange(4)]))
+        u = pandas_memory_usage(df)
+        assert u.keys() == ['index.levels', 'index.codes', 'index.tuples',
+                            'data.x', 'data.y']
+        assert u['data.x'] == 32
+        assert u['data.y'] == 16
+
+    def test_pandas_memory_usage_series(self):
+        u = pandas_memory_usage(pd.Series(np.zeros(4)))
+        assert u['index.codes'] == 0
+        assert u['data'] == 32
+
+    def test_nbytes(self):
+        x = np.zeros(10)
+        class Foo(object):
+            pass
+        foo = Foo()
+        foo.x = x
+        assert nbytes({'a': [x, (x, np.zeros(2))], 'b': foo, 'c': 'bar'}) == 96
+
+    def test_peak_rss(self):
+        assert peak_rss() > 0
+
+    def test_format_bytes(self):
+        assert format_bytes(512) == '512 B'
+        assert format_bytes(1536) == '1.5 KiB'
+        assert format_bytes(3*1024**3) == '3 GiB'
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+from unittest import main, TestCase
+
+import numpy as np
+
+from neurokernel.core import Module
+from neurokernel.multiproc import MultiprocessingManager
+from neurokernel.pattern import Pattern
+
+from test_local import EmitterModule, add_module
+
+class RecorderModule(Module):
+    """
+    Module that checks the data received on its input ports.
+    """
+
+    def run_step(self):
+        super(RecorderModule, self).run_step()
+        expected = max(self.steps-1, 0)
+        if not (self.pm['gpot'][self.in_gpot_ports] == expected).all():
+            raise ValueError('unexpected gpot data in step %i' % self.steps)
+
+class FailingModule(Module):
+    def run_step(self):
+        raise ValueError('failed')
+
+class KilledModule(Module):
+    def run_step(self):
+        os.kill(os.getpid(), signal.SIGKILL)
+
+class test_multiprocessing_manager(TestCase):
+    def make_manager(self, cls):
+        man = MultiprocessingManager()
+        add_module(man, EmitterModule, 'm1', '/m1/in[0:2]', '/m1/out[0:2]',
+                   '/m1/in[0:2],/m1/out[0:2]', '')
+        add_module(man, cls, 'm2', '/m2/in[0:2]', '/m2/out[0:2]',
+                   '/m2/in[0:2],/m2/out[0:2]', '')
+        for a, b in [('m1', 'm2'), ('m2', 'm1')]:
+            pat = Pattern('/%s/out[0:2]' % a, '/%s/in[0:2]' % b)
+            pat.interface['/%s/out[0:2]' % a] = [0, 'in', 'gpot']
+            pat.interface['/%s/in[0:2]' % b] = [1, 'out', 'gpot']
+            for i in xrange(2):
+                pat['/%s/out[%i]' % (a, i), '/%s/in[%i]' % (b, i)] = 1
+            man.connect(a, b, pat, 0, 1)
+        return man
+
+    def test_run(self):
+        man = self.make_manager(RecorderModule)
+        for m in man._kwargs.itervalues():
+            m['debug'] = True
+            m['time_sync'] = True
+        man.spawn()
+        man.start(10)
+        man.wait()
+        assert man.stop_time > man.start_time
+        assert man.counter == 9
+        assert man.load_balance.steps == 9
+        assert man.load_balance.report()['straggler_steps'].sum() == 9
+
+        # Two double-precision values are received along each connection
+        # during each step:
+        m = man.comm_matrix()
+        np.testing.assert_array_equal(m.values, [[0, 16], [16, 0]])
+        np.testing.assert_array_equal(man.comm_matrix('messages').values,
+                                      [[0, 1], [1, 0]])
+        w = man.comm_matrix('wait')
+        assert w.loc['m1', 'm2'] >= 0 and w.loc['m2', 'm1'] >= 0
+        assert np.isnan(w.loc['m1', 'm1'])
+
+    def test_sample(self):
+        d = tempfile.mkdtemp()
+        try:
+            man = self.make_manager(RecorderModule)
+            man.spawn()
+            man.sample(0.001, os.path.join(d, 'profile'))
+            man.start(10)
+            man.wait()
+            assert sorted(os.listdir(d)) == ['profile.m1.folded',
+                                             'profile.m2.folded']
+        finally:
+            shutil.rmtree(d)
+
+    def test_error(self):
+        man = self.make_manager(FailingModule)
+        man._kwargs[1]['debug'] = True
+        man.spawn()
+        man.start(3)
+        self.assertRaises(RuntimeError, man.wait)
+
+    def test_killed(self):
+        man = self.make_manager(KilledModule)
+        man.poll_interval = 0.1
+        man.spawn()
+        man.start(3)
+        self.assertRaises(RuntimeError, man.wait)
+        assert man._processes == {}
+
+    def test_mpi_not_initialized(self):
+        # Run an emulation in a new interpreter and check that neither the
+        # imported modules nor the emulation imported mpi4py.MPI (which
+        # initializes MPI) before the module processes were forked:
+        code = 'import sys\n' \
+               'import neurokernel.core\n' \
+               'from test_multiproc import test_multiprocessing_manager\n' \
+               'test_multiprocessing_manager("test_run").test_run()\n' \
+               'assert "mpi4py.MPI" not in sys.modules\n'
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.path.dirname(os.path.abspath(__file__))]+sys.path)
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,8 @@
 #!/usr/bin/env python
 
+import os
+import shutil
+import tempfile
 from unittest import main, TestCase
 
 import numpy as np
@@ -34,6 +37,45 @@ class test_interface(TestCase):
     def test_create_dup_identifiers(self):
         self.assertRaises(Exception, Interface, '/foo[0],/foo[0]')
 
+    def test_categorical_columns(self):
+        i = Interface('/foo[0:4]')
+        i['/foo[0:2]'] = [0, 'in', 'gpot']
+        i['/foo[2:4]'] = [3, 'out', 'spike']
+        for k in ['interface', 'io', 'type']:
+            assert i.data[k].dtype.name == 'category'
+        assert list(i.data['interface']) == [0, 0, 3, 3]
+        assert list(i.data['io']) == ['in', 'in', 'out', 'out']
+        assert i.gpot_ports(tuples=True) == [('foo', 0), ('foo', 1)]
+        assert i.spike_ports(5, tuples=True) == []
+
+        # Values other than the default categories may still be assigned:
+        i['/foo[0]', 'type'] = 'other'
+        assert i.data['type'].iloc[0] == 'other'
+
+    def test_port_inds(self):
+        i = Interface('/foo[0:6]')
+        i['/foo[0,2]'] = [0, 'in', 'gpot']
+        i['/foo[1,3]'] = [0, 'out', 'spike']
+        i['/foo[4:6]'] = [1, 'in', 'spike']
+        np.testing.assert_array_equal(i.port_inds(io='in'), [0, 2, 4, 5])
+        np.testing.assert_array_equal(i.port_inds(0, 'in', 'gpot'), [0, 2])
+        np.testing.assert_array_equal(i.port_inds(type='spike'), [1, 3, 4, 5])
+        np.testing.assert_array_equal(i.port_inds(2), [])
+
+        # Modifying the interface must invalidate the cached positions:
+        i['/foo[0]', 'io'] = 'out'
+        np.testing.assert_array_equal(i.port_inds(io='in'), [2, 4, 5])
+
+    def test_filter_ports(self):
+        i = Interface('/foo[0:4]')
+        i['/foo[0:2]'] = [0, 'in', 'gpot']
+        i['/foo[2:4]'] = [0, 'out', 'spike']
+        assert i.filter_ports(io='in', type='gpot', tuples=True) == \
+            [('foo', 0), ('foo', 1)]
+        assert i.filter_ports(io='in', type='spike', tuples=True) == []
+        assert_frame_equal(i.filter_ports(io='out').data,
+                           i.out_ports().data)
+
     def test_equals(self):
         i = Interface('/foo[0:2],/bar[0:2]')
         i['/foo[0]'] = [0, 'in', 'gpot']
@@ -207,7 +249,8 @@ class test_interface(TestCase):
         df = pd.DataFrame(data, index=idx, columns=columns)
         i = Interface.from_df(df)
         assert_index_equal(i.data.index, idx)
-        assert_frame_equal(i.data, df)
+        assert_frame_equal(i.data, df, check_dtype=False,
+                           check_categorical=False)
 
     def test_from_df_index_empty(self):
         idx = pd.Index([])
@@ -216,7 +259,8 @@ class test_interface(TestCase):
         df = pd.DataFrame(data, index=idx, columns=columns)
         i = Interface.from_df(df)
         assert_index_equal(i.data.index, idx)
-        assert_frame_equal(i.data, df)
+        assert_frame_equal(i.data, df, check_dtype=False,
+                           check_categorical=False)
 
     def test_from_df_multiindex(self):
         idx = pd.MultiIndex.from_tuples([('foo', 0),
@@ -229,7 +273,8 @@ class test_interface(TestCase):
         df = pd.DataFrame(data, index=idx, columns=columns)
         i = Interface.from_df(df)
         assert_index_equal(i.data.index, idx)
-        assert_frame_equal(i.data, df)
+        assert_frame_equal(i.data, df, check_dtype=False,
+                           check_categorical=False)
 
     def test_from_df_multiindex_empty(self):
         idx = pd.MultiIndex(levels=[['a', 'b'], [0, 1]],
@@ -239,7 +284,8 @@ class test_interface(TestCase):
         df = pd.DataFrame(data, index=idx, columns=columns)
         i = Interface.from_df(df)
         assert_index_equal(i.data.index, idx)
-        assert_frame_equal(i.data, df)
+        assert_frame_equal(i.data, df, check_dtype=False,
+                           check_categorical=False)
 
     def test_from_df_dup(self):
         idx = pd.MultiIndex.from_tuples([('foo', 0),
@@ -272,6 +318,20 @@ class test_interface(TestCase):
         ig = Interface.from_graph(g)
         assert_index_equal(i.data.index, ig.data.index)
         assert_frame_equal(i.data, ig.data)
+
+    def test_save_load(self):
+        d = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(d, 'i.npz')
+            for i in [self.interface, Interface('/foo,/bar'), Interface('')]:
+                i.save(file_name)
+                for mmap_mode in [None, 'r']:
+                    j = Interface.load(file_name, mmap_mode)
+                    assert j.equals(i)
+                    assert j.num_levels == i.num_levels
+                    assert j.to_tuples() == i.to_tuples()
+        finally:
+            shutil.rmtree(d)
     
     def test_is_in_interfaces(self):
         # Selector with multiple levels:
@@ -309,7 +369,8 @@ class test_interface(TestCase):
                           dtype=object)
 
         # Test returning result as Interface:
-        assert_frame_equal(i.in_ports(0).data, df)
+        assert_frame_equal(i.in_ports(0).data, df, check_dtype=False,
+                           check_categorical=False)
 
         # Test returning result as list of tuples:
         self.assertItemsEqual(i.in_ports(0, True), df.index.tolist())
@@ -325,7 +386,8 @@ class test_interface(TestCase):
                           dtype=object)
 
         # Test returning result as Interface:
-        assert_frame_equal(i.in_ports(0).data, df)
+        assert_frame_equal(i.in_ports(0).data, df, check_dtype=False,
+                           check_categorical=False)
 
         # Test returning result as list of tuples:
         self.assertItemsEqual(i.in_ports(0, True), df.index.tolist())
@@ -369,7 +431,8 @@ class test_interface(TestCase):
                           dtype=object)
 
         # Test returning result as Interface:
-        assert_frame_equal(i.out_ports(1).data, df)
+        assert_frame_equal(i.out_ports(1).data, df, check_dtype=False,
+                           check_categorical=False)
 
         # Test returning result as list of tuples:
         self.assertItemsEqual(i.out_ports(1, True), df.index.tolist())
@@ -385,7 +448,8 @@ class test_interface(TestCase):
                           dtype=object)
 
         # Test returning result as Interface:
-        assert_frame_equal(i.out_ports(1).data, df)
+        assert_frame_equal(i.out_ports(1).data, df, check_dtype=False,
+                           check_categorical=False)
 
         # Test returning result as list of tuples:
         self.assertItemsEqual(i.out_ports(1, True), df.index.tolist())
@@ -597,6 +661,18 @@ class test_interface(TestCase):
         assert i.which_int('/foo[0:2]') == {0}
         assert i.which_int('/foo[0:4]') == {0, 1}
 
+    def test_memory_usage(self):
+        i = Interface('/foo[0:4]')
+        i['/foo[0:4]', 'interface', 'io', 'type'] = [0, 'in', 'gpot']
+        u = i.memory_usage()
+        assert u.keys() == ['index.levels', 'index.codes', 'index.tuples',
+                            'data.interface', 'data.io', 'data.type',
+                            'port_cache']
+        assert u['index.codes'] > 0
+        assert u['port_cache'] == 0
+        inds = i.port_inds(0)
+        assert i.memory_usage()['port_cache'] == inds.nbytes
+
 class test_pattern(TestCase):
     def setUp(self):
         self.df_p = pd.DataFrame(data={'conn': np.ones(6, dtype='object'),
@@ -636,7 +712,8 @@ class test_pattern(TestCase):
         p.interface['/bar[0:2]', 'type'] = 'spike'
         p.interface['/foo[2:5]', 'type'] = 'gpot'
         p.interface['/bar[3:5]', 'type'] = 'gpot'
-        assert_frame_equal(p.interface.data, self.df_i)
+        assert_frame_equal(p.interface.data, self.df_i, check_dtype=False,
+                           check_categorical=False)
 
     def test_create_dup_identifiers(self):
         self.assertRaises(Exception,  Pattern,
@@ -684,6 +761,16 @@ class test_pattern(TestCase):
                               [('aaa',),
                                ('bbb',)])
 
+    def test_src_idx_modified(self):
+        # The cached positions of the connected ports must be discarded when
+        # connections are added:
+        p = Pattern('/aaa[0:3]', '/bbb[0:3]')
+        p['/aaa[0]', '/bbb[0]'] = 1
+        assert p.src_idx(0, 1) == [('aaa', 0)]
+        p['/aaa[2]', '/bbb[1]'] = 1
+        assert p.src_idx(0, 1) == [('aaa', 0), ('aaa', 2)]
+        assert p.dest_idx(0, 1, src_ports='/aaa[2]') == [('bbb', 1)]
+
     def test_src_idx_dest_ports(self):
         p = Pattern('/[aaa,bbb][0:3]', '/[xxx,yyy][0:3]')
         p['/aaa[0]', '/yyy[0]'] = 1
@@ -1005,7 +1092,8 @@ class test_pattern(TestCase):
                           columns=['conn'],
                           dtype=object)
         assert_frame_equal(p.data, df)
-        assert_frame_equal(p.interface.data, df_int)
+        assert_frame_equal(p.interface.data, df_int, check_dtype=False,
+                           check_categorical=False)
 
     def test_from_df(self):
         p = Pattern('/[aaa,bbb]/0', '/[ccc,ddd]/0')
@@ -1141,6 +1229,17 @@ class test_pattern(TestCase):
         assert_frame_equal(pg.interface.data.sort_index(),
                            p.interface.data.sort_index())
 
+    def test_graph_round_trip(self):
+        p = Pattern('/foo[0:4]', '/bar[0:4]')
+        p['/foo[0]', '/bar[0]'] = 1
+        p['/foo[0]', '/bar[1]'] = 1
+        p['/bar[3]', '/foo[2]'] = 1
+        p.interface['/foo[0]', 'type'] = 'gpot'
+        p.interface['/bar[3]', 'type'] = 'spike'
+        q = Pattern.from_graph(p.to_graph())
+        assert_frame_equal(q.data, p.data.sort_index())
+        assert_frame_equal(q.interface.data, p.interface.data.sort_index())
+
     def test_gpot_ports(self):
         p = Pattern('/foo[0:3]', '/bar[0:3]')
         p.interface['/foo[0]', 'io', 'type'] = ['in', 'spike']
@@ -1208,6 +1307,80 @@ class test_pattern(TestCase):
                               [('bar', 0),
                                ('bar', 1)])
 
+    def test_save_load(self):
+        p = Pattern('/aaa[0:3]', '/bbb[0:3]', columns=['conn', 'w'])
+        p['/aaa[0]', '/bbb[2]', 'conn', 'w'] = [1, 0.5]
+        p['/aaa[1]', '/bbb[0]', 'conn', 'w'] = [1, 'x']
+        p['/bbb[1]', '/aaa[2]'] = 1
+        p.interface['/aaa[0]', 'type'] = 'spike'
+        d = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(d, 'p.npz')
+            p.save(file_name)
+            for mmap_mode in [None, 'r']:
+                q = Pattern.load(file_name, mmap_mode)
+                assert_index_equal(p.data.index, q.data.index)
+                assert_frame_equal(p.data, q.data)
+                assert q.interface.equals(p.interface)
+                self.assertItemsEqual(q.src_idx(0, 1), p.src_idx(0, 1))
+                self.assertItemsEqual(q.dest_idx(1, 0), p.dest_idx(1, 0))
+
+                # The port positions used to select connections are those
+                # read from the file:
+                from_pos, to_pos = q._conn_positions()
+                assert isinstance(from_pos, np.memmap) == (mmap_mode == 'r')
+                assert isinstance(to_pos, np.memmap) == (mmap_mode == 'r')
+            self.assertRaises(ValueError, Interface.load, file_name)
+        finally:
+            shutil.rmtree(d)
+
+    def test_from_csv(self):
+        p = Pattern('/aaa[0:3]', '/bbb[0:3]')
+        p['/aaa[0]', '/bbb[2]'] = 1
+        p['/aaa[1]', '/bbb[0]'] = 1
+        p['/bbb[1]', '/aaa[2]'] = 1
+        q = Pattern('/aaa[0:3]', '/bbb[0:3]')
+        d = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(d, 'p.csv')
+            with open(file_name, 'w') as f:
+                f.write('aaa,0,bbb,2,1\n'
+                        'aaa,1,bbb,0,1\n'
+                        'bbb,1,aaa,2,1\n')
+            stats = q.from_csv(file_name, chunksize=2)
+            assert stats['rows'] == 3
+            assert stats['chunks'] == 2
+            self.assertItemsEqual(q.data.index.tolist(), p.data.index.tolist())
+            assert q.interface.equals(p.interface)
+
+            # Identifiers not in the pattern's interface:
+            with open(file_name, 'w') as f:
+                f.write('aaa,0,bbb,5,1\n')
+            self.assertRaises(ValueError, q.from_csv, file_name)
+
+            # Fan-in connections:
+            with open(file_name, 'w') as f:
+                f.write('aaa,0,bbb,2,1\n'
+                        'aaa,1,bbb,2,1\n')
+            self.assertRaises(ValueError, q.from_csv, file_name)
+
+            # Identifiers whose numbers of combinations of token values
+            # exceed the range of int64:
+            n = 128
+            sel = lambda name: ','.join(['/%s' % name+'/%i' % i*9 \
+                                         for i in xrange(n)])
+            p = Pattern(sel('aaa'), sel('bbb'))
+            with open(file_name, 'w') as f:
+                for i in xrange(n):
+                    f.write(('aaa'+',%i' % i*9)+(',bbb'+',%i' % (n-1-i)*9)+
+                            ',1\n')
+            stats = p.from_csv(file_name, chunksize=50)
+            assert stats['rows'] == n
+            assert p.data.index.tolist() == \
+                [('aaa',)+(i,)*9+('bbb',)+(n-1-i,)*9 for i in xrange(n)]
+        finally:
+            shutil.rmtree(d)
+
     def test_clear(self):
         p = Pattern('/aaa[0:3]', '/bbb[0:3]')
         p['/aaa[0]', '/bbb[0]'] = 1
@@ -1229,5 +1402,13 @@ class test_pattern(TestCase):
                           dtype=object)
         assert_frame_equal(p[[('aaa', 0)], [('bbb', 0)]], df)
 
+    def test_memory_usage(self):
+        p = Pattern('/aaa[0:3]', '/bbb[0:3]')
+        p['/aaa[0]', '/bbb[0]'] = 1
+        u = p.memory_usage()
+        assert u['data.conn'] > 0
+        assert u['interface.index.codes'] == \
+            p.interface.memory_usage()['index.codes']
+
 if __name__ == '__main__':
     main()
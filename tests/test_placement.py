@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from unittest import main, TestCase
+
+from neurokernel.pattern import Pattern
+from neurokernel.placement import Placement, link_bytes, partition
+from neurokernel.routing_table import RoutingTable
+
+class test_placement(TestCase):
+    def setUp(self):
+        # Two clusters of heavily connected modules (a, b, c) and (d, e, f)
+        # joined by a light connection:
+        self.weights = {('a', 'b'): 100, ('b', 'c'): 100, ('c', 'a'): 100,
+                        ('d', 'e'): 100, ('e', 'f'): 100, ('f', 'd'): 100,
+                        ('c', 'd'): 1}
+        self.ids = ['a', 'd', 'b', 'e', 'c', 'f']
+
+    def test_link_bytes(self):
+        pat = Pattern('/a[0:4]', '/b[0:4]')
+        pat['/a[0]', '/b[0:2]'] = 1
+        pat['/a[1]', '/b[2]'] = 1
+        pat['/b[3]', '/a[2:4]'] = 1
+        pat.interface['/a[0:2],/b[0:3]', 'type'] = 'gpot'
+        pat.interface['/a[2:4],/b[3]', 'type'] = 'spike'
+        rt = RoutingTable()
+        rt['m0', 'm1'] = {'pattern': pat, 'int_0': 0, 'int_1': 1}
+        rt['m1', 'm0'] = {'pattern': pat, 'int_0': 1, 'int_1': 0}
+        w = link_bytes(rt, 'float64', 'int32')
+        assert w == {('m0', 'm1'): 16, ('m1', 'm0'): 4}
+
+    def test_partition(self):
+        parts = partition(self.ids, self.weights, 2, 3)
+        assert sorted(map(sorted, parts)) == [['a', 'b', 'c'],
+                                              ['d', 'e', 'f']]
+
+    def test_partition_spare_slots(self):
+        parts = partition(self.ids, self.weights, 3, 4)
+        assert sorted(map(sorted, [p for p in parts if p])) == \
+            [['a', 'b', 'c'], ['d', 'e', 'f']]
+
+    def test_partition_too_many(self):
+        self.assertRaises(ValueError, partition, self.ids, self.weights, 2, 2)
+
+    def test_cost(self):
+        p = Placement(partition(self.ids, self.weights, 2, 3), self.weights, 3)
+        b = Placement.in_order(self.ids, self.weights, 2, 3)
+        assert p.inter_node_bytes == 1
+        assert p.intra_node_bytes == 600
+        assert b.inter_node_bytes == 401
+        assert p.node_of['a'] == p.node_of['c']
+        assert sorted(p.rank_order) == sorted(self.ids)
+        assert 'baseline inter-node: 401 bytes/step' in p.report(b)
+
+    def test_write_hostfile(self):
+        p = Placement([['a', 'b'], ['c']], self.weights, 2)
+        fd, file_name = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            p.write_hostfile(file_name, ['n0', 'n1'])
+            with open(file_name) as f:
+                assert f.read() == 'n0 slots=2\nn1 slots=1\n'
+        finally:
+            os.remove(file_name)
+
+if __name__ == '__main__':
+    main()
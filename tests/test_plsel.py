@@ -454,6 +454,18 @@ class test_path_like_selector(TestCase):
         self.assertRaises(Exception, self.sel.to_identifier, 
                           ['foo', (0, 2)])
 
+    def test_identifier_to_tokens(self):
+        self.assertEqual(self.sel.identifier_to_tokens('/foo'), ('foo',))
+        self.assertEqual(self.sel.identifier_to_tokens('/foo[0]'), ('foo', 0))
+        self.assertEqual(self.sel.identifier_to_tokens('/foo/0'), ('foo', 0))
+        self.assertEqual(self.sel.identifier_to_tokens('/foo/bar[0]/baz'),
+                         ('foo', 'bar', 0, 'baz'))
+        self.assertEqual(self.sel.identifier_to_tokens('/foo/[bar]'),
+                         ('foo', 'bar'))
+        self.assertEqual(self.sel.identifier_to_tokens('/foo[0:1]'), ('foo', 0))
+        self.assertRaises(Exception, self.sel.identifier_to_tokens, '/foo[0:2]')
+        self.assertRaises(Exception, self.sel.identifier_to_tokens, '/foo,/bar')
+
     def test_index_to_selector(self):
         idx = self.sel.make_index('/foo,/bar')
         self.assertSequenceEqual(self.sel.index_to_selector(idx),
@@ -123,6 +123,13 @@ class test_base_port_mapper(TestCase):
         pm.set_map('/bar[0:5]', range(5))
         self.assertSequenceEqual(pm.portmap.ix[5:10].tolist(), range(5))
 
+    def test_memory_usage(self):
+        pm = BasePortMapper('/foo[0:5],/bar[0:5]')
+        u = pm.memory_usage()
+        assert u.keys() == ['index.levels', 'index.codes', 'index.tuples',
+                            'portmap']
+        assert u['portmap'] == pm.portmap.values.nbytes
+
 class test_port_mapper(TestCase):
     def setUp(self):
         self.data = np.random.rand(20)
@@ -294,5 +301,11 @@ class test_port_mapper(TestCase):
         pm.set_by_inds([0, 1], new_data)
         assert_array_equal(new_data, pm.get_by_inds([0, 1]))
 
+    def test_memory_usage(self):
+        data = np.random.rand(3)
+        pm = PortMapper('/foo[0:3]', data)
+        assert pm.memory_usage()['data'] == data.nbytes
+        assert PortMapper('/foo[0:3]').memory_usage()['data'] == 0
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+import numpy as np
+
+from neurokernel.profiler import PHASES, LoadBalance, StackSampler, \
+     StepProfiler, Tracer, chrome_trace, comm_matrix, flame_graph, \
+     merge_collapsed, read_collapsed, summarize, write_collapsed
+from neurokernel.tools.flamegraph import file_label, merge_files
+
+class test_step_profiler(TestCase):
+    def record(self, p, n):
+        for i in xrange(n):
+            p.begin()
+            for phase in xrange(1, len(PHASES)):
+                p.mark(phase)
+            p.end()
+
+    def test_durations(self):
+        p = StepProfiler(4)
+        self.record(p, 3)
+        d = p.durations()
+        assert d.shape == (3, len(PHASES))
+        assert (d >= 0).all()
+
+    def test_durations_wrap(self):
+        p = StepProfiler(4)
+        self.record(p, 6)
+        assert p.steps == 6
+        d = p.durations()
+        assert d.shape == (4, len(PHASES))
+        assert (d >= 0).all()
+
+    def test_durations_empty(self):
+        p = StepProfiler(4)
+        assert p.durations().shape == (0, len(PHASES))
+
+    def test_capacity(self):
+        self.assertRaises(ValueError, StepProfiler, 0)
+
+class test_load_balance(TestCase):
+    def test_update(self):
+        lb = LoadBalance(warn_steps=2)
+        assert lb.update({'a': 3.0, 'b': 1.0, 'c': 2.0}) is None
+        assert lb.update({'a': 1.0, 'b': 1.0, 'c': 4.0}) is None
+        assert lb.update({'a': 1.0, 'b': 1.0, 'c': 4.0}) == 'c'
+        assert lb.update({'a': 1.0, 'b': 1.0, 'c': 4.0}) is None
+        assert lb.steps == 4
+        np.testing.assert_almost_equal(lb.max_imbalance, 2.0)
+        np.testing.assert_almost_equal(lb.average_imbalance, 7.5/4)
+        assert lb.straggler_steps == {'a': 1, 'c': 3}
+        np.testing.assert_almost_equal(lb.idle_caused['c'], 18.0)
+        np.testing.assert_almost_equal(lb.idle_caused['a'], 3.0)
+
+    def test_update_missing(self):
+        lb = LoadBalance()
+        assert lb.update({'a': np.nan, 'b': 1.0}) is None
+        assert lb.update({'a': 0.0, 'b': 0.0}) is None
+        assert lb.steps == 0
+
+    def test_report(self):
+        lb = LoadBalance()
+        lb.update({'a': 2.0, 'b': 1.0})
+        lb.update({'a': 1.0, 'b': 4.0})
+        r = lb.report()
+        assert list(r.index) == ['b', 'a']
+        np.testing.assert_array_equal(r['straggler_fraction'], [0.5, 0.5])
+        np.testing.assert_array_equal(r['idle_caused'], [3.0, 1.0])
+
+class test_tracer(TestCase):
+    def test_events(self):
+        t = Tracer(4)
+        for name in ['start', 'steps', 'start']:
+            t.event(name)
+        assert [e[0] for e in t.events()] == ['start', 'steps', 'start']
+
+    def test_events_wrap(self):
+        t = Tracer(2)
+        for name in ['a', 'b', 'c']:
+            t.event(name)
+        e = t.events()
+        assert [x[0] for x in e] == ['b', 'c']
+        assert e[0][1] <= e[1][1]
+
+class test_chrome_trace(TestCase):
+    def test_chrome_trace(self):
+        t = np.array([[10.0, 11.0, 12.0, 12.0, 13.0, 14.0],
+
+                      # Interrupted step:
+                      [20.0, 21.0, 0.0, 0.0, 0.0, 0.0]])
+        traces = {'a': ((100.0, 10.0), 5, t, [('start', 9.5)]),
+                  'b': ((99.0, 0.0), 0, t[:0], [])}
+        events = chrome_trace(traces)
+        meta = [e for e in events if e['ph'] == 'M']
+        assert [(e['pid'], e['args']['name']) for e in meta] == \
+            [(0, 'a'), (1, 'b')]
+        steps = [e for e in events if e['name'] == 'step']
+        assert len(steps) == 1
+        assert steps[0]['args']['step'] == 5
+
+        # Times are relative to the earliest origin:
+        np.testing.assert_almost_equal(steps[0]['ts'], 1e6)
+        np.testing.assert_almost_equal(steps[0]['dur'], 4e6)
+        phases = [e for e in events if e['name'] in PHASES]
+        assert [e['name'] for e in phases] == list(PHASES)
+        start = [e for e in events if e['name'] == 'start'][0]
+        np.testing.assert_almost_equal(start['ts'], 0.5e6)
+
+    def test_chrome_trace_empty(self):
+        assert chrome_trace({}) == []
+
+class test_summarize(TestCase):
+    def test_summarize(self):
+        d = {'a': np.array([[1.0, 0.0, 0.0, 1.0, 0.0],
+                            [3.0, 0.0, 0.0, 1.0, 0.0]]),
+             'b': np.array([[2.0, 1.0, 0.0, 1.0, 0.0]])}
+        s = summarize(d, percentiles=(50,))
+        assert list(s.columns) == ['mean', 'p50', 'fraction']
+        np.testing.assert_almost_equal(s.loc[('a', 'compute'), 'mean'], 2.0)
+        np.testing.assert_almost_equal(s.loc[('a', 'compute'), 'fraction'],
+                                       2.0/3)
+        np.testing.assert_almost_equal(s.loc[('all', 'compute'), 'p50'], 2.0)
+        np.testing.assert_almost_equal(s.loc[('all', 'gather'), 'mean'],
+                                       1.0/3)
+
+    def test_summarize_empty(self):
+        s = summarize({})
+        assert len(s) == 0
+
+class test_comm_matrix(TestCase):
+    def setUp(self):
+        self.link_stats = {'b': (4, {'a': {'gpot': 64, 'spike': 16}},
+                                 {'a': {'gpot': 4, 'spike': 4}},
+                                 {'a': 0.5}),
+                           'c': (4, {}, {}, {})}
+
+    def test_bytes(self):
+        m = comm_matrix(self.link_stats, ['c', 'b', 'a'])
+        assert list(m.index) == ['a', 'b', 'c']
+        assert list(m.columns) == ['a', 'b', 'c']
+        np.testing.assert_array_equal(m.values,
+                                      [[0, 20, 0], [0, 0, 0], [0, 0, 0]])
+        m = comm_matrix(self.link_stats, ['a', 'b', 'c'], port_type='spike')
+        assert m.loc['a', 'b'] == 4
+
+    def test_messages(self):
+        m = comm_matrix(self.link_stats, ['a', 'b', 'c'], 'messages')
+        assert m.loc['a', 'b'] == 2
+        assert m.values.sum() == 2
+
+    def test_wait(self):
+        m = comm_matrix(self.link_stats, ['a', 'b', 'c'], 'wait')
+        assert m.loc['a', 'b'] == 0.5
+        assert np.isnan(m.loc['b', 'a'])
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, comm_matrix, self.link_stats,
+                          ['a', 'b', 'c'], 'foo')
+        self.assertRaises(ValueError, comm_matrix, self.link_stats,
+                          ['a', 'b', 'c'], 'bytes', 'foo')
+
+def busy(t):
+    x = 0
+    while os.times()[0] < t:
+        x += 1
+    return x
+
+class test_stack_sampler(TestCase):
+    def test_sample(self):
+        s = StackSampler(0.001)
+        s.start()
+        try:
+            busy(os.times()[0]+0.1)
+        finally:
+            s.stop()
+        assert not s.running
+        assert s.samples > 0
+        stacks = s.collapsed()
+        assert sum(stacks.values()) == s.samples
+        assert any([stack.split(';')[-1].startswith('busy (test_profiler.py')
+                    for stack in stacks])
+
+    def test_invalid_timer(self):
+        self.assertRaises(ValueError, StackSampler, 0.001, 'foo')
+
+class test_collapsed(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_read_write(self):
+        stacks = {'a (x.py:1);b (x.py:2)': 3, 'a (x.py:1)': 1}
+        file_name = os.path.join(self.dir, 'profile.m1.folded')
+        write_collapsed(file_name, stacks)
+        assert read_collapsed(file_name) == stacks
+        assert file_label(file_name) == 'm1'
+
+    def test_file_label(self):
+        assert file_label('profile.0.5.folded') == '0.5'
+        assert file_label('out/run.1.lpu0.folded', 'out/run.1') == 'lpu0'
+        assert file_label('lpu0.folded') == 'lpu0'
+
+    def test_merge_files(self):
+        file_name = os.path.join(self.dir, 'run.1.m1.folded')
+        write_collapsed(file_name, {'a;b': 2})
+        assert merge_files([file_name], prefix='run.1') == {'m1;a;b': 2}
+        assert merge_files(['x=%s' % file_name]) == {'x;a;b': 2}
+        self.assertRaises(ValueError, merge_files,
+                          ['x=%s' % file_name, 'x=%s' % file_name])
+
+    def test_merge(self):
+        merged = merge_collapsed({'m1': {'a;b': 2}, 'm2': {'a;b': 1, 'a': 1}})
+        assert merged == {'m1;a;b': 2, 'm2;a;b': 1, 'm2;a': 1}
+
+    def test_flame_graph(self):
+        file_name = os.path.join(self.dir, 'profile.svg')
+        flame_graph(file_name, {'main;run_step': 3, 'main;_sync': 1},
+                    title='test')
+        with open(file_name) as f:
+            svg = f.read()
+        assert svg.count('<rect') == 5
+        assert 'run_step (3 samples, 75.00%)' in svg
+
+    def test_flame_graph_empty(self):
+        file_name = os.path.join(self.dir, 'profile.svg')
+        flame_graph(file_name, read_collapsed(os.devnull))
+        with open(file_name) as f:
+            svg = f.read()
+        assert svg.count('<rect') == 1
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+import bidict
+import numpy as np
+
+from neurokernel.pattern import Pattern
+from neurokernel.pm import BasePortMapper
+from neurokernel.routing_plan import RoutingPlan, RoutingPlanCache, \
+    compute_routing_plans, port_digest, routing_plan_key
+from neurokernel.routing_table import RoutingTable
+
+class test_routing_plan(TestCase):
+    def setUp(self):
+        pat = Pattern('/a[0:4]', '/b[0:4]')
+        pat['/a[0]', '/b[0:2]'] = 1
+        pat['/a[1]', '/b[2]'] = 1
+        pat['/b[3]', '/a[2:4]'] = 1
+        pat.interface['/a[0:2],/b[0:3]', 'type'] = 'gpot'
+        pat.interface['/a[2:4],/b[3]', 'type'] = 'spike'
+        self.pat = pat
+
+        self.rt = RoutingTable()
+        self.rt['m0', 'm1'] = {'pattern': pat, 'int_0': 0, 'int_1': 1}
+        self.rt['m1', 'm0'] = {'pattern': pat, 'int_0': 1, 'int_1': 0}
+        self.rank_to_id = bidict.bidict({0: 'm0', 1: 'm1'})
+        self.sels = {'m0': ('/a[0:2]', '/a[2:4]'),
+                     'm1': ('/b[0:3]', '/b[3]')}
+        self.pm = {k: {'gpot': BasePortMapper(v[0]),
+                       'spike': BasePortMapper(v[1])} \
+                   for k, v in self.sels.iteritems()}
+
+    def check_plans(self, plans):
+        for k, p in plans.iteritems():
+            assert p.port_digest == port_digest(self.pm[k])
+        assert plans['m0'].port_digest != plans['m1'].port_digest
+
+        p0 = plans['m0']
+        assert p0.out_ids == ['m1'] and p0.out_ranks == [1]
+        assert p0.in_ids == ['m1'] and p0.in_ranks == [1]
+        np.testing.assert_array_equal(p0.out_inds['gpot']['m1'], [0, 1])
+        np.testing.assert_array_equal(p0.out_inds['spike']['m1'], [])
+        np.testing.assert_array_equal(p0.in_inds['spike']['m1'], [0, 1])
+        np.testing.assert_array_equal(p0.in_buf_inds['spike']['m1'], [0, 0])
+        assert p0.in_buf_len['spike']['m1'] == 1
+        assert p0.in_buf_len['gpot']['m1'] == 0
+
+        p1 = plans['m1']
+        np.testing.assert_array_equal(p1.out_inds['spike']['m0'], [0])
+        np.testing.assert_array_equal(p1.in_inds['gpot']['m0'], [0, 1, 2])
+        np.testing.assert_array_equal(p1.in_buf_inds['gpot']['m0'], [0, 0, 1])
+        assert p1.in_buf_len['gpot']['m0'] == 2
+
+    def test_compute(self):
+        plans = {k: RoutingPlan.compute(k, self.rt, self.rank_to_id, v) \
+                 for k, v in self.pm.iteritems()}
+        self.check_plans(plans)
+
+    def test_save_load(self):
+        plan = RoutingPlan.compute('m1', self.rt, self.rank_to_id,
+                                   self.pm['m1'])
+        d = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(d, 'plan.npz')
+            plan.save(file_name)
+            for mmap_mode in [None, 'r']:
+                plan_loaded = RoutingPlan.load(file_name, mmap_mode)
+                self.check_plans({'m0': RoutingPlan.compute('m0', self.rt,
+                                      self.rank_to_id, self.pm['m0']),
+                                  'm1': plan_loaded})
+        finally:
+            shutil.rmtree(d)
+
+    def test_key(self):
+        key = routing_plan_key('m0', self.rt, self.rank_to_id, self.pm['m0'])
+        assert key == routing_plan_key('m0', self.rt, self.rank_to_id,
+                                       self.pm['m0'])
+        assert key != routing_plan_key('m1', self.rt, self.rank_to_id,
+                                       self.pm['m1'])
+
+        # Changing a pattern must change the key:
+        self.pat['/a[1]', '/b[2]', 'conn'] = 2
+        self.pat.interface['/b[2]', 'type'] = 'spike'
+        assert key != routing_plan_key('m0', self.rt, self.rank_to_id,
+                                       self.pm['m0'])
+
+    def test_cache(self):
+        d = tempfile.mkdtemp()
+        try:
+            cache = RoutingPlanCache(os.path.join(d, 'cache'))
+            plans = compute_routing_plans(self.rt, self.rank_to_id,
+                                          self.sels, cache)
+            self.check_plans(plans)
+            assert len(os.listdir(cache.cache_dir)) == 2
+            key = routing_plan_key('m0', self.rt, self.rank_to_id,
+                                   self.pm['m0'])
+            assert key in cache
+
+            # The second computation must use the cached plans:
+            plans = compute_routing_plans(self.rt, self.rank_to_id,
+                                          self.sels, cache)
+            self.check_plans(plans)
+            assert len(os.listdir(cache.cache_dir)) == 2
+        finally:
+            shutil.rmtree(d)
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@
 
 from unittest import main, TestCase
 
+import numpy as np
+
 from neurokernel.routing_table import RoutingTable
 
 class test_routingtable(TestCase):
@@ -70,5 +72,16 @@ class test_routingtable(TestCase):
         assert set(s.ids) == set(['a', 'b', 'c'])
         assert set(s.connections) == set([('a', 'b'), ('b', 'c')])
 
+    def test_memory_usage(self):
+        t = RoutingTable()
+        x = np.zeros(10)
+        t['a', 'b'] = {'x': x}
+        t['b', 'a'] = {'x': x, 'y': np.zeros(5)}
+        t['b', 'c'] = 1
+
+        # Arrays shared by several connections are only counted once:
+        assert t.memory_usage() == {('a', 'b'): x.nbytes, ('b', 'a'): 40,
+                                    ('b', 'c'): 0}
+
 if __name__ == '__main__':
     main()